@@ -8,6 +8,9 @@ from blueprints.auth.views import auth
 from blueprints.dashboard.views import dashboard
 from core.init_db import init_db
 from core.init_redis import init_redis
+from core.hashers import calibrate_bcrypt_rounds, validate_password_hasher
+from core.query_stats import init_query_stats
+from core.sql_comments import init_sql_comments
 from flask_compress import Compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -15,9 +18,9 @@ from flask_limiter.util import get_remote_address
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# Storage is configured by init_redis, so the limiter shares the Redis pool
 limiter = Limiter(
     key_func=get_remote_address,
-    storage_uri="redis://redis:6379/0",
     strategy="fixed-window"
 )
 
@@ -27,6 +30,10 @@ def create_app():
     app = Flask(__name__)
     Compress(app)
     init_redis(app)
+    init_query_stats(app)
+    init_sql_comments(app)
+    validate_password_hasher()
+    calibrate_bcrypt_rounds()
 
     
 
@@ -0,0 +1,117 @@
+"""
+Repository Lookup Benchmark.
+
+Compares the hot read lookups of the user repositories against the ORM
+``session.query()`` calls they replaced, on an in-memory SQLite database.
+For each lookup it reports the mean latency per call and the memory
+allocated per call (tracemalloc), so the numbers are comparable between
+runs on the same machine rather than absolute. The read cache of
+core.cache is switched off, so the fast path itself is measured.
+
+Usage:
+    python -m benchmarks.repository_lookups --calls 5000
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from blueprints.users.credentials_repository import CredentialsRepository
+from blueprints.users.mfa_repository import MFARepository
+from blueprints.users.models import MFA, Credentials, User
+from blueprints.users.user_repository import UserRepository
+from core import cache
+from core.database import Base, SessionRead, SessionWrite
+
+USERS = 1000
+
+
+def _setup_database():
+    """Create an in-memory database with USERS users, every second one with MFA."""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with SessionWrite(bind=engine) as db:
+        for i in range(USERS):
+            cred = Credentials(email=f"user{i}@example.com", password=f"hash{i}")
+            mfa = MFA(totp_secret=f"SECRET{i}") if i % 2 else None
+            db.add_all([cred] + ([mfa] if mfa else []))
+            db.flush()
+            db.add(User(first_name=f"First{i}", last_name=f"Last{i}", credentials_id=cred.id,
+                        mfa_id=mfa.id if mfa else None))
+        db.commit()
+    return engine
+
+
+def _orm_lookups(db) -> Dict[str, Callable[[int], object]]:
+    """The ORM query() versions of the lookups, as they were before the fast path."""
+    return {
+        "get_username_by_userid": lambda i: db.query(User.first_name, User.last_name).filter(User.id == i + 1).first(),
+        "get_userid_by_email": lambda i: (db.query(User.id)
+                                          .join(Credentials, Credentials.id == User.credentials_id)
+                                          .filter(Credentials.email == f"user{i}@example.com").first()),
+        "get_mfa_details_by_user_id": lambda i: (db.query(MFA).join(User, User.mfa_id == MFA.id)
+                                                 .filter(User.id == i + 1).first()),
+        "get_credentials_by_email": lambda i: (db.query(Credentials)
+                                               .filter(Credentials.email == f"user{i}@example.com").first()),
+    }
+
+
+def _fast_lookups(db) -> Dict[str, Callable[[int], object]]:
+    """The repository methods using cached select() constructs and slotted results."""
+    users = UserRepository(read_db_session=db, write_db_session=None)
+    mfa = MFARepository(write_db_session=None, read_db_session=db)
+    creds = CredentialsRepository(write_db_session=None, read_db_session=db)
+    return {
+        "get_username_by_userid": lambda i: users.get_username_by_userid(i + 1),
+        "get_userid_by_email": lambda i: users.get_userid_by_email(f"user{i}@example.com"),
+        "get_mfa_details_by_user_id": lambda i: mfa.get_mfa_details_by_user_id(i + 1),
+        "get_credentials_by_email": lambda i: creds.get_credentials_by_email(f"user{i}@example.com"),
+    }
+
+
+def _measure(lookup: Callable[[int], object], calls: int) -> Dict[str, float]:
+    """Return mean microseconds and allocated bytes per call."""
+    for i in range(100):
+        lookup(i % USERS)  # warm up statement caches
+
+    start = time.perf_counter()
+    results = [lookup(i % USERS) for i in range(calls)]
+    elapsed = time.perf_counter() - start
+    del results
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [lookup(i % USERS) for i in range(min(calls, 1000))]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    return {"us": elapsed / calls * 1e6, "bytes": allocated / len(results)}
+
+
+def main(argv=None) -> int:
+    """Run the benchmark and print one line per lookup."""
+    parser = argparse.ArgumentParser(description="Compare ORM and fast-path repository lookups.")
+    parser.add_argument("--calls", type=int, default=5000, help="Calls per lookup (default: 5000)")
+    args = parser.parse_args(argv)
+
+    # Repeated lookups would otherwise be served by the cache, not the queries being compared
+    cache.CACHE_ENABLED = False
+    engine = _setup_database()
+    print(f"{'lookup':<28} {'orm us':>9} {'fast us':>9} {'speedup':>8} {'orm B':>9} {'fast B':>9}")
+    for name in _orm_lookups(None):
+        # A fresh session per side, so neither benefits from the other's identity map
+        with SessionRead(bind=engine) as orm_db, SessionRead(bind=engine) as fast_db:
+            orm = _measure(_orm_lookups(orm_db)[name], args.calls)
+            fast = _measure(_fast_lookups(fast_db)[name], args.calls)
+        print(f"{name:<28} {orm['us']:>9.1f} {fast['us']:>9.1f} {orm['us'] / fast['us']:>7.1f}x "
+              f"{orm['bytes']:>9.0f} {fast['bytes']:>9.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,24 @@
 """Authentication service module for managing user authentication operations.
 
 This module provides the AuthService class for handling password verification,
-checking, and resetting functionality with secure hashing via bcrypt.
+checking, and resetting functionality with secure hashing via the hasher
+registry in core.hashers. Hashing runs in the shared hashing pool so it
+never blocks the request worker.
 """
-import bcrypt
+import logging
+from typing import Optional
+from sqlalchemy import Row
 from blueprints.users.crendentials_service import CredentialsService
+from core.hashers import check_password, needs_rehash
+
+logger = logging.getLogger(__name__)
 
 
 class AuthService:
     """Service for handling user authentication operations.
     
     Manages the verification and manipulation of user credentials including
-    password checking and resetting with secure bcrypt hashing.
+    password checking and resetting with secure password hashing.
     """
 
     def __init__(self, cred_service: CredentialsService) -> None:
@@ -27,19 +34,23 @@ class AuthService:
         
         :param plain_password: Plaintext password to check
         :type plain_password: str
-        :param hashed_password: Bcrypt-hashed password for comparison
+        :param hashed_password: Stored password hash (bcrypt, argon2id or scrypt)
         :type hashed_password: str
         :return: True if passwords match, False otherwise
         :rtype: bool
+        :raises HashingPoolBusyError: If the hashing pool is saturated
 
         Usage Example:
         return self.check_password(password, cred.password)
         """
-        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        return check_password(plain_password, hashed_password)
     
     def verify_password(self, email: str, password: str) -> bool:
         """Authenticate a user by email and password.
         
+        On success, a stored hash in a non-default format or with outdated
+        parameters is transparently rehashed and saved.
+        
         :param email: User's email address
         :type email: str
         :param password: User's plaintext password
@@ -56,5 +67,63 @@ class AuthService:
         if not cred or not cred.password:
             raise ValueError("Invalid email or password")
 
-        return self.check_password(password, cred.password)
-    
+        return self.check_and_upgrade_password(cred_id=cred.id, plain_password=password, hashed_password=cred.password)
+
+    def authenticate(self, email: str, password: str) -> Optional[Row]:
+        """Authenticate a user and return the details needed to finish the login.
+        
+        Credentials, user ID and MFA status are fetched with a single query.
+        
+        :param email: User's email address
+        :type email: str
+        :param password: User's plaintext password
+        :type password: str
+        :return: Row with credentials_id, password, user_id and mfa_enabled if
+            the password matches, None otherwise
+        :rtype: Optional[Row]
+        :raises Exception: If credentials not found
+        :raises ValueError: If no password is stored for the user
+
+        Usage example:
+        login = auth_service.authenticate(email, password)
+        if login and login.mfa_enabled:
+            do_things()
+        """
+        login = self.cred_service.get_login_details_via_email(email=email)
+        if not login.password:
+            raise ValueError("Invalid email or password")
+
+        if not self.check_and_upgrade_password(
+            cred_id=login.credentials_id, plain_password=password, hashed_password=login.password
+        ):
+            return None
+        return login
+
+    def check_and_upgrade_password(self, cred_id: int, plain_password: str, hashed_password: str) -> bool:
+        """Check a password and migrate its stored hash if it is outdated.
+        
+        The rehash is best effort: a failure is logged and the check result
+        is still returned.
+        
+        :param cred_id: Unique identifier of the credentials record
+        :type cred_id: int
+        :param plain_password: Plaintext password to check
+        :type plain_password: str
+        :param hashed_password: Stored password hash
+        :type hashed_password: str
+        :return: True if passwords match, False otherwise
+        :rtype: bool
+
+        Usage example:
+        return self.check_and_upgrade_password(cred_id=cred.id, plain_password=password, hashed_password=cred.password)
+        """
+        if not self.check_password(plain_password, hashed_password):
+            return False
+
+        if needs_rehash(hashed_password):
+            try:
+                self.cred_service.rehash_password(cred_id=cred_id, password=plain_password)
+            except Exception as e:
+                # Upgrading the hash is best effort, the login itself succeeded
+                logger.warning(f"Password rehash failed for credentials {cred_id}: {e}")
+        return True
@@ -9,18 +9,21 @@ uses Redis for session storage.
 Routes:
     - /auth/authenticate: Processes user login credentials
     - /auth/verify_otp: Verifies one-time passwords for MFA
+    - /auth/admin/users/<user_id>/revoke_sessions: Logs a user out everywhere (admin token required)
 """
 
 
+import hmac
+import os
 from flask import Blueprint, jsonify, redirect, request, session, url_for
-from blueprints.users.mfa_repository import MFARepository
-from blueprints.users.mfa_service import MFAservice
 import logging
 import redis
 
 
-from core.database import get_read_db, get_write_db
-from core.di import create_auth_service, create_mfa_service, create_user_service
+from core.database import unit_of_work
+from core.di import create_auth_service, create_credentials_service, create_mfa_service
+from core.hash_pool import HashingPoolBusyError
+from core.session_index import register_session
 
 auth = Blueprint(
     "auth",
@@ -30,11 +33,6 @@ auth = Blueprint(
     url_prefix="/auth"       
 )
 
-# Redis client for session storage
-redis_client = redis.Redis(host='redis', port=6379, db=0)  
-
-
-
 
 @auth.route("/authenticate", methods=["POST"])
 def authenticate_login():
@@ -58,19 +56,20 @@ def authenticate_login():
         return jsonify({"error": "Email and password are required"}), 400
     
     # Init services
-    with get_read_db() as read_db, get_write_db() as write_db:
-        user_service = create_user_service(read_db=read_db,write_db=write_db)
-        auth_service = create_auth_service(read_db=read_db, write_db=write_db)
+    with unit_of_work() as uow:
+        auth_service = create_auth_service(read_db=uow.read_db, write_db=uow.write_db)
         
         try:
-            # verify password against db
-            if not auth_service.verify_password(email, password):
+            # verify password and fetch user ID and MFA status in one query
+            login = auth_service.authenticate(email, password)
+            if not login:
                 return jsonify({"error": "Authentication failed. Please check creds"}), 401
-            
-            # get MFA details to determine routing process
-            mfa_service = create_mfa_service(read_db=read_db,write_db=write_db)
-            mfa_enabled = mfa_service.get_mfa_details_via_email(email=email)
-            user_id = user_service.get_userid_by_email(email=email)
+            mfa_enabled = login.mfa_enabled
+            user_id = login.user_id
+        except HashingPoolBusyError as e:
+            # Fail fast instead of piling up requests behind the hashing pool
+            logging.warning(f"Login rejected, hashing pool saturated: {e}")
+            return jsonify({"error": "Service busy. Please try again shortly."}), 503
         except Exception as e:
             # Handle the "credentials not found" exception
             error_message = str(e)
@@ -85,6 +84,8 @@ def authenticate_login():
     session["user_email"] = email
     session["user_id"] = user_id
     session["is_authenticated"] = True
+    # Index the session so a password change can end it
+    register_session(user_id)
 
     # Redirect to MFA input page if MFA is enabled
     if mfa_enabled:
@@ -114,9 +115,8 @@ def verify_otp():
         return jsonify({"error": "OTP code is required"}), 400
 
     # Init services for workflow
-    with get_write_db() as write_db, get_read_db() as read_db:
-        mfa_repo = MFARepository(write_db_session=write_db, read_db_session=read_db)
-        mfa_service = MFAservice(mfa_repo=mfa_repo)
+    with unit_of_work() as uow:
+        mfa_service = create_mfa_service(write_db=uow.write_db, read_db=uow.read_db)
         # Guard clause
         mfa_details = mfa_service.get_mfa_details_via_user_id(user_id)
         if not mfa_details:
@@ -128,4 +128,29 @@ def verify_otp():
             session["is_totp_authenticated"] = True
             return redirect(url_for('dashboard.user_dashboard'))
         except ValueError:
-            return jsonify({"error": "Invalid OTP code"}), 401
\ No newline at end of file
+            return jsonify({"error": "Invalid OTP code"}), 401
+
+
+@auth.route("/admin/users/<int:user_id>/revoke_sessions", methods=["POST"])
+def revoke_user_sessions(user_id: int):
+    """Log a user out of every session.
+
+    Requires the ADMIN_API_TOKEN as bearer token. The endpoint does not
+    exist while ADMIN_API_TOKEN is unset.
+    """
+    admin_token = os.getenv("ADMIN_API_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "Not found"}), 404
+    presented = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(presented.encode(), admin_token.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        with unit_of_work() as uow:
+            cred_service = create_credentials_service(write_db=uow.write_db, read_db=uow.read_db)
+            revoked = cred_service.revoke_sessions(user_id=user_id)
+    except redis.RedisError as e:
+        logging.error(f"Revoking sessions of user {user_id} failed: {e}")
+        return jsonify({"error": "Session store unavailable. Please try again shortly."}), 503
+    logging.info(f"Admin revoked {revoked} sessions of user {user_id}")
+    return jsonify({"user_id": user_id, "revoked": revoked}), 200
@@ -0,0 +1,94 @@
+"""Dashboard View Model Module.
+
+The dashboard only shows the user's name and whether MFA is enabled.
+Both rarely change, so the first dashboard visit after a login stores
+them in the Flask session and later visits render from there without
+touching the database. The login itself does not store them: it only
+learns the user id from its query, too late to read a version that
+covers the loaded data, and it stays a single query.
+
+The stored view model carries two versions:
+
+- ``schema``: bumped in code whenever the stored fields change, so view
+  models written by an older release are rebuilt instead of misread.
+- ``version``: the profile cache version of ``user:<id>``, which every
+  write to the user row or its MFA entry bumps after commit (see
+  core.cache). A mismatch means the name or MFA flag changed, possibly
+  from another device, and the view model is rebuilt from the database.
+
+Versions live in the cache's Redis tier. Without it no version is shared
+between workers, so nothing is stored and the dashboard always queries
+the database.
+"""
+
+from typing import Optional
+
+from flask import session
+
+from core.cache import profile_cache
+
+VIEW_MODEL_KEY = "dashboard_view"
+VIEW_MODEL_SCHEMA = 1
+
+
+def profile_version(user_id: int) -> Optional[int]:
+    """Return the current profile version of a user.
+
+    Read it before loading the data the view model is built from, so a
+    write racing the load marks the stored view model as outdated.
+
+    :param user_id: Unique identifier of the user
+    :type user_id: int
+    :return: Version number, None without a shared version store or if it could not be read
+    :rtype: Optional[int]
+    """
+    return profile_cache.tag_version(f"user:{user_id}")
+
+
+def store_view_model(user_id: int, username: str, mfa_enabled: bool, version: Optional[int]) -> None:
+    """Save the dashboard view model in the session.
+
+    :param user_id: Unique identifier of the user
+    :type user_id: int
+    :param username: Greeting name
+    :type username: str
+    :param mfa_enabled: Whether MFA is enabled for the user
+    :type mfa_enabled: bool
+    :param version: Result of :func:`profile_version` read before the data
+    :type version: Optional[int]
+    :return: None
+
+    Usage example:
+    store_view_model(user_id, username, mfa_enabled, version)
+    """
+    if version is None:
+        # Could not version it, so it could never be validated either
+        session.pop(VIEW_MODEL_KEY, None)
+        return
+    session[VIEW_MODEL_KEY] = {
+        "schema": VIEW_MODEL_SCHEMA,
+        "user_id": user_id,
+        "version": version,
+        "username": username,
+        "mfa_enabled": bool(mfa_enabled),
+    }
+
+
+def load_view_model(user_id: int) -> Optional[dict]:
+    """Return the session's view model if it is still current.
+
+    :param user_id: Unique identifier of the logged in user
+    :type user_id: int
+    :return: Dict with username and mfa_enabled, None if absent or outdated
+    :rtype: Optional[dict]
+
+    Usage example:
+    view = load_view_model(user_id) or rebuild()
+    """
+    view = session.get(VIEW_MODEL_KEY)
+    if not view or view.get("schema") != VIEW_MODEL_SCHEMA or view.get("user_id") != user_id:
+        return None
+    if view.get("version") != profile_version(user_id):
+        return None
+    return view
+
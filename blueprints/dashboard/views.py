@@ -1,7 +1,8 @@
 """Dashboard routes for user portal.
 """
 from flask import Blueprint, render_template, session
-from core.database import get_read_db, get_write_db
+from blueprints.dashboard.view_model import load_view_model, profile_version, store_view_model
+from core.database import unit_of_work
 from core.di import create_dashboard_service
 
 
@@ -19,14 +20,24 @@ dashboard = Blueprint(
 def user_dashboard():
     """User's main dashboard page.
     
+    Renders from the view model stored in the session by an earlier
+    visit. The profile is only looked up when it is missing or outdated,
+    e.g. on the first visit after a login.
+    
     :return: Rendered dashboard with username and MFA status
     :rtype: str
     """
     user_id = session.get("user_id")
-    with get_write_db() as write_db, get_read_db() as read_db:
-        dashboard_service = create_dashboard_service(write_db=write_db, read_db=read_db)
+    view = load_view_model(user_id)
+    if view:
+        return render_template("dashboard_user.html", username=view["username"], mfa_enabled=view["mfa_enabled"])
+
+    version = profile_version(user_id)
+    with unit_of_work() as uow:
+        dashboard_service = create_dashboard_service(write_db=uow.write_db, read_db=uow.read_db)
         # If MFA is enabled then show "deactivate MFA in dashboard else activate MFA"
         mfa_enabled = dashboard_service.is_mfa_enabled(user_id=user_id)
         # for greeting prupose
         username = dashboard_service.get_username_by_userid(user_id=user_id)
-        return render_template("dashboard_user.html",username=username,mfa_enabled = mfa_enabled)
\ No newline at end of file
+    store_view_model(user_id, username, mfa_enabled, version)
+    return render_template("dashboard_user.html",username=username,mfa_enabled = mfa_enabled)
\ No newline at end of file
@@ -3,14 +3,23 @@ Credentials and User Repository Module.
 
 This module provides a data access layer with read/write separation
 for secure and efficient database operations on user authentication data.
+Write operations only flush; the request's unit of work commits once.
 
 """
 
 
 from datetime import datetime
 from typing import Any, Optional
+from sqlalchemy import Row, bindparam, select, update
 from sqlalchemy.orm import Session
-from blueprints.users.models import Credentials, User
+from blueprints.users.dto import CredentialsDetails
+from blueprints.users.models import MFA, Credentials, User
+from core.cache import invalidate_after_commit
+
+# Built once at import, hot lookups run them through the read session's fast path
+_CREDENTIALS_BY_EMAIL = select(Credentials.id, Credentials.email, Credentials.password).where(
+    Credentials.email == bindparam("email")
+)
 
 
 class CredentialsRepository:
@@ -34,6 +43,19 @@ class CredentialsRepository:
         """
         self.write_db_session = write_db_session
         self.read_db_session = read_db_session
+
+    def savepoint(self):
+        """
+        Open a savepoint on the write session, rolled back alone if its block raises.
+
+        :return: Nested transaction usable as a context manager
+        :rtype: SessionTransaction
+
+        Usage example:
+        with self.cred_repo.savepoint():
+            self.cred_repo.update_credentials(cred_id=cred_id, password=new_hashed_password)
+        """
+        return self.write_db_session.begin_nested()
     
 
 
@@ -51,20 +73,51 @@ class CredentialsRepository:
         """
         return self.read_db_session.query(Credentials).filter(Credentials.id == user_id).first()
     
-    def get_credentials_by_email(self,email:str) -> Optional[Credentials]:
+    # Carries the password hash, so it is never cached
+    def get_credentials_by_email(self,email:str) -> Optional[CredentialsDetails]:
         """
         Fetch credentials by email address (Read-Only).
         
         :param email: User's email address
         :type email: str
-        :return: Credentials object if found, None otherwise
-        :rtype: Optional[Credentials]
+        :return: Credentials ID, email and password hash if found, None otherwise
+        :rtype: Optional[CredentialsDetails]
 
         Usage example:
         credentials =  self.cred_repo.get_credentials_by_email(email=email)
         """
-        return self.read_db_session.query(Credentials).filter(Credentials.email == email).first()
+        row = self.read_db_session.fetch_one(_CREDENTIALS_BY_EMAIL, {"email": email})
+        return CredentialsDetails(*row) if row else None
     
+    def get_login_details_by_email(self, email: str) -> Optional[Row]:
+        """
+        Fetch everything the login flow needs in a single query (Read-Only).
+        
+        Uses the unique index on credentials.email and the unique
+        users.credentials_id foreign key, replacing separate credentials,
+        MFA and user ID lookups.
+        
+        :param email: User's email address
+        :type email: str
+        :return: Row with credentials_id, password, user_id and mfa_enabled if found, None otherwise
+        :rtype: Optional[Row]
+
+        Usage example:
+        login = self.cred_repo.get_login_details_by_email(email=email)
+        """
+        return (
+            self.read_db_session.query(
+                Credentials.id.label("credentials_id"),
+                Credentials.password.label("password"),
+                User.id.label("user_id"),
+                MFA.id.isnot(None).label("mfa_enabled"),
+            )
+            .join(User, User.credentials_id == Credentials.id)
+            .outerjoin(MFA, User.mfa_id == MFA.id)
+            .filter(Credentials.email == email)
+            .first()
+        )
+
     def get_email_by_userid(self, user_id: int) -> Optional[str]:
         """
         Fetch the email address of a user by user ID (Read-Only).
@@ -116,7 +169,10 @@ class CredentialsRepository:
         """
         user = self.get_credentials_by_id(user_id)
         if user:
+            invalidate_after_commit(self.write_db_session, f"email:{user.email}")
+            user = self.write_db_session.merge(user)
             self.write_db_session.delete(user)
+            self.write_db_session.flush()
         return user
     
     def soft_delete_credentials(self, user_id: int) -> Optional[User]:
@@ -130,7 +186,10 @@ class CredentialsRepository:
         """
         user = self.get_credentials_by_id(user_id)
         if user:
+            invalidate_after_commit(self.write_db_session, f"email:{user.email}")
+            user = self.write_db_session.merge(user)
             user.deleted_at = datetime.now()
+            self.write_db_session.flush()
         return user
 
     def update_credentials(self, cred_id: int, **kwargs:Any)-> Optional[Credentials]:
@@ -147,17 +206,15 @@ class CredentialsRepository:
         Usage example:
         self.cred_repo.update_credentials(cred_id=credentials.id, password=new_hashed_password)
         """
-        cred = self.read_db_session.query(Credentials).filter_by(id=cred_id).first()
-        
-        if not cred:
-            return None
-
-        cred = self.write_db_session.merge(cred)
-
-        for key, value in kwargs.items():
-            setattr(cred, key, value)
-
-        self.write_db_session.commit()
-        self.write_db_session.refresh(cred)
-
-        return cred
+        if "email" in kwargs:
+            # Lookups cached under the old address must go as well
+            old_email = self.write_db_session.scalar(select(Credentials.email).where(Credentials.id == cred_id))
+            if old_email is not None:
+                invalidate_after_commit(self.write_db_session, f"email:{old_email}")
+        # One UPDATE ... RETURNING on the primary, no replica read, merge or refresh
+        credentials = self.write_db_session.execute(
+            update(Credentials).where(Credentials.id == cred_id).values(**kwargs).returning(Credentials)
+        ).scalar_one_or_none()
+        if credentials is not None:
+            invalidate_after_commit(self.write_db_session, f"email:{credentials.email}")
+        return credentials
@@ -8,9 +8,12 @@ implementing business logic and validation on top of the data access layer.
 
 import random
 import string
+from typing import Optional
+from sqlalchemy import Row
 from blueprints.users.credentials_repository import CredentialsRepository
-import bcrypt
 from blueprints.users.models import Credentials
+from core.hashers import hash_password
+from core.session_index import SessionIndex, revoke_after_commit
 
 
 class CredentialsService:
@@ -22,15 +25,43 @@ class CredentialsService:
     the data access layer to enforce domain rules.
     """
 
-    def __init__(self, cred_repo: CredentialsRepository):
+    def __init__(self, cred_repo: CredentialsRepository, session_index: Optional[SessionIndex] = None):
         """
         Initialize with a repository instance.
         
         :param cred_repo: Repository providing data access operations
         :type cred_repo: CredentialsRepository
+        :param session_index: Index of the users' sessions, None leaves sessions untouched on password changes
+        :type session_index: Optional[SessionIndex]
         :return: None
         """
         self.cred_repo = cred_repo
+        self.session_index = session_index
+
+    def revoke_sessions(self, user_id: int, keep_session_id: Optional[str] = None) -> int:
+        """
+        Log a user out everywhere.
+        
+        :param user_id: Unique identifier of the user
+        :type user_id: int
+        :param keep_session_id: Session that stays logged in, e.g. the one changing the password
+        :type keep_session_id: Optional[str]
+        :return: Number of sessions ended
+        :rtype: int
+
+        Usage example:
+        revoked = cred_service.revoke_sessions(user_id=user_id)
+        """
+        if self.session_index is None:
+            return 0
+        return self.session_index.revoke_all(user_id, keep_session_id=keep_session_id)
+
+    def _revoke_sessions_after_commit(self, user_id: int, keep_session_id: Optional[str] = None) -> None:
+        """Log a user out everywhere once the current write transaction commits."""
+        if self.session_index is not None:
+            revoke_after_commit(
+                self.cred_repo.write_db_session, self.session_index, user_id, keep_session_id=keep_session_id
+            )
 
     def validate_and_hash_pw(self,password:str, password_length:int = 8) -> str:
         """
@@ -43,6 +74,7 @@ class CredentialsService:
         :return: Securely hashed password string
         :rtype: str
         :raises ValueError: If password is empty or too short
+        :raises HashingPoolBusyError: If the hashing pool is saturated
 
         Usage example:
         new_hashed_password = self.validate_and_hash_pw(new_password)
@@ -51,8 +83,7 @@ class CredentialsService:
             raise ValueError("Password cannot be empty")
         if len(password) < password_length:
             raise ValueError(f"Password cannot be shorter than {password_length}")
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-        return hashed_password.decode("utf-8")
+        return hash_password(password)
 
     def get_credentials_via_email(self,email:str) -> Credentials:
         """
@@ -73,6 +104,25 @@ class CredentialsService:
             raise Exception ("credentials not found")
         return credentials
     
+    def get_login_details_via_email(self, email: str) -> Row:
+        """
+        Retrieve credentials ID, password hash, user ID and MFA flag in one query.
+        
+        :param email: User's email address
+        :type email: str
+        :return: Row with credentials_id, password, user_id and mfa_enabled
+        :rtype: Row
+        :raises Exception: If credentials not found
+
+        Usage example:
+        login = self.cred_service.get_login_details_via_email(email=email)
+        """
+        login = self.cred_repo.get_login_details_by_email(email=email)
+
+        if not login:
+            raise Exception("credentials not found")
+        return login
+    
     def get_email_by_userid(self,user_id:int) -> str:
         """
         Retrieve email address using user ID.
@@ -111,12 +161,14 @@ class CredentialsService:
         random_password = ''.join(random.choice(characters) for _ in range(length))
         return random_password
     
-    def reset_password(self,email:str) -> str:
+    def reset_password(self,email:str, user_id: Optional[int] = None) -> str:
         """
         Reset a user's password to a new random password.
         
         :param email: User's email address
         :type email: str
+        :param user_id: Unique identifier of the user, whose sessions are all ended once the change commits
+        :type user_id: Optional[int]
         :return: New plain text password (should be transmitted securely)
         :rtype: str
         :raises ValueError: If no credentials found for the email
@@ -130,10 +182,33 @@ class CredentialsService:
         new_password= self.generate_random_password()
         new_hashed_password = self.validate_and_hash_pw(new_password)
         self.cred_repo.update_credentials(cred_id=credentials.id, password=new_hashed_password)
+        if user_id is not None:
+            self._revoke_sessions_after_commit(user_id)
         return new_password
 
 
 
+    def rehash_password(self, cred_id: int, password: str) -> None:
+        """
+        Store a fresh hash of an already verified password.
+        
+        Used to migrate stored hashes to the default hasher and parameters
+        without requiring a password reset. The update runs in a savepoint,
+        so a failure leaves the rest of the login transaction usable.
+        
+        :param cred_id: Unique identifier of the credentials record
+        :type cred_id: int
+        :param password: Verified plain text password
+        :type password: str
+        :return: None
+
+        Usage example:
+        cred_service.rehash_password(cred_id=cred.id, password=password)
+        """
+        new_hashed_password = hash_password(password)
+        with self.cred_repo.savepoint():
+            self.cred_repo.update_credentials(cred_id=cred_id, password=new_hashed_password)
+
     def create_credentials(self, email: str, password: str) -> int:
         """
         Register new user credentials after validation.
@@ -159,9 +234,11 @@ class CredentialsService:
         return cred_id
 
 
-    def change_password(self, user_id: int, new_password: str, confirm_new_password: str) -> None:
+    def change_password(
+        self, user_id: int, new_password: str, confirm_new_password: str, keep_session_id: Optional[str] = None
+    ) -> None:
         """
-        Change password for a given user with validation.
+        Change password for a given user with validation and end the user's other sessions after the commit.
         
         :param user_id: Unique identifier of the user
         :type user_id: int
@@ -169,6 +246,8 @@ class CredentialsService:
         :type new_password: str
         :param confirm_new_password: Confirmation of new password
         :type confirm_new_password: str
+        :param keep_session_id: Session that stays logged in, usually the current one
+        :type keep_session_id: Optional[str]
         :return: None
         :raises ValueError: If user not found or passwords don't match
 
@@ -185,3 +264,4 @@ class CredentialsService:
 
         new_hashed_password = self.validate_and_hash_pw(new_password)
         self.cred_repo.update_credentials(cred_id=cred.id, password=new_hashed_password)
+        self._revoke_sessions_after_commit(user_id, keep_session_id=keep_session_id)
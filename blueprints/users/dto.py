@@ -0,0 +1,60 @@
+"""
+User Lookup Result Module.
+
+This module defines the compact, immutable results returned by the hot
+read lookups of the user repositories. Unlike ORM entities they carry no
+session state or identity map entry, only the columns the callers use,
+so building one per request is cheap.
+
+The classes are frozen dataclasses with explicit ``__slots__`` (Python
+3.9 has no ``dataclass(slots=True)``), so fields have no defaults.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class UserName:
+    """
+    First and last name of a user.
+
+    Attributes:
+        first_name (str): User's first name
+        last_name (str): User's last name
+    """
+    __slots__ = ("first_name", "last_name")
+
+    first_name: str
+    last_name: str
+
+
+@dataclass(frozen=True)
+class MFADetails:
+    """
+    MFA entry of a user.
+
+    Attributes:
+        id (int): Primary key of the MFA entry
+        totp_secret (str): Time-based One-Time Password secret key
+    """
+    __slots__ = ("id", "totp_secret")
+
+    id: int
+    totp_secret: str
+
+
+@dataclass(frozen=True)
+class CredentialsDetails:
+    """
+    Credentials of a user.
+
+    Attributes:
+        id (int): Primary key of the credentials
+        email (str): User's email address
+        password (str): Hashed password
+    """
+    __slots__ = ("id", "email", "password")
+
+    id: int
+    email: str
+    password: str
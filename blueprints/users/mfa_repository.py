@@ -3,13 +3,24 @@ Multi-Factor Authentication Repository Module.
 
 This module provides data access operations for MFA functionality,
 implementing read/write separation for secure authentication operations.
+Write operations only flush; the request's unit of work commits once.
 
 """
 
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session, contains_eager
 
+from blueprints.users.dto import MFADetails
 from blueprints.users.models import MFA, Credentials, User
+from core.cache import invalidate_after_commit
+
+# Built once at import, hot lookups run them through the read session's fast path
+_MFA_BY_USER_ID = (
+    select(MFA.id, MFA.totp_secret)
+    .join(User, User.mfa_id == MFA.id)
+    .where(User.id == bindparam("user_id"))
+)
 
 class MFARepository():
     """
@@ -36,18 +47,20 @@ class MFARepository():
         self.read_db_session = read_db_session
 
 
-    def get_mfa_details_by_user_id(self, user_id:int) -> Optional[MFA]:
+    # Carries the TOTP secret, so it is never cached
+    def get_mfa_details_by_user_id(self, user_id:int) -> Optional[MFADetails]:
         """
         Fetch MFA details by user ID (Read-Only).
         
         :param user_id: Unique identifier of the user
         :type user_id: int
-        :return: MFA object if found, None otherwise
-        :rtype: Optional[MFA]
+        :return: MFA ID and TOTP secret if found, None otherwise
+        :rtype: Optional[MFADetails]
         Usage example:
         mfa = self.get_mfa_details_by_user_id(user_id)
         """
-        return self.read_db_session.query(MFA).join(User,User.mfa_id == MFA.id).filter(User.id == user_id).first()
+        row = self.read_db_session.fetch_one(_MFA_BY_USER_ID, {"user_id": user_id})
+        return MFADetails(*row) if row else None
     
 
     
@@ -67,6 +80,8 @@ class MFARepository():
             self.read_db_session.query(User) 
             .join(Credentials, User.credentials_id == Credentials.id)
             .join(MFA, User.mfa_id == MFA.id)
+            # The MFA row is already joined, populate user.mfa from it
+            .options(contains_eager(User.mfa))
             .filter(Credentials.email == email)
             .first()
         )
@@ -98,7 +113,6 @@ class MFARepository():
         """
         mfa = MFA(totp_secret = totp_secret)
         self.write_db_session.add(mfa)
-        self.write_db_session.commit()
         self.write_db_session.flush()
         return mfa.id
     
@@ -115,9 +129,11 @@ class MFARepository():
         """
         mfa = self.get_mfa_details(mfa_id)
         if mfa:
+            user_ids = self.write_db_session.scalars(select(User.id).where(User.mfa_id == mfa_id)).all()
+            invalidate_after_commit(self.write_db_session, *(f"user:{user_id}" for user_id in user_ids))
             mfa = self.write_db_session.merge(mfa)
             self.write_db_session.delete(mfa)
-            self.write_db_session.commit()
+            self.write_db_session.flush()
     
     def update_mfa_secret(self, user_id: int, totp_secret: str) -> Optional[MFA]:
         """
@@ -131,14 +147,10 @@ class MFARepository():
         :rtype: Optional[MFA]
 
         Usage example:
-        updated_mfa = self.mfa_repo.update_mfa_secret(user_id=user_id, otp_secret=new_totp_secret)
+        updated_mfa = self.mfa_repo.update_mfa_secret(user_id=user_id, totp_secret=new_totp_secret)
         """
-        mfa = self.get_mfa_details_by_user_id(user_id)
-        if not mfa:
-            return None
-
-        mfa.totp_secret = totp_secret
-        self.write_db_session.commit()
-        self.write_db_session.refresh(mfa)
-        
-        return mfa
+        invalidate_after_commit(self.write_db_session, f"user:{user_id}")
+        mfa_id = select(User.mfa_id).where(User.id == user_id).scalar_subquery()
+        return self.write_db_session.execute(
+            update(MFA).where(MFA.id == mfa_id).values(totp_secret=totp_secret).returning(MFA)
+        ).scalar_one_or_none()
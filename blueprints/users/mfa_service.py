@@ -106,7 +106,7 @@ class MFAservice:
         :raises ValueError: If failed to update MFA secret
         """
         new_totp_secret = self.create_totp_secret()
-        updated_mfa = self.mfa_repo.update_mfa_secret(user_id=user_id, otp_secret=new_totp_secret)
+        updated_mfa = self.mfa_repo.update_mfa_secret(user_id=user_id, totp_secret=new_totp_secret)
         if not updated_mfa:
             raise ValueError(f"Failed to update MFA secret for user {user_id}")
         
@@ -7,6 +7,13 @@ User profiles, Credentials, and Multi-Factor Authentication data.
 The models use SQLAlchemy ORM and include relationship definitions
 to ensure proper cascading behavior for data integrity.
 
+Relationships are never traversed implicitly: read sessions apply
+raiseload('*'), so code that needs related rows loads them explicitly
+with selectinload() or joinedload(). The reverse sides rely on the
+database's ON DELETE rules (passive_deletes) instead of loading the
+referencing user before a delete. SQLite only applies those rules with
+foreign keys enabled, which core.engines.build_engine does.
+
 """
 
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
@@ -47,8 +54,8 @@ class User(Base, TimestampMixin):
     mfa_id = Column(Integer, ForeignKey("mfa.id", ondelete="SET NULL"), nullable=True, unique=True)
 
     # Relationships
-    credentials = relationship("Credentials", back_populates="user", uselist=False, cascade="all, delete")
-    mfa = relationship("MFA", back_populates="user", uselist=False, cascade="all, delete")
+    credentials = relationship("Credentials", back_populates="user", uselist=False, cascade="all, delete", lazy="select")
+    mfa = relationship("MFA", back_populates="user", uselist=False, cascade="all, delete", lazy="select")
 
 
 
@@ -75,7 +82,7 @@ class Credentials(Base, TimestampMixin):
     last_login = Column(DateTime, nullable=True)
 
     # Relationship
-    user = relationship("User", back_populates="credentials", uselist=False)
+    user = relationship("User", back_populates="credentials", uselist=False, lazy="select", passive_deletes=True)
 
 
 class MFA(Base, TimestampMixin):
@@ -97,5 +104,5 @@ class MFA(Base, TimestampMixin):
     totp_secret = Column(String(100), nullable=True) 
 
     # Relationship
-    user = relationship("User", back_populates="mfa", uselist=False)
+    user = relationship("User", back_populates="mfa", uselist=False, lazy="select", passive_deletes=True)
 
@@ -3,12 +3,27 @@ User Repository Module.
 
 This module provides data access operations for User entities,
 implementing read/write separation for security and performance.
+Write operations only flush; the request's unit of work commits once.
 
 """
 
+from dataclasses import astuple
+from datetime import datetime
 from typing import Optional
-from blueprints.users.models import Credentials, User
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, literal, null, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from blueprints.users.dto import UserName
+from core.cache import cached, invalidate_after_commit
+from blueprints.users.models import MFA, Credentials, User
+from sqlalchemy.orm import Session, selectinload
+
+# Built once at import, hot lookups run them through the read session's fast path
+_USERID_BY_EMAIL = (
+    select(User.id)
+    .join(Credentials, Credentials.id == User.credentials_id)
+    .where(Credentials.email == bindparam("email"))
+)
+_USERNAME_BY_USERID = select(User.first_name, User.last_name).where(User.id == bindparam("user_id"))
 
 
 class UserRepository:
@@ -47,7 +62,8 @@ class UserRepository:
         """
         return self.read_db_session.query(User).filter(User.id == user_id).first()
     
-    def get_userid_by_email(self,email:str) -> int:
+    @cached(tags=("email:{email}",))
+    def get_userid_by_email(self,email:str) -> Optional[int]:
         """
         Fetch user ID by email address (Read-Only).
         
@@ -59,26 +75,24 @@ class UserRepository:
         Usage example:
         user_id = self.user_repo.get_userid_by_email(email=email)
         """
-        return (self.read_db_session.query(User.id)
-                .join(Credentials, Credentials.id == User.credentials_id)
-                .filter(Credentials.email == email)
-                .first())
+        row = self.read_db_session.fetch_one(_USERID_BY_EMAIL, {"email": email})
+        return row[0] if row else None
     
-    def get_username_by_userid(self, user_id: int) -> Optional[tuple[str, str]]:
+    @cached(tags=("user:{user_id}",), encode=astuple, decode=lambda data: UserName(*data))
+    def get_username_by_userid(self, user_id: int) -> Optional[UserName]:
         """
         Fetch first and last name by user ID (Read-Only).
         
         :param user_id: Unique identifier of the user
         :type user_id: int
-        :return: Tuple containing (first_name, last_name) if found, None otherwise
-        :rtype: Optional[Tuple[str, str]]
+        :return: First and last name if found, None otherwise
+        :rtype: Optional[UserName]
 
         Usage example:
         full_name = self.user_repo.get_username_by_userid(user_id=user_id)
         """
-        return (self.read_db_session.query(User.first_name, User.last_name)
-                .filter(User.id == user_id)
-                .first())
+        row = self.read_db_session.fetch_one(_USERNAME_BY_USERID, {"user_id": user_id})
+        return UserName(*row) if row else None
     
 
     
@@ -136,11 +150,102 @@ class UserRepository:
         """
         new_user = User(**kwargs)
         self.write_db_session.add(new_user)
-        self.write_db_session.commit()
-        self.write_db_session.refresh(new_user)
+        self.write_db_session.flush()
         return new_user.id
 
-        
+    def register_user(
+        self,
+        email: str,
+        password: str,
+        totp_secret: Optional[str],
+        first_name: str,
+        last_name: str,
+        country: Optional[str],
+        dob: Optional[datetime],
+    ) -> Optional[int]:
+        """
+        Insert credentials, optional MFA and the user row (Write Operation).
+
+        On Postgres this is a single statement chaining the inserts through
+        data-modifying CTEs. Duplicate emails are detected by the unique
+        index on credentials.email (ON CONFLICT DO NOTHING), so concurrent
+        registrations cannot race past a separate existence check.
+
+        :param email: User's email address
+        :type email: str
+        :param password: Hashed password
+        :type password: str
+        :param totp_secret: TOTP secret for a new MFA entry, None to register without MFA
+        :type totp_secret: Optional[str]
+        :param first_name: User's first name
+        :type first_name: str
+        :param last_name: User's last name
+        :type last_name: str
+        :param country: Optional country code
+        :type country: Optional[str]
+        :param dob: Optional date of birth
+        :type dob: Optional[datetime]
+        :return: ID of the new user, None if the email is already registered
+        :rtype: Optional[int]
+
+        Usage example:
+        user_id = self.user_repo.register_user(
+            email=email,
+            password=hashed_password,
+            totp_secret=totp_secret,
+            first_name=first_name,
+            last_name=last_name,
+            country=country,
+            dob=dob
+        )
+        """
+        profile = {"first_name": first_name, "last_name": last_name, "country": country, "dob": dob}
+        if self.write_db_session.get_bind().dialect.name == "postgresql":
+            return self.write_db_session.execute(
+                self._register_user_statement(email, password, totp_secret, profile)
+            ).scalar_one_or_none()
+
+        # SQLite (local development) has no data-modifying CTEs, run the same inserts one by one
+        cred_id = self.write_db_session.execute(
+            sqlite.insert(Credentials)
+            .values(email=email, password=password)
+            .on_conflict_do_nothing(index_elements=[Credentials.email])
+            .returning(Credentials.id)
+        ).scalar_one_or_none()
+        if cred_id is None:
+            return None
+        mfa_id = None
+        if totp_secret is not None:
+            mfa_id = self.write_db_session.execute(
+                sqlite.insert(MFA).values(totp_secret=totp_secret).returning(MFA.id)
+            ).scalar_one()
+        return self.write_db_session.execute(
+            sqlite.insert(User).values(**profile, credentials_id=cred_id, mfa_id=mfa_id).returning(User.id)
+        ).scalar_one()
+
+    @staticmethod
+    def _register_user_statement(email: str, password: str, totp_secret: Optional[str], profile: dict):
+        """Build the Postgres registration statement: WITH new_cred, new_mfa INSERT INTO users."""
+        new_cred = (postgresql.insert(Credentials)
+                    .values(email=email, password=password)
+                    .on_conflict_do_nothing(index_elements=[Credentials.email])
+                    .returning(Credentials.id)
+                    .cte("new_cred"))
+        mfa_id = null()
+        if totp_secret is not None:
+            # Selecting from new_cred skips the MFA insert when the email already exists
+            new_mfa = (postgresql.insert(MFA)
+                       .from_select([MFA.totp_secret], select(literal(totp_secret)).select_from(new_cred))
+                       .returning(MFA.id)
+                       .cte("new_mfa"))
+            mfa_id = select(new_mfa.c.id).scalar_subquery()
+
+        columns = list(profile)
+        values = [literal(profile[column], User.__table__.c[column].type) for column in columns]
+        return (postgresql.insert(User)
+                .from_select([*columns, "credentials_id", "mfa_id"], select(*values, new_cred.c.id, mfa_id))
+                .returning(User.id))
+
     def delete(self, user_id: int):
         """
         Permanently delete a user by ID (Write Operation).
@@ -155,10 +260,16 @@ class UserRepository:
         Usage example:
         return self.user_repo.delete(user_id)
         """
-        user = self.get_user_by_id(user_id)
+        # The delete cascades to credentials and MFA, so load them with the user
+        user = self.write_db_session.get(
+            User, user_id, options=[selectinload(User.credentials), selectinload(User.mfa)]
+        )
         if user:
+            invalidate_after_commit(self.write_db_session, f"user:{user_id}")
+            if user.credentials is not None:
+                invalidate_after_commit(self.write_db_session, f"email:{user.credentials.email}")
             self.write_db_session.delete(user)
-            self.write_db_session.commit()
+            self.write_db_session.flush()
         return True
 
     def update(self, user_id: int, **kwargs) -> Optional[User]:
@@ -175,15 +286,7 @@ class UserRepository:
         Usage example:
         self.user_repo.update(user_id=user_id, mfa_id=mfa_id) 
         """
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return None  
-
-        for key, value in kwargs.items():
-            setattr(user, key, value)
-            
-        user = self.write_db_session.merge(user)
-        self.write_db_session.commit()
-        self.write_db_session.refresh(user) 
-        
-        return user
+        invalidate_after_commit(self.write_db_session, f"user:{user_id}")
+        return self.write_db_session.execute(
+            update(User).where(User.id == user_id).values(**kwargs).returning(User)
+        ).scalar_one_or_none()
@@ -62,9 +62,7 @@ class UserService:
         if not email:
             raise ValueError("Email is required")
         
-        user_id = self.user_repo.get_userid_by_email(email=email)
-
-        return user_id[0] if user_id else None 
+        return self.user_repo.get_userid_by_email(email=email)
     
     def get_username_by_userid(self, user_id: int) -> str:
         """
@@ -87,7 +85,7 @@ class UserService:
         if not full_name:
             raise ValueError(f"User with ID {user_id} not found.")
 
-        first_name, last_name = full_name
+        first_name, last_name = full_name.first_name, full_name.last_name
         if not first_name or not last_name:
             raise ValueError(f"Incomplete name data for user ID {user_id}.")
 
@@ -132,31 +130,29 @@ class UserService:
         :type dob: Optional[str]
         :return: ID of the newly created user
         :rtype: int
-        :raises ValueError: If required fields are empty or invalid
-        :raises RuntimeError: If user creation fails
+        :raises ValueError: If required fields are empty or invalid, or the email is already registered
 
         Usage example:
         user_service.create_user(**data)
         """
         if not is_valid_string_value(first_name) or not is_valid_string_value(last_name) or not is_valid_string_value(email):
             raise ValueError("First and last name cannot be empty")
-        if self.user_repo.get_user_by_email(email):
-            raise ValueError("Email is already registered")
         
         dob = None if not dob or dob.strip() == "" else datetime.strptime(dob, "%Y-%m-%d")
-        cred_id = self.cred_service.create_credentials(email = email,password=password)
-        mfa_enabled = mfa_enabled.lower() == "true"
-        mfa_id = self.mfa_service.create_mfa_entry() if mfa_enabled else None
-        user_id = self.user_repo.create_user(
+        hashed_password = self.cred_service.validate_and_hash_pw(password)
+        totp_secret = self.mfa_service.create_totp_secret() if mfa_enabled.lower() == "true" else None
+        # Duplicate emails are caught by the unique index in the same statement, not by a prior lookup
+        user_id = self.user_repo.register_user(
+            email=email,
+            password=hashed_password,
+            totp_secret=totp_secret,
             first_name=first_name,
             last_name=last_name,
             country=country,
-            dob=dob,
-            credentials_id = cred_id,
-            mfa_id = mfa_id
+            dob=dob
         )
         if not user_id:
-            raise RuntimeError("Error creating user")
+            raise ValueError("Email is already registered")
         return user_id
 
     def activate_mfa(self, user_id: int) -> None:
@@ -21,7 +21,9 @@ Routes:
 
 from flask import Blueprint, abort, redirect, render_template, request, session, url_for, jsonify
 from core.di import create_credentials_service, create_mfa_service, create_user_service
-from core.database import get_read_db, get_write_db
+from core.database import unit_of_work
+from core.hash_pool import HashingPoolBusyError
+from core.session_index import current_session_id, unregister_session
 
 
 users = Blueprint(
@@ -56,10 +58,12 @@ def create_user():
     """
     try:
         data = request.form.to_dict()
-        with get_write_db() as write_db, get_read_db() as read_db:
-            user_service = create_user_service(write_db=write_db, read_db=read_db)
+        with unit_of_work() as uow:
+            user_service = create_user_service(write_db=uow.write_db, read_db=uow.read_db)
             user_service.create_user(**data)
             return redirect(url_for('users.login'))
+    except HashingPoolBusyError:
+        return jsonify({"error": "Service busy. Please try again shortly."}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -72,20 +76,20 @@ def show_qrcode():
     multi-factor authentication setup.
     """
     try:
-        with get_write_db() as write_db, get_read_db() as read_db:
+        with unit_of_work() as uow:
             # retrieve user details via user_id
             user_id = session.get("user_id")
             if not user_id:
                 return jsonify({"error": "User not authenticated"}), 401
                 
-            user_service = create_user_service(write_db=write_db, read_db=read_db)
+            user_service = create_user_service(write_db=uow.write_db, read_db=uow.read_db)
             user = user_service.get_user_by_id(user_id)
             if not user:
                 return jsonify({"error": "User not found"}), 404
             
             # show name and create qrcode
             name = f"{user.last_name} {user.first_name}"
-            mfa_service = create_mfa_service(write_db=write_db, read_db=read_db)
+            mfa_service = create_mfa_service(write_db=uow.write_db, read_db=uow.read_db)
             qr_data = mfa_service.create_qrcode_totp(name=name, user_id=user_id)
             
             return render_template(
@@ -106,20 +110,20 @@ def activate_mfa():
     and generates a QR code for setup.
     """
     try:
-        with get_write_db() as write_db, get_read_db() as read_db:
+        with unit_of_work() as uow:
             # retrieve user details via user_id
             user_id = session.get("user_id")
             if not user_id:
                 return jsonify({"error": "User not authenticated"}), 401
                 
-            user_service = create_user_service(write_db=write_db, read_db=read_db)
+            user_service = create_user_service(write_db=uow.write_db, read_db=uow.read_db)
             user = user_service.get_user_by_id(user_id)
             if not user:
                 return jsonify({"error": "User not found"}), 404
             
             # create qrcode
             name = f"{user.last_name} {user.first_name}"
-            mfa_service = create_mfa_service(write_db=write_db, read_db=read_db)
+            mfa_service = create_mfa_service(write_db=uow.write_db, read_db=uow.read_db)
             user_service.activate_mfa(user_id)
             qr_data = mfa_service.create_qrcode_totp(name=name, user_id=user_id)
             
@@ -140,6 +144,7 @@ def logout():
     Redirects to login page.
     """
     try:
+        unregister_session(session.get("user_id"))
         session.clear()
         return redirect(url_for("users.login"))
     except Exception as e:
@@ -154,12 +159,12 @@ def deactivate_mfa():
     and redirects to login page.
     """
     try:
-        with get_write_db() as write_db, get_read_db() as read_db:
+        with unit_of_work() as uow:
             user_id = session.get("user_id")
             if not user_id:
                 return jsonify({"error": "User not authenticated"}), 401
                 
-            mfa_service = create_mfa_service(write_db=write_db, read_db=read_db)
+            mfa_service = create_mfa_service(write_db=uow.write_db, read_db=uow.read_db)
             # delete mfa details of a user via user_id
             mfa_service.deactivate_mfa(user_id=user_id)
             return redirect(url_for("users.login"))
@@ -190,15 +195,16 @@ def reset_password():
     In production, would send new password via email.
     """
     try:
-        with get_write_db() as write_db, get_read_db() as read_db:
-            cred_service = create_credentials_service(write_db=write_db, read_db=read_db)
+        with unit_of_work() as uow:
+            cred_service = create_credentials_service(write_db=uow.write_db, read_db=uow.read_db)
             user_id = session.get("user_id")
             if not user_id:
                 return jsonify({"error": "User not authenticated"}), 401
                 
             email = cred_service.get_email_by_userid(user_id)
             # Reset password using email
-            new_password = cred_service.reset_password(email=email)
+            # Ends every session of the user, including this one
+            new_password = cred_service.reset_password(email=email, user_id=user_id)
             session.clear()
 
             return f"{new_password} is your new password in the demo session. In prod, it will be sent to your email."
@@ -227,8 +233,8 @@ def change_password():
         if not user_id:
             return jsonify({"error": "User not authenticated"}), 401
             
-        with get_write_db() as write_db, get_read_db() as read_db:
-            cred_service = create_credentials_service(write_db=write_db, read_db=read_db)
+        with unit_of_work() as uow:
+            cred_service = create_credentials_service(write_db=uow.write_db, read_db=uow.read_db)
             # Password confirmation
             new_password = request.form.get("newpassword")
             confirm_new_password = request.form.get("confirmpassword")
@@ -237,10 +243,12 @@ def change_password():
                 return jsonify({"error": "Missing required password fields"}), 400
                 
             # Change password
+            # Other sessions of the user are logged out, this one stays
             cred_service.change_password(
                 user_id=user_id,
                 new_password=new_password,
-                confirm_new_password=confirm_new_password
+                confirm_new_password=confirm_new_password,
+                keep_session_id=current_session_id()
             )
             return redirect(url_for('dashboard.user_dashboard'))
     except Exception as e:
@@ -0,0 +1,525 @@
+"""
+Two-Tier Read Cache Module.
+
+This module caches the results of hot repository read methods in two
+tiers: a per-worker in-process LRU with a short TTL, and a Redis tier
+shared by all workers.
+
+Entries are grouped by tags such as ``user:42`` or ``email:a@b.c``.
+Every tag has a version, and the version is part of the cache key.
+Write methods bump the versions of the tags they touch once the write
+transaction has committed (see :func:`invalidate_after_commit`).
+Entries built from the old data then simply stop being found, which
+also covers readers that raced the write. The in-process tier only
+learns about bumps made by its own worker, so other workers may serve
+an entry for up to CACHE_LOCAL_TTL seconds after a write.
+
+A bump also records the primary's WAL position after the commit. For
+CACHE_FILL_GUARD_TTL seconds afterwards, a miss on the bumped tags only
+fills the cache if the loading read session has replayed past that
+position. A lagging replica's answer is still returned, but it is not
+stored under the new version.
+
+Only non-secret profile data is cached. Lookups returning password
+hashes or TOTP secrets always query the database, so neither Redis nor
+the worker memory ever holds them.
+
+Concurrent misses for the same key are coalesced: within a worker,
+followers wait for the leader's result, and across workers a short
+Redis lock lets one worker query the database while the others poll
+Redis for the value.
+
+Configuration (environment variables):
+    - CACHE_ENABLED: Set to false to bypass the cache (default: true)
+    - CACHE_REDIS_URL: Separate Redis for the shared tier, otherwise the shared pool of REDIS_URL is used (shared tier disabled if neither is set)
+    - CACHE_LOCAL_SIZE: Entries kept per worker (default: 10000)
+    - CACHE_LOCAL_TTL: Seconds an in-process entry is served (default: 5)
+    - CACHE_REDIS_TTL: Seconds a Redis entry is kept (default: 300)
+    - CACHE_LOCK_TIMEOUT_MS: How long other workers wait for a loading worker (default: 500)
+    - CACHE_FILL_GUARD_TTL: Seconds after a bump during which fills must have seen the write (default: 30)
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import redis
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.database import SessionWrite, current_wal_lsn, has_replayed
+from core.init_redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS = Counter("cache_hits_total", "Cache hits by tier", ["cache", "tier"])
+CACHE_MISSES = Counter("cache_misses_total", "Lookups that had to query the database", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "In-process entries evicted to make room", ["cache"])
+CACHE_COALESCED = Counter("cache_coalesced_total", "Misses served by another caller's database query", ["cache"])
+CACHE_STALE_FILLS = Counter(
+    "cache_stale_fills_total", "Misses not stored because the read session had not seen a recent write", ["cache"]
+)
+CACHE_ERRORS = Counter("cache_redis_errors_total", "Redis errors, the lookup then falls through to the database", ["cache"])
+
+INVALIDATIONS_KEY = "cache_invalidations"
+
+
+def _lsn_order(lsn: str) -> int:
+    """Sort key of a Postgres LSN such as "1/A0B1C2D3"."""
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class _InFlight:
+    """A database load that concurrent callers for the same key wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.failed = False
+
+
+class TwoTierCache:
+    """
+    In-process LRU+TTL cache in front of a shared, versioned Redis cache.
+
+    Values are stored in Redis as JSON produced by the caller's ``encode``
+    function, and rebuilt with ``decode``. ``None`` results are never
+    cached, so newly created rows are visible immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 10000,
+        local_ttl: float = 5.0,
+        redis_ttl: int = 300,
+        lock_timeout_ms: int = 500,
+        redis_client: Optional[Callable[[], Optional[redis.Redis]]] = None,
+        fill_guard_ttl: int = 30,
+    ) -> None:
+        """
+        Initialize an empty cache.
+
+        :param name: Cache name, used in Redis keys and metric labels
+        :type name: str
+        :param maxsize: Maximum in-process entries
+        :type maxsize: int
+        :param local_ttl: Seconds an in-process entry is served
+        :type local_ttl: float
+        :param redis_ttl: Seconds a Redis entry is kept
+        :type redis_ttl: int
+        :param lock_timeout_ms: How long other workers wait for a loading worker
+        :type lock_timeout_ms: int
+        :param redis_client: Function returning the Redis client, or None for no shared tier
+        :type redis_client: Optional[Callable[[], Optional[redis.Redis]]]
+        :param fill_guard_ttl: Seconds after a bump during which fills must have seen the write
+        :type fill_guard_ttl: int
+        :return: None
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.lock_timeout_ms = lock_timeout_ms
+        self.fill_guard_ttl = fill_guard_ttl
+        self._redis_client = redis_client or (lambda: None)
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._local_versions: Dict[str, int] = {}
+        self._local_lsns: Dict[str, Tuple[float, str]] = {}
+        self._inflight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    # In-process tier
+
+    def _local_get(self, key: str) -> Any:
+        """Return a fresh in-process value, None if absent or expired."""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: Any) -> None:
+        """Store a value in-process, evicting the least recently used entries."""
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+                CACHE_EVICTIONS.labels(cache=self.name).inc()
+
+    # Shared tier
+
+    def _redis(self) -> Optional[redis.Redis]:
+        """Return the Redis client, None if the shared tier is disabled."""
+        return self._redis_client()
+
+    def _version_key(self, tag: str) -> str:
+        return f"cache:{self.name}:ver:{tag}"
+
+    def _lsn_key(self, tag: str) -> str:
+        return f"cache:{self.name}:lsn:{tag}"
+
+    def _redis_versions(self, client: redis.Redis, tags: Sequence[str]) -> List[int]:
+        """Read the current versions of the tags, 0 for tags never bumped."""
+        if not tags:
+            return []
+        return [int(version or 0) for version in client.mget([self._version_key(tag) for tag in tags])]
+
+    def _redis_versions_and_lsns(self, client: redis.Redis, tags: Sequence[str]) -> Tuple[List[int], List[str]]:
+        """Read versions and recent bump LSNs of the tags in one round trip."""
+        if not tags:
+            return [], []
+        values = client.mget([self._version_key(tag) for tag in tags] + [self._lsn_key(tag) for tag in tags])
+        versions = [int(version or 0) for version in values[: len(tags)]]
+        lsns = [lsn.decode() if isinstance(lsn, bytes) else lsn for lsn in values[len(tags):] if lsn]
+        return versions, lsns
+
+    def _local_bump_lsns(self, tags: Sequence[str]) -> List[str]:
+        """Recent bump LSNs this worker recorded for the tags."""
+        now = time.monotonic()
+        with self._lock:
+            entries = [self._local_lsns.get(tag) for tag in tags]
+        return [lsn for expires_at, lsn in filter(None, entries) if expires_at > now]
+
+    def _wait_for_value(self, client: redis.Redis, redis_key: str) -> Optional[bytes]:
+        """Poll Redis for a value another worker is loading."""
+        deadline = time.monotonic() + self.lock_timeout_ms / 1000
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            raw = client.get(redis_key)
+            if raw is not None:
+                return raw
+        return None
+
+    # Public API
+
+    def get_or_load(
+        self,
+        key: str,
+        tags: Sequence[str],
+        loader: Callable[[], Any],
+        encode: Callable[[Any], Any],
+        decode: Callable[[Any], Any],
+        local: bool = True,
+        is_fresh: Optional[Callable[[str], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, loading it on a miss.
+
+        :param key: Key identifying the lookup and its arguments
+        :type key: str
+        :param tags: Tags whose versions the entry depends on
+        :type tags: Sequence[str]
+        :param loader: Function querying the database
+        :type loader: Callable[[], Any]
+        :param encode: Function turning the value into JSON-serializable data
+        :type encode: Callable[[Any], Any]
+        :param decode: Function rebuilding the value from that data
+        :type decode: Callable[[Any], Any]
+        :param local: Whether the in-process tier may serve this lookup
+        :type local: bool
+        :param is_fresh: Function telling whether the loader sees every write up to an LSN, None to always fill
+        :type is_fresh: Optional[Callable[[str], bool]]
+        :return: Cached or freshly loaded value
+        :rtype: Any
+        """
+        local_key = key + "|" + ",".join(f"{tag}@{self._local_versions.get(tag, 0)}" for tag in tags)
+        if local:
+            value = self._local_get(local_key)
+            if value is not None:
+                CACHE_HITS.labels(cache=self.name, tier="local").inc()
+                return value
+
+        with self._lock:
+            call = self._inflight.get(local_key)
+            leader = call is None
+            if leader:
+                call = self._inflight[local_key] = _InFlight()
+
+        if not leader:
+            call.done.wait(self.lock_timeout_ms / 1000)
+            if call.done.is_set() and not call.failed:
+                CACHE_COALESCED.labels(cache=self.name).inc()
+                return call.value
+            return loader()
+
+        try:
+            value, storable = self._load_shared(key, tags, loader, encode, decode, is_fresh)
+            call.value = value
+        except Exception:
+            call.failed = True
+            raise
+        finally:
+            call.done.set()
+            with self._lock:
+                self._inflight.pop(local_key, None)
+
+        if local and storable and value is not None:
+            self._local_set(local_key, value)
+        return value
+
+    def _load_shared(
+        self,
+        key: str,
+        tags: Sequence[str],
+        loader: Callable[[], Any],
+        encode: Callable[[Any], Any],
+        decode: Callable[[Any], Any],
+        is_fresh: Optional[Callable[[str], bool]],
+    ) -> Tuple[Any, bool]:
+        """
+        Serve a lookup from Redis, or load it once across workers and store it.
+
+        Returns the value and whether it may be cached, which it may not if
+        the loader had not yet seen a recent write to one of the tags.
+        """
+        client = self._redis()
+        redis_key = None
+        locked = False
+        lsns = self._local_bump_lsns(tags)
+        if client is not None:
+            try:
+                versions, lsns = self._redis_versions_and_lsns(client, tags)
+                redis_key = f"cache:{self.name}:{key}|" + ",".join(f"{v}" for v in versions)
+                raw = client.get(redis_key)
+                if raw is None:
+                    locked = bool(client.set(redis_key + ":lock", "1", nx=True, px=self.lock_timeout_ms))
+                    if not locked:
+                        raw = self._wait_for_value(client, redis_key)
+                        if raw is not None:
+                            CACHE_COALESCED.labels(cache=self.name).inc()
+                if raw is not None:
+                    CACHE_HITS.labels(cache=self.name, tier="redis").inc()
+                    return decode(json.loads(raw)), True
+            except redis.RedisError as e:
+                CACHE_ERRORS.labels(cache=self.name).inc()
+                logger.warning(f"Cache {self.name} read failed, querying the database: {e}")
+                client = None
+
+        CACHE_MISSES.labels(cache=self.name).inc()
+        # Checked before loading: a replica that has replayed the write also serves it afterwards
+        storable = True
+        if lsns and is_fresh is not None:
+            storable = is_fresh(max(lsns, key=_lsn_order))
+            if not storable:
+                CACHE_STALE_FILLS.labels(cache=self.name).inc()
+        value = loader()
+
+        if client is not None and redis_key is not None:
+            try:
+                if value is not None and storable:
+                    client.set(redis_key, json.dumps(encode(value)), ex=self.redis_ttl)
+                if locked:
+                    client.delete(redis_key + ":lock")
+            except redis.RedisError as e:
+                CACHE_ERRORS.labels(cache=self.name).inc()
+                logger.warning(f"Cache {self.name} write failed: {e}")
+        return value, storable
+
+    def bump(self, *tags: str, lsn: Optional[str] = None) -> None:
+        """
+        Invalidate every entry depending on the given tags.
+
+        :param tags: Tags to bump, e.g. "user:42"
+        :type tags: str
+        :param lsn: WAL position of the committed write, later fills must have replayed it
+        :type lsn: Optional[str]
+        :return: None
+
+        Usage example:
+        profile_cache.bump(f"user:{user_id}")
+        """
+        with self._lock:
+            for tag in tags:
+                self._local_versions[tag] = self._local_versions.get(tag, 0) + 1
+                if lsn:
+                    self._local_lsns[tag] = (time.monotonic() + self.fill_guard_ttl, lsn)
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            for tag in tags:
+                if lsn:
+                    # Set before the version changes, so no fill under the new version misses it
+                    client.set(self._lsn_key(tag), lsn, ex=self.fill_guard_ttl)
+                client.incr(self._version_key(tag))
+                # Versions outlive the entries keyed by them, so a reset cannot resurrect stale data
+                client.expire(self._version_key(tag), self.redis_ttl * 10)
+        except redis.RedisError as e:
+            CACHE_ERRORS.labels(cache=self.name).inc()
+            logger.error(f"Cache {self.name} invalidation of {tags} failed: {e}")
+
+    def tag_version(self, tag: str) -> Optional[int]:
+        """
+        Return the shared version of a tag.
+
+        Callers can store it next to data derived from the tag and compare
+        it later to detect changes. Without Redis there is no version all
+        workers agree on, since each worker only sees its own bumps.
+
+        :param tag: Tag such as "user:42"
+        :type tag: str
+        :return: Version of the tag, None without a shared tier or if Redis could not be reached
+        :rtype: Optional[int]
+
+        Usage example:
+        version = profile_cache.tag_version(f"user:{user_id}")
+        """
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            return self._redis_versions(client, [tag])[0]
+        except redis.RedisError as e:
+            CACHE_ERRORS.labels(cache=self.name).inc()
+            logger.warning(f"Cache {self.name} version read of {tag} failed: {e}")
+            return None
+
+    def clear(self) -> None:
+        """
+        Drop all in-process entries and versions of this worker.
+
+        :return: None
+        """
+        with self._lock:
+            self._local.clear()
+            self._local_versions.clear()
+            self._local_lsns.clear()
+
+
+_redis_client: Optional[redis.Redis] = None
+_redis_pid: Optional[int] = None
+
+
+def get_cache_redis() -> Optional[redis.Redis]:
+    """Return this process' Redis client for the shared tier, None if no URL is configured."""
+    global _redis_client, _redis_pid
+    url = os.getenv("CACHE_REDIS_URL")
+    if not url:
+        return get_redis() if os.getenv("REDIS_URL") else None
+    if _redis_client is None or _redis_pid != os.getpid():
+        _redis_client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        _redis_pid = os.getpid()
+    return _redis_client
+
+
+def _env_enabled() -> bool:
+    return os.getenv("CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+
+profile_cache = TwoTierCache(
+    "profile",
+    maxsize=int(os.getenv("CACHE_LOCAL_SIZE", "10000")),
+    local_ttl=float(os.getenv("CACHE_LOCAL_TTL", "5")),
+    redis_ttl=int(os.getenv("CACHE_REDIS_TTL", "300")),
+    lock_timeout_ms=int(os.getenv("CACHE_LOCK_TIMEOUT_MS", "500")),
+    redis_client=get_cache_redis,
+    fill_guard_ttl=int(os.getenv("CACHE_FILL_GUARD_TTL", "30")),
+)
+CACHE_ENABLED = _env_enabled()
+
+
+def cached(
+    tags: Iterable[str],
+    encode: Callable[[Any], Any] = lambda value: value,
+    decode: Callable[[Any], Any] = lambda data: data,
+    local: bool = True,
+    cache: Optional[TwoTierCache] = None,
+):
+    """
+    Cache a repository read method in the profile cache.
+
+    Tags are format strings filled from the method's arguments. After a
+    recent write, results are only stored if the repository's read
+    session has replayed it.
+
+    :param tags: Tags the result depends on, e.g. ("user:{user_id}",)
+    :type tags: Iterable[str]
+    :param encode: Function turning the result into JSON-serializable data
+    :type encode: Callable[[Any], Any]
+    :param decode: Function rebuilding the result from that data
+    :type decode: Callable[[Any], Any]
+    :param local: Whether the in-process tier may serve this method
+    :type local: bool
+    :param cache: Cache to use, the profile cache by default
+    :type cache: Optional[TwoTierCache]
+    :return: Decorator
+
+    Usage example:
+    @cached(tags=("user:{user_id}",), encode=list, decode=lambda data: UserName(*data))
+    def get_username_by_userid(self, user_id: int) -> Optional[UserName]:
+    """
+    tags = tuple(tags)
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not CACHE_ENABLED:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(list(bound.arguments.items())[1:])
+            key = method.__qualname__ + ":" + ",".join(f"{name}={value}" for name, value in params.items())
+            return (cache or profile_cache).get_or_load(
+                key,
+                [tag.format(**params) for tag in tags],
+                lambda: method(self, *args, **kwargs),
+                encode,
+                decode,
+                local=local,
+                is_fresh=lambda lsn: has_replayed(self.read_db_session, lsn),
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_after_commit(db: Session, *tags: str) -> None:
+    """
+    Bump tags once the write session's transaction commits.
+
+    Bumping before the commit would let a concurrent reader cache the old
+    row under the new version.
+
+    :param db: Write session performing the change
+    :type db: Session
+    :param tags: Tags affected by the change
+    :type tags: str
+    :return: None
+
+    Usage example:
+    invalidate_after_commit(self.write_db_session, f"user:{user_id}")
+    """
+    db.info.setdefault(INVALIDATIONS_KEY, set()).update(tags)
+
+
+@event.listens_for(SessionWrite, "after_commit")
+def _bump_after_commit(db: Session) -> None:
+    """Apply the invalidations collected during the committed transaction."""
+    tags = db.info.pop(INVALIDATIONS_KEY, None)
+    if tags:
+        profile_cache.bump(*tags, lsn=current_wal_lsn(db))
+
+
+@event.listens_for(SessionWrite, "after_soft_rollback")
+def _discard_after_rollback(db: Session, previous_transaction) -> None:
+    """Nothing changed, forget the collected invalidations."""
+    db.info.pop(INVALIDATIONS_KEY, None)
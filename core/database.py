@@ -1,10 +1,16 @@
 import os
+import time
 import logging
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base, raiseload
 from dotenv import load_dotenv
 from contextlib import contextmanager
-from typing import Generator
+from flask import has_request_context, session
+from prometheus_client import Counter
+from sqlalchemy.engine import Engine, Row
+from typing import Callable, Generator, List, Optional
+from core.engines import EngineRegistry, build_engine
+from core.replica_router import ReplicaRouter, create_replica_router
 
 
 load_dotenv()
@@ -16,42 +22,447 @@ logger = logging.getLogger(__name__)
 WRITE_DATABASE_URL = os.getenv("WRITE_DATABASE_URL", "sqlite:///write.db")
 READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "sqlite:///read.db")
 
-# Connection arguments (Fallback for SQLite)
-connect_args = {"check_same_thread": False} if WRITE_DATABASE_URL.startswith("sqlite") else {}
+# Read-your-writes: how long to wait for a replica, and how long a write token stays relevant
+READ_YOUR_WRITES_WAIT_MS = float(os.getenv("READ_YOUR_WRITES_WAIT_MS", "100"))
+READ_YOUR_WRITES_TTL = float(os.getenv("READ_YOUR_WRITES_TTL", "30"))
+LSN_SESSION_KEY = "last_write_lsn"
 
-# Create database engines
-write_engine = create_engine(WRITE_DATABASE_URL, connect_args=connect_args)
-read_engine = create_engine(READ_DATABASE_URL, connect_args=connect_args)
+# Test mode: fail on any implicit lazy load, in write sessions as well as read sessions
+FAIL_ON_LAZY_LOAD = os.getenv("DB_FAIL_ON_LAZY_LOAD", "false").strip().lower() in ("1", "true", "yes", "on")
 
-# Create session factories
-SessionWrite = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
-SessionRead = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+READ_YOUR_WRITES = Counter(
+    "db_read_your_writes_total",
+    "Read sessions that had to honour a write LSN token, by outcome",
+    ["outcome"],
+)
+
+# Engines are built lazily, once per process, pool settings come from the environment (see core.engines).
+# Engines for read sessions start their transactions read-only: psycopg2 sends BEGIN READ ONLY instead
+# of BEGIN, so Postgres refuses writes without an extra statement per transaction.
+READ_ONLY = {"postgresql_readonly": True}
+engines = EngineRegistry()
+engines.register("write", lambda: build_engine(WRITE_DATABASE_URL, prefix="WRITE_DB", label="write"))
+engines.register(
+    "read", lambda: build_engine(READ_DATABASE_URL, prefix="READ_DB", label="read").execution_options(**READ_ONLY)
+)
+# Read sessions that fall back to the primary share its pool
+engines.register("primary_read", lambda: get_write_engine().execution_options(**READ_ONLY))
+# Optional in-app routing across replicas (READ_REPLICA_URLS), replaces READ_DATABASE_URL when set
+engines.register(
+    "replicas",
+    lambda: create_replica_router(
+        lambda url, name: build_engine(url, prefix="REPLICA_DB", label=name).execution_options(**READ_ONLY),
+        primary_lsn=lambda: read_wal_lsn(get_write_engine()),
+    ),
+)
+
+
+class ReadOnlySessionError(RuntimeError):
+    """Raised when code tries to write through a read session."""
+
+
+class LazyLoadError(RuntimeError):
+    """Raised in test mode when a relationship is loaded implicitly."""
+
+
+class ReadOnlySession(Session):
+    """Session for replica reads that never flushes and refuses writes.
+
+    Its engines start every Postgres transaction as BEGIN READ ONLY
+    (READ_ONLY execution options), so the server rejects writes as well. :meth:`fetch_one` and
+    :meth:`fetch_all` run statements through the connection directly,
+    skipping ORM result processing and the identity map, for hot lookups
+    that only need plain rows.
+    """
+
+    def flush(self, objects=None) -> None:
+        """Refuse pending changes instead of sending them to the replica.
+
+        :raises ReadOnlySessionError: If objects were added, modified or deleted
+        """
+        if self.new or self.dirty or self.deleted:
+            raise ReadOnlySessionError("Read sessions cannot write, use the write session")
+
+    def fetch_one(self, statement, params: Optional[dict] = None) -> Optional[Row]:
+        """Execute a Core statement and return its first row, without the ORM.
+
+        :param statement: select() of columns
+        :param params: Bound parameter values
+        :type params: Optional[dict]
+        :return: First row, None if there is none
+        :rtype: Optional[Row]
+
+        Usage example:
+        row = self.read_db_session.fetch_one(select(User.first_name, User.last_name).where(User.id == user_id))
+        """
+        return self.connection().execute(statement, params).first()
+
+    def fetch_all(self, statement, params: Optional[dict] = None) -> List[Row]:
+        """Execute a Core statement and return all rows, without the ORM.
+
+        :param statement: select() of columns
+        :param params: Bound parameter values
+        :type params: Optional[dict]
+        :return: All rows
+        :rtype: List[Row]
+        """
+        return self.connection().execute(statement, params).all()
+
+
+# Create session factories, bound to the current process' engines on each call
+SessionWrite = sessionmaker(autocommit=False, autoflush=False)
+# Read sessions never commit, so loaded objects need not be expired
+SessionRead = sessionmaker(class_=ReadOnlySession, autocommit=False, autoflush=False, expire_on_commit=False)
 
 # Base model class
 Base = declarative_base()
 
+
+def get_write_engine() -> Engine:
+    """Return the primary engine for this process."""
+    return engines.get("write")
+
+
+def get_read_engine() -> Engine:
+    """Return the read-only READ_DATABASE_URL engine for this process."""
+    return engines.get("read")
+
+
+def get_primary_read_engine() -> Engine:
+    """Return a read-only engine on the primary's pool, for reads that cannot use a replica."""
+    return engines.get("primary_read")
+
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """Return the replica router for this process, None if no replicas are configured."""
+    return engines.get("replicas")
+
+
+def reset_engines() -> None:
+    """Drop all engines inherited from a parent process.
+
+    Called from the gunicorn post_fork hook so every worker builds its
+    own connection pools instead of sharing the preloaded master's sockets.
+    """
+    engines.reset()
+
+
+@event.listens_for(SessionWrite, "after_flush")
+def _mark_flush_as_write(db: Session, flush_context) -> None:
+    """Remember that this session sent ORM changes to the primary."""
+    db.info["has_writes"] = True
+
+
+@event.listens_for(SessionWrite, "do_orm_execute")
+def _mark_dml_as_write(orm_execute_state) -> None:
+    """Remember that this session executed an INSERT, UPDATE or DELETE statement."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(SessionRead, "do_orm_execute")
+def _refuse_dml(orm_execute_state) -> None:
+    """Reject INSERT, UPDATE and DELETE statements issued through a read session."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        raise ReadOnlySessionError("Read sessions cannot write, use the write session")
+
+
+@event.listens_for(SessionRead, "do_orm_execute")
+def _raiseload_by_default(orm_execute_state) -> None:
+    """Make relationships not loaded explicitly raise instead of lazy loading.
+
+    Objects from read sessions are used after the session is closed, so
+    a relationship needed by a caller has to be loaded up front with
+    selectinload() or joinedload(); explicit options win over the wildcard.
+    """
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+@event.listens_for(SessionWrite, "do_orm_execute")
+@event.listens_for(SessionRead, "do_orm_execute")
+def _guard_lazy_load(orm_execute_state) -> None:
+    """In test mode, fail any statement emitted by an implicit lazy load."""
+    if FAIL_ON_LAZY_LOAD and orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None:
+        state = orm_execute_state.lazy_loaded_from
+        raise LazyLoadError(f"Implicit lazy load from {state.class_.__name__}, load it explicitly")
+
+
+_REPLAYED_QUERY = text("SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)")
+
+
+def current_wal_lsn(db: Session) -> Optional[str]:
+    """Read the primary's current WAL position on a connection of its own.
+
+    Usable after a commit, when the session itself cannot run queries.
+
+    :param db: Write session, only its bind is used
+    :type db: Session
+    :return: LSN such as "0/16B3748", None outside Postgres or if it could not be read
+    :rtype: Optional[str]
+    """
+    return read_wal_lsn(db.get_bind())
+
+
+def read_wal_lsn(engine: Engine) -> Optional[str]:
+    """Read the current WAL position of the primary behind an engine.
+
+    :param engine: Engine connected to the primary
+    :type engine: Engine
+    :return: LSN such as "0/16B3748", None outside Postgres or if it could not be read
+    :rtype: Optional[str]
+    """
+    if engine.dialect.name != "postgresql":
+        return None
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read the current WAL position: {e}")
+        return None
+
+
+def has_replayed(db: Session, lsn: str) -> bool:
+    """Check whether a read session sees everything up to a WAL position.
+
+    Always true on the primary and outside Postgres.
+
+    :param db: Read session
+    :type db: Session
+    :param lsn: WAL position, e.g. from :func:`current_wal_lsn`
+    :type lsn: str
+    :return: True if reads of the session include every change up to lsn
+    :rtype: bool
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(_REPLAYED_QUERY, {"lsn": lsn}).scalar())
+
+
+def _capture_write_lsn(db: Session) -> None:
+    """Store the primary's WAL position in the user session after a committed write.
+
+    Subsequent read sessions of the same user wait for a replica to replay
+    past this position, or fall back to the primary.
+    """
+    if not db.info.get("has_writes") or not has_request_context():
+        return
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    try:
+        lsn = db.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+    except Exception as e:
+        # The write is already committed, losing the token only risks a stale read
+        logger.warning(f"Could not capture write LSN: {e}")
+        return
+    session[LSN_SESSION_KEY] = {"lsn": lsn, "at": time.time()}
+
+
+def _get_write_lsn() -> Optional[str]:
+    """Return the user's last write LSN if it is still recent enough to matter."""
+    if not has_request_context():
+        return None
+    token = session.get(LSN_SESSION_KEY)
+    if not token:
+        return None
+    if time.time() - token["at"] > READ_YOUR_WRITES_TTL:
+        session.pop(LSN_SESSION_KEY, None)
+        return None
+    return token["lsn"]
+
+
+def _ensure_read_your_writes(db: Session) -> Session:
+    """Return a read session that is guaranteed to see the user's last write.
+
+    The replica is polled for up to READ_YOUR_WRITES_WAIT_MS until it has
+    replayed past the stored LSN. The check and the following reads share
+    one transaction, so they are served by the same replica even behind
+    pgbouncer in transaction pooling mode. If the replica does not catch
+    up in time, the replica session is closed and a read session bound to
+    the primary is returned instead.
+    """
+    lsn = _get_write_lsn()
+    if lsn is None or db.get_bind().dialect.name != "postgresql":
+        return db
+
+    deadline = time.monotonic() + READ_YOUR_WRITES_WAIT_MS / 1000
+    waited = False
+    while True:
+        if has_replayed(db, lsn):
+            READ_YOUR_WRITES.labels(outcome="waited" if waited else "replica").inc()
+            return db
+        if time.monotonic() >= deadline:
+            break
+        waited = True
+        time.sleep(0.005)
+
+    READ_YOUR_WRITES.labels(outcome="primary").inc()
+    db.close()
+    return SessionRead(bind=get_primary_read_engine())
+
+
+def _choose_read_engine() -> Engine:
+    """Pick the engine for a new read session.
+
+    Uses the replica router when configured, falling back to the primary
+    when every replica is unhealthy or lagging.
+    """
+    replica_router = get_replica_router()
+    if replica_router is None:
+        return get_read_engine()
+    return replica_router.choose_engine() or get_primary_read_engine()
+
+
+class LazySession:
+    """Session proxy that only creates its session when it is first used.
+
+    Views open both a write and a read session up front, but many only
+    touch one of them. The proxy defers building the session (choosing a
+    replica, checking read-your-writes, checking out a connection) until
+    an attribute of the session is accessed, so untouched databases cost
+    nothing.
+    """
+
+    def __init__(self, factory: Callable[[], Session]) -> None:
+        """Store the factory without calling it.
+
+        :param factory: Function creating the real session
+        :type factory: Callable[[], Session]
+        """
+        self._factory = factory
+        self._session: Optional[Session] = None
+
+    @property
+    def started(self) -> bool:
+        """Whether the real session has been created."""
+        return self._session is not None
+
+    @property
+    def session(self) -> Session:
+        """The real session, created on first access."""
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+    def close(self) -> None:
+        """Close the real session if it was ever created."""
+        if self._session is not None:
+            self._session.close()
+
+
+def _log_failure(what: str, e: Exception) -> None:
+    """Log a failed transaction, with a traceback only if the error was unexpected."""
+    if isinstance(e, ValueError):
+        # Domain errors (unknown email, wrong password, ...) are part of normal operation
+        logger.info(f"{what} rolled back: {e}")
+    else:
+        logger.error(f"{what} failed: {e}", exc_info=True)
+
+
+def _has_writes(db: Session) -> bool:
+    """Whether the session flushed or still holds changes that need a commit."""
+    return bool(db.info.get("has_writes") or db.new or db.dirty or db.deleted)
+
+
 @contextmanager
 def get_write_db() -> Generator:
-    """Provides a transactional session for write operations."""
-    db = SessionWrite()
+    """Provides a transactional session for write operations.
+
+    The session is created lazily and only committed if something was
+    written; read-only use is rolled back on close.
+    """
+    db = LazySession(lambda: SessionWrite(bind=get_write_engine()))
     try:
         yield db
-        db.commit()
+        if db.started and _has_writes(db.session):
+            db.commit()
+            _capture_write_lsn(db.session)
     except Exception as e:
-        db.rollback()
-        logger.error(f"Write transaction failed: {e}", exc_info=True)
+        if db.started:
+            db.rollback()
+        _log_failure("Write transaction", e)
         raise
     finally:
         db.close()
 
+class UnitOfWork:
+    """One transaction per request over a write and a read session.
+
+    Repositories only add and flush; the unit of work commits the write
+    session once at the end of the request, so multi-step operations such
+    as registration either fully succeed or leave nothing behind.
+    """
+
+    def __init__(self) -> None:
+        """Create lazy write and read sessions without touching the database."""
+        self.write_db = LazySession(lambda: SessionWrite(bind=get_write_engine()))
+        self.read_db = LazySession(lambda: _ensure_read_your_writes(SessionRead(bind=_choose_read_engine())))
+
+    def flush(self) -> None:
+        """Send pending changes to the primary without committing."""
+        if self.write_db.started:
+            self.write_db.flush()
+
+    def commit(self) -> None:
+        """Commit the write session if anything was written."""
+        if self.write_db.started and _has_writes(self.write_db.session):
+            self.write_db.commit()
+            _capture_write_lsn(self.write_db.session)
+
+    def rollback(self) -> None:
+        """Discard everything written in this unit of work."""
+        if self.write_db.started:
+            self.write_db.rollback()
+
+    def close(self) -> None:
+        """Close both sessions, returning their connections to the pool."""
+        self.write_db.close()
+        self.read_db.close()
+
+
+@contextmanager
+def unit_of_work() -> Generator[UnitOfWork, None, None]:
+    """Provides a request-scoped unit of work.
+
+    Commits once when the block completes and rolls back everything if it
+    raises.
+
+    Usage example:
+    with unit_of_work() as uow:
+        user_service = create_user_service(write_db=uow.write_db, read_db=uow.read_db)
+    """
+    uow = UnitOfWork()
+    try:
+        yield uow
+        uow.commit()
+    except Exception as e:
+        uow.rollback()
+        _log_failure("Unit of work", e)
+        raise
+    finally:
+        uow.close()
+
+
 @contextmanager
 def get_read_db() -> Generator:
-    """Provides a session for read operations (read-only)."""
-    db = SessionRead()
+    """Provides a session for read operations (read-only).
+
+    The session is created lazily on first use. If the current user wrote
+    to the primary recently, the session only reads from a replica that
+    has caught up with that write.
+    """
+    db = LazySession(lambda: _ensure_read_your_writes(SessionRead(bind=_choose_read_engine())))
     try:
         yield db
     except Exception as e:
-        logger.error(f"Read transaction failed: {e}", exc_info=True)
+        _log_failure("Read transaction", e)
         raise
     finally:
         db.close()
@@ -17,14 +17,26 @@ Usage:
     obtain properly configured service instances without needing to
     understand the complete dependency graph.
 
+    The factories resolve through a Container bound to the given sessions.
+    A container builds each repository and service lazily, on first access,
+    and at most once. Inside a request the container is kept on flask.g per
+    pair of sessions, so services requested by several factory calls share
+    their repositories. Repositories and services hold the request's
+    sessions and are built per request; the session index holds no
+    request state and is shared by all containers.
+
 Usage Example:
     @app.route('/users')
     def users_endpoint():
-        with get_write_db() as write_db, get_read_db() as read_db:
-            user_service = create_user_service(write_db, read_db)
+        with unit_of_work() as uow:
+            user_service = create_user_service(uow.write_db, uow.read_db)
             # Use service...
 """
 
+from functools import cached_property
+
+from flask import g, has_request_context
+
 from blueprints.auth.service import AuthService
 from blueprints.dashboard.service import DashboardService
 from blueprints.users.credentials_repository import CredentialsRepository
@@ -33,48 +45,115 @@ from blueprints.users.mfa_repository import MFARepository
 from blueprints.users.mfa_service import MFAservice
 from blueprints.users.user_repository import UserRepository
 from blueprints.users.user_service import UserService
+from core.session_index import session_index
+
+
+class Container:
+    """Lazily built object graph for one pair of write and read sessions."""
+
+    def __init__(self, write_db, read_db) -> None:
+        """
+        Bind the container to the sessions its repositories use.
+
+        :param write_db: Session for write operations
+        :type write_db: Session
+        :param read_db: Session for read operations
+        :type read_db: Session
+        :return: None
+        """
+        self.write_db = write_db
+        self.read_db = read_db
+
+    @cached_property
+    def user_repo(self) -> UserRepository:
+        return UserRepository(write_db_session=self.write_db, read_db_session=self.read_db)
+
+    @cached_property
+    def cred_repo(self) -> CredentialsRepository:
+        return CredentialsRepository(self.write_db, self.read_db)
+
+    @cached_property
+    def mfa_repo(self) -> MFARepository:
+        return MFARepository(write_db_session=self.write_db, read_db_session=self.read_db)
+
+    @cached_property
+    def cred_service(self) -> CredentialsService:
+        return CredentialsService(cred_repo=self.cred_repo, session_index=session_index)
+
+    @cached_property
+    def mfa_service(self) -> MFAservice:
+        return MFAservice(mfa_repo=self.mfa_repo)
+
+    @cached_property
+    def user_service(self) -> UserService:
+        return UserService(user_repo=self.user_repo, cred_service=self.cred_service, mfa_service=self.mfa_service)
+
+    @cached_property
+    def auth_service(self) -> AuthService:
+        return AuthService(cred_service=self.cred_service)
+
+    @cached_property
+    def dashboard_service(self) -> DashboardService:
+        return DashboardService(user_service=self.user_service, mfa_service=self.mfa_service)
+
+
+def get_container(write_db, read_db) -> Container:
+    """
+    Return the container for the given sessions.
+
+    Inside a request the container is created once per pair of sessions
+    and reused, outside of one a new container is returned.
+
+    :param write_db: Session for write operations
+    :type write_db: Session
+    :param read_db: Session for read operations
+    :type read_db: Session
+    :return: Container bound to the sessions
+    :rtype: Container
+
+    Usage example:
+    auth_service = get_container(uow.write_db, uow.read_db).auth_service
+    """
+    if not has_request_context():
+        return Container(write_db, read_db)
+    containers = g.setdefault("di_containers", {})
+    # Containers keep their sessions alive, so the ids cannot be reused during the request
+    key = (id(write_db), id(read_db))
+    container = containers.get(key)
+    if container is None:
+        container = containers[key] = Container(write_db, read_db)
+    return container
+
 
 def create_user_service(write_db, read_db) -> UserService:
     """Create UserService."""
-    user_repo = create_user_repository(write_db, read_db)
-    cred_repo = create_credentials_repository(write_db, read_db)
-    mfa_repo = create_mfa_repository(write_db, read_db)
-    
-    cred_service = CredentialsService(cred_repo=cred_repo)
-    mfa_service = MFAservice(mfa_repo=mfa_repo)
-    
-    return UserService(user_repo=user_repo, cred_service=cred_service, mfa_service=mfa_service)
+    return get_container(write_db, read_db).user_service
 
 def create_mfa_service(write_db, read_db) -> MFAservice:
     """Create MFAservice."""
-    mfa_repo = create_mfa_repository(write_db, read_db)
-    return MFAservice(mfa_repo=mfa_repo)
+    return get_container(write_db, read_db).mfa_service
 
 def create_credentials_service(write_db, read_db) -> CredentialsService:
     """Create CredentialsService."""
-    cred_repo = create_credentials_repository(write_db, read_db)
-    return CredentialsService(cred_repo=cred_repo)
+    return get_container(write_db, read_db).cred_service
 
 def create_auth_service(write_db, read_db) -> AuthService:
     """Create AuthService."""
-    cred_repo = create_credentials_repository(write_db, read_db)
-    cred_service = CredentialsService(cred_repo=cred_repo)
-    return AuthService(cred_service=cred_service)
+    return get_container(write_db, read_db).auth_service
 
 def create_dashboard_service(write_db,read_db) -> DashboardService:
-    user_service = create_user_service(write_db=write_db,read_db=read_db)
-    mfa_service = create_mfa_service(write_db=write_db,read_db=read_db)
-    return DashboardService(user_service=user_service,mfa_service=mfa_service)
+    """Create DashboardService."""
+    return get_container(write_db, read_db).dashboard_service
 
 # Helper functions to init repositories
 def create_user_repository(write_db, read_db) -> UserRepository:
     """Create UserRepository."""
-    return UserRepository(write_db_session=write_db, read_db_session=read_db)
+    return get_container(write_db, read_db).user_repo
 
 def create_credentials_repository(write_db, read_db) -> CredentialsRepository:
     """Create CredentialsRepository."""
-    return CredentialsRepository(write_db, read_db)
+    return get_container(write_db, read_db).cred_repo
 
 def create_mfa_repository(write_db, read_db) -> MFARepository:
     """Create MFARepository."""
-    return MFARepository(write_db_session=write_db, read_db_session=read_db)
+    return get_container(write_db, read_db).mfa_repo
@@ -0,0 +1,246 @@
+"""
+Database Engine Factory Module.
+
+This module builds the SQLAlchemy engines used by core.database with
+connection pool settings taken from the environment, and instruments
+every pool with checkout and wait-time metrics.
+
+Engines are held in an :class:`EngineRegistry`, which creates them lazily
+on first use in each process. This keeps imports free of database setup,
+so the app can be preloaded by gunicorn and forked into workers without
+sharing sockets.
+
+Each setting is read from ``<PREFIX>_<NAME>`` first and falls back to
+``DB_<NAME>``, where the prefix is WRITE_DB, READ_DB or REPLICA_DB:
+    - POOL_SIZE: Connections kept open per process (default: 5)
+    - MAX_OVERFLOW: Extra connections allowed under load (default: 10)
+    - POOL_TIMEOUT: Seconds to wait for a free connection (default: 10)
+    - POOL_RECYCLE: Seconds after which a connection is replaced (default: 300,
+      below pgbouncer's server_idle_timeout)
+    - POOL_PRE_PING: Test connections on checkout (default: true)
+    - PGBOUNCER: Set to true when the URL points at pgbouncer in transaction
+      pooling mode. The engine then uses NullPool so pgbouncer is the only
+      pool, and no session-level state (SET, advisory locks, prepared
+      statements, LISTEN) may be relied on across transactions.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from core.query_stats import instrument_engine
+from core.sql_comments import tag_engine
+
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+)
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool",
+    ["engine"],
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection, including connecting",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+
+
+class _InstrumentedPoolMixin:
+    """Records how long each checkout waits for a connection."""
+
+    metrics_label = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.labels(engine=self.metrics_label).observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool with wait-time metrics."""
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    """NullPool with connect-time metrics, used behind pgbouncer."""
+
+
+def _env(prefix: str, name: str, default: str) -> str:
+    """Read ``<prefix>_<name>``, falling back to ``DB_<name>`` and the default."""
+    return os.getenv(f"{prefix}_{name}", os.getenv(f"DB_{name}", default))
+
+
+def _env_bool(prefix: str, name: str, default: str) -> bool:
+    """Read a boolean setting."""
+    return _env(prefix, name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_options(prefix: str, label: str) -> Dict[str, Any]:
+    """
+    Build create_engine pool keyword arguments from the environment.
+
+    :param prefix: Environment prefix, e.g. "WRITE_DB"
+    :type prefix: str
+    :param label: Engine label used in metrics
+    :type label: str
+    :return: Keyword arguments for create_engine
+    :rtype: Dict[str, Any]
+    """
+    # A subclass per label keeps the label when the pool is recreated on dispose()
+    if _env_bool(prefix, "PGBOUNCER", "false"):
+        return {"poolclass": type(f"{label}NullPool", (InstrumentedNullPool,), {"metrics_label": label})}
+
+    return {
+        "poolclass": type(f"{label}QueuePool", (InstrumentedQueuePool,), {"metrics_label": label}),
+        "pool_size": int(_env(prefix, "POOL_SIZE", "5")),
+        "max_overflow": int(_env(prefix, "MAX_OVERFLOW", "10")),
+        "pool_timeout": float(_env(prefix, "POOL_TIMEOUT", "10")),
+        "pool_recycle": int(_env(prefix, "POOL_RECYCLE", "300")),
+        "pool_pre_ping": _env_bool(prefix, "POOL_PRE_PING", "true"),
+    }
+
+
+def build_engine(url: str, prefix: str, label: str) -> Engine:
+    """
+    Create an engine with configured and instrumented pooling.
+
+    SQLite URLs (local development) keep SQLAlchemy's default pooling and
+    turn on foreign key enforcement, which SQLite leaves off by default, so
+    the models' ON DELETE rules apply there too.
+    Every engine counts its statements for core.query_stats, as "write"
+    for the WRITE_DB prefix and "read" otherwise, and tags them with
+    sqlcommenter comments (core.sql_comments).
+
+    :param url: Database URL
+    :type url: str
+    :param prefix: Environment prefix for pool settings, e.g. "READ_DB"
+    :type prefix: str
+    :param label: Engine label used in metrics, e.g. "read"
+    :type label: str
+    :return: Configured engine
+    :rtype: Engine
+
+    Usage example:
+    write_engine = build_engine(WRITE_DATABASE_URL, prefix="WRITE_DB", label="write")
+    """
+    role = "write" if prefix == "WRITE_DB" else "read"
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+        instrument_engine(engine, role=role)
+        tag_engine(engine)
+        return engine
+
+    engine = create_engine(url, **pool_options(prefix, label))
+    instrument_engine(engine, role=role)
+    tag_engine(engine)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        POOL_CHECKOUTS.labels(engine=label).inc()
+        POOL_CHECKED_OUT.labels(engine=label).inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record) -> None:
+        POOL_CHECKED_OUT.labels(engine=label).dec()
+
+    return engine
+
+
+class EngineRegistry:
+    """
+    Lazily built, per-process registry of engines and engine-like resources.
+
+    Resources are created by their factory on first access. After a fork
+    the child must not reuse the parent's connections, so :meth:`reset`
+    drops every resource without closing the parent's sockets; the next
+    access rebuilds it in the child. A process id check triggers the same
+    reset automatically if no post-fork hook ran.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty registry.
+
+        :return: None
+        """
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._resources: Dict[str, Any] = {}
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register a factory without calling it.
+
+        :param name: Resource name, e.g. "write"
+        :type name: str
+        :param factory: Function building the resource, may return None
+        :type factory: Callable[[], Any]
+        :return: None
+
+        Usage example:
+        engines.register("write", lambda: build_engine(url, prefix="WRITE_DB", label="write"))
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._resources.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Return a resource, building it on first use in this process.
+
+        :param name: Resource name
+        :type name: str
+        :return: The resource returned by the factory
+        :rtype: Any
+        :raises KeyError: If no factory is registered under that name
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self.reset()
+            if name not in self._resources:
+                self._resources[name] = self._factories[name]()
+            return self._resources[name]
+
+    def reset(self) -> None:
+        """
+        Forget all resources after a fork, leaving the parent's connections open.
+
+        :return: None
+        """
+        with self._lock:
+            for resource in self._resources.values():
+                if resource is not None:
+                    resource.dispose(close=False)
+            self._resources.clear()
+            self._pid = os.getpid()
+
+    def dispose(self) -> None:
+        """
+        Close all connections held by this process and forget the resources.
+
+        :return: None
+        """
+        with self._lock:
+            for resource in self._resources.values():
+                if resource is not None:
+                    resource.dispose()
+            self._resources.clear()
@@ -0,0 +1,172 @@
+"""
+Password Hashing Pool Module.
+
+This module moves CPU-bound password hashing off the gunicorn request
+worker into a dedicated process pool. The pool is bounded: once the
+number of in-flight hashing jobs reaches the configured limit, new
+submissions fail fast instead of queueing behind slow logins.
+
+The hashing algorithms themselves live in core.hashers, which submits
+its work to this pool.
+
+The limit only matters when a process handles several requests at once,
+so gunicorn runs threaded workers; gunicorn.conf.py also gives each
+worker's pool its share of the cores.
+
+Configuration (environment variables):
+    - HASH_POOL_WORKERS: Number of hashing processes per app process (default: CPU count,
+      set to CPU count / GUNICORN_WORKERS by gunicorn.conf.py, 0 runs hashing inline
+      in the calling thread)
+    - HASH_POOL_MAX_QUEUE: Jobs allowed to wait for a free process (default: 2 x workers)
+    - HASH_POOL_TIMEOUT: Seconds to wait for a single hashing job (default: 5)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from prometheus_client import Gauge, Histogram
+
+HASH_POOL_QUEUE_DEPTH = Gauge(
+    "hash_pool_queue_depth",
+    "Number of password hashing jobs submitted but not yet finished",
+)
+HASH_POOL_LATENCY = Histogram(
+    "hash_pool_latency_seconds",
+    "Time spent waiting for a password hashing job, including queueing",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class HashingPoolBusyError(RuntimeError):
+    """Raised when the hashing pool is saturated or a job exceeds its timeout."""
+
+
+class HashingPool:
+    """
+    Bounded executor for CPU-bound password hashing.
+
+    Jobs are executed in a process pool so that hashing does not hold the
+    request worker. A semaphore caps the number of in-flight jobs at
+    ``max_workers + max_queue``; further submissions raise
+    :class:`HashingPoolBusyError` immediately.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: float) -> None:
+        """
+        Initialize the pool without starting any process.
+
+        :param max_workers: Number of hashing processes, 0 runs jobs inline
+        :type max_workers: int
+        :param max_queue: Number of jobs allowed to wait for a free process
+        :type max_queue: int
+        :param timeout: Seconds to wait for a single job result
+        :type timeout: float
+        :return: None
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1) + max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the process pool on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        """Free a slot once a job has finished."""
+        HASH_POOL_QUEUE_DEPTH.dec()
+        self._slots.release()
+
+    def run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a hashing function in the pool and wait for its result.
+
+        :param operation: Label used for the latency metric (e.g. "hash", "verify")
+        :type operation: str
+        :param func: Picklable module-level function to execute
+        :type func: Callable
+        :param args: Positional arguments passed to the function
+        :type args: Any
+        :return: Return value of the function
+        :rtype: Any
+        :raises HashingPoolBusyError: If the pool is full, the job times out or a worker died
+
+        Usage example:
+        result = get_hashing_pool().run("hash", func, password)
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusyError("Password hashing pool is full")
+        HASH_POOL_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            if self.max_workers == 0:
+                try:
+                    return func(*args)
+                finally:
+                    self._release()
+
+            try:
+                future = self._get_executor().submit(func, *args)
+            except BrokenProcessPool:
+                self._release()
+                self.shutdown()
+                raise HashingPoolBusyError("Password hashing pool is restarting")
+            except BaseException:
+                self._release()
+                raise
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise HashingPoolBusyError(f"Password hashing timed out after {self.timeout}s")
+            except BrokenProcessPool:
+                # A worker died mid-job (e.g. OOM kill), start a fresh pool on the next job
+                self.shutdown()
+                raise HashingPoolBusyError("Password hashing pool is restarting")
+        finally:
+            HASH_POOL_LATENCY.labels(operation=operation).observe(time.perf_counter() - start)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if any were started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_pool: Optional[HashingPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> HashingPool:
+    """
+    Return the process-wide hashing pool, creating it on first use.
+
+    The pool is rebuilt when the current process id changes so that a
+    pool created before a fork is never shared with the child.
+
+    :return: Shared hashing pool for this process
+    :rtype: HashingPool
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            workers = int(os.getenv("HASH_POOL_WORKERS", os.cpu_count() or 1))
+            max_queue = int(os.getenv("HASH_POOL_MAX_QUEUE", 2 * max(workers, 1)))
+            timeout = float(os.getenv("HASH_POOL_TIMEOUT", "5"))
+            _pool = HashingPool(max_workers=workers, max_queue=max_queue, timeout=timeout)
+            _pool_pid = os.getpid()
+        return _pool
@@ -0,0 +1,461 @@
+"""
+Password Hasher Registry Module.
+
+This module provides pluggable password hashing. Each hasher owns one or
+more hash prefixes (``$2b$``, ``$argon2id$``, ``$scrypt$``), so verification
+dispatches on the format of the stored hash while new hashes are always
+produced by the configured default hasher. Stored hashes in another format,
+or with outdated parameters, are reported by :func:`needs_rehash` and
+migrated lazily on the next successful login. Bcrypt hashes are only
+migrated upwards: the calibrated cost can differ by a step between
+workers or nodes, and a hash that is already stronger is kept rather
+than rewritten back and forth.
+
+All hashing work is submitted to the bounded pool in core.hash_pool.
+
+Configuration (environment variables):
+    - PASSWORD_HASHER: Hasher used for new hashes, "bcrypt", "argon2id" or "scrypt" (default: bcrypt)
+    - BCRYPT_TARGET_MS: Target duration of a single bcrypt hash in ms (default: 150)
+    - BCRYPT_ROUNDS: Fixed bcrypt cost factor, disables calibration
+    - BCRYPT_MIN_ROUNDS / BCRYPT_MAX_ROUNDS: Calibration bounds (default: 10 / 16)
+    - BCRYPT_CALIBRATION_SAMPLES: Timed hashes whose median is used for calibration (default: 5)
+    - ARGON2_TIME_COST / ARGON2_MEMORY_KIB / ARGON2_PARALLELISM: Argon2id parameters (default: 3 / 65536 / 1)
+    - SCRYPT_LN / SCRYPT_R / SCRYPT_P: Scrypt parameters, N = 2**SCRYPT_LN (default: 15 / 8 / 1)
+
+Argon2id uses ``argon2-cffi``, scrypt uses hashlib. PASSWORD_HASHER is
+checked once at startup by :func:`validate_password_hasher`.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import math
+import os
+import statistics
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import argon2
+import bcrypt
+from prometheus_client import Gauge
+
+from core.hash_pool import get_hashing_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HASHER = "bcrypt"
+DEFAULT_BCRYPT_ROUNDS = 12
+# Calibration only rounds up to the next cost once the estimate clears the midpoint by this many
+# doublings, so processes measuring slightly different timings settle on the same cost
+CALIBRATION_HYSTERESIS = 0.2
+
+BCRYPT_ROUNDS_GAUGE = Gauge(
+    "bcrypt_cost_rounds",
+    "Bcrypt cost factor used for new password hashes",
+)
+
+
+# Pool tasks: module-level so they can be pickled into the worker processes
+
+def _bcrypt_hash(password: bytes, rounds: int) -> bytes:
+    """Hash a password with bcrypt."""
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _bcrypt_verify(password: bytes, hashed_password: bytes) -> bool:
+    """Check a password against a bcrypt hash."""
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def _argon2_hash(password: str, time_cost: int, memory_cost: int, parallelism: int) -> str:
+    """Hash a password with argon2id."""
+    hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    return hasher.hash(password)
+
+
+def _argon2_verify(password: str, hashed_password: str) -> bool:
+    """Check a password against an argon2id hash."""
+    try:
+        return argon2.PasswordHasher().verify(hashed_password, password)
+    except argon2.exceptions.VerifyMismatchError:
+        return False
+    except argon2.exceptions.InvalidHashError as e:
+        raise ValueError(f"Invalid argon2 hash: {e}")
+
+
+def _scrypt_derive(password: bytes, salt: bytes, ln: int, r: int, p: int) -> bytes:
+    """Derive a scrypt key with enough memory allowance for the parameters."""
+    n = 2 ** ln
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32)
+
+
+def _b64encode(data: bytes) -> str:
+    """Encode bytes as unpadded base64."""
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode unpadded base64."""
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt_hash(password: bytes, ln: int, r: int, p: int) -> str:
+    """Hash a password with scrypt into "$scrypt$ln=..,r=..,p=..$salt$hash"."""
+    salt = os.urandom(16)
+    key = _scrypt_derive(password, salt, ln, r, p)
+    return f"$scrypt$ln={ln},r={r},p={p}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def _parse_scrypt_hash(hashed_password: str) -> Tuple[int, int, int, bytes, bytes]:
+    """Split a scrypt hash string into (ln, r, p, salt, key)."""
+    try:
+        _, _, params, salt, key = hashed_password.split("$")
+        values = dict(item.split("=") for item in params.split(","))
+        return int(values["ln"]), int(values["r"]), int(values["p"]), _b64decode(salt), _b64decode(key)
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Invalid scrypt hash: {e}")
+
+
+def _scrypt_verify(password: bytes, hashed_password: str) -> bool:
+    """Check a password against a scrypt hash in constant time."""
+    ln, r, p, salt, key = _parse_scrypt_hash(hashed_password)
+    return hmac.compare_digest(_scrypt_derive(password, salt, ln, r, p), key)
+
+
+class PasswordHasher(ABC):
+    """
+    Base class for password hashing algorithms.
+
+    Subclasses declare a registry name and the hash prefixes they
+    recognise, and implement hashing, verification and the rehash check.
+    """
+
+    name: str = ""
+    prefixes: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """
+        Hash a plaintext password.
+
+        :param password: Plaintext password
+        :type password: str
+        :return: Encoded hash including algorithm prefix and parameters
+        :rtype: str
+        """
+
+    @abstractmethod
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Check a plaintext password against a hash produced by this hasher.
+
+        :param password: Plaintext password
+        :type password: str
+        :param hashed_password: Stored hash
+        :type hashed_password: str
+        :return: True if the password matches, False otherwise
+        :rtype: bool
+        """
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Check whether a hash from this hasher uses outdated parameters.
+
+        :param hashed_password: Stored hash
+        :type hashed_password: str
+        :return: True if the hash should be regenerated
+        :rtype: bool
+        """
+        return False
+
+
+class BcryptHasher(PasswordHasher):
+    """Bcrypt hasher using the calibrated cost factor."""
+
+    name = "bcrypt"
+    prefixes = ("$2b$", "$2a$", "$2y$")
+
+    def hash(self, password: str) -> str:
+        hashed = get_hashing_pool().run("hash", _bcrypt_hash, password.encode("utf-8"), get_bcrypt_rounds())
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return get_hashing_pool().run(
+            "verify", _bcrypt_verify, password.encode("utf-8"), hashed_password.encode("utf-8")
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        rounds = get_hash_rounds(hashed_password)
+        return rounds is None or rounds < get_bcrypt_rounds()
+
+
+class Argon2Hasher(PasswordHasher):
+    """Argon2id hasher, memory-hard and without bcrypt's 72-byte limit."""
+
+    name = "argon2id"
+    prefixes = ("$argon2id$",)
+
+    @property
+    def params(self) -> Tuple[int, int, int]:
+        """Configured (time_cost, memory_cost in KiB, parallelism)."""
+        return (
+            int(os.getenv("ARGON2_TIME_COST", "3")),
+            int(os.getenv("ARGON2_MEMORY_KIB", "65536")),
+            int(os.getenv("ARGON2_PARALLELISM", "1")),
+        )
+
+    def hash(self, password: str) -> str:
+        return get_hashing_pool().run("hash", _argon2_hash, password, *self.params)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return get_hashing_pool().run("verify", _argon2_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        time_cost, memory_cost, parallelism = self.params
+        hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        return hasher.check_needs_rehash(hashed_password)
+
+
+class ScryptHasher(PasswordHasher):
+    """Scrypt hasher based on hashlib, memory-hard and without bcrypt's 72-byte limit."""
+
+    name = "scrypt"
+    prefixes = ("$scrypt$",)
+
+    @property
+    def params(self) -> Tuple[int, int, int]:
+        """Configured (ln, r, p) where N = 2**ln."""
+        return (
+            int(os.getenv("SCRYPT_LN", "15")),
+            int(os.getenv("SCRYPT_R", "8")),
+            int(os.getenv("SCRYPT_P", "1")),
+        )
+
+    def hash(self, password: str) -> str:
+        return get_hashing_pool().run("hash", _scrypt_hash, password.encode("utf-8"), *self.params)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return get_hashing_pool().run("verify", _scrypt_verify, password.encode("utf-8"), hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return _parse_scrypt_hash(hashed_password)[:3] != self.params
+
+
+_hashers: Dict[str, PasswordHasher] = {}
+
+
+def register_hasher(hasher: PasswordHasher) -> None:
+    """
+    Add a hasher to the registry under its name.
+
+    :param hasher: Hasher instance to register
+    :type hasher: PasswordHasher
+    :return: None
+
+    Usage example:
+    register_hasher(ScryptHasher())
+    """
+    _hashers[hasher.name] = hasher
+
+
+def get_hasher(name: Optional[str] = None) -> PasswordHasher:
+    """
+    Return a registered hasher, by default the one configured for new hashes.
+
+    :param name: Registry name, defaults to the PASSWORD_HASHER setting
+    :type name: Optional[str]
+    :return: Registered hasher
+    :rtype: PasswordHasher
+    :raises ValueError: If no hasher is registered under that name
+    """
+    name = name or os.getenv("PASSWORD_HASHER", DEFAULT_HASHER)
+    hasher = _hashers.get(name)
+    if hasher is None:
+        raise ValueError(f"Password hasher '{name}' is not available")
+    return hasher
+
+
+def validate_password_hasher() -> None:
+    """
+    Fail at startup if PASSWORD_HASHER names no registered hasher.
+
+    Otherwise every login would fail later, when the stored hash is checked
+    for a rehash.
+
+    :return: None
+    :raises RuntimeError: If the configured hasher is not registered
+
+    Usage example:
+    validate_password_hasher()
+    """
+    try:
+        get_hasher()
+    except ValueError as e:
+        raise RuntimeError(f"Invalid PASSWORD_HASHER setting: {e}")
+
+
+def identify_hasher(hashed_password: str) -> PasswordHasher:
+    """
+    Find the hasher that produced a stored hash, based on its prefix.
+
+    :param hashed_password: Stored hash
+    :type hashed_password: str
+    :return: Matching hasher
+    :rtype: PasswordHasher
+    :raises ValueError: If the hash format is not recognised
+    """
+    for hasher in _hashers.values():
+        if hashed_password.startswith(hasher.prefixes):
+            return hasher
+    raise ValueError("Unsupported password hash format")
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a plaintext password with the configured default hasher.
+
+    :param password: Plaintext password
+    :type password: str
+    :return: Encoded hash
+    :rtype: str
+    :raises HashingPoolBusyError: If the hashing pool is full or the job times out
+
+    Usage example:
+    hashed_password = hash_password(password)
+    """
+    return get_hasher().hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Check a plaintext password against a stored hash of any registered format.
+
+    :param plain_password: Plaintext password to check
+    :type plain_password: str
+    :param hashed_password: Stored hash for comparison
+    :type hashed_password: str
+    :return: True if the password matches, False otherwise
+    :rtype: bool
+    :raises ValueError: If the hash format is not recognised
+    :raises HashingPoolBusyError: If the hashing pool is full or the job times out
+
+    Usage example:
+    if check_password(password, cred.password):
+        do_things()
+    """
+    return identify_hasher(hashed_password).verify(plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a stored hash should be migrated on the next login.
+
+    A hash needs migrating if it was produced by a different hasher than
+    the configured default, or by the default hasher with other parameters.
+
+    :param hashed_password: Stored hash
+    :type hashed_password: str
+    :return: True if the hash should be regenerated
+    :rtype: bool
+
+    Usage example:
+    if needs_rehash(cred.password):
+        upgrade()
+    """
+    try:
+        hasher = identify_hasher(hashed_password)
+    except ValueError:
+        return True
+    return hasher is not get_hasher() or hasher.needs_rehash(hashed_password)
+
+
+_bcrypt_rounds: Optional[int] = None
+
+
+def _time_bcrypt_ms(rounds: int) -> float:
+    """Time one bcrypt hash at the given cost in milliseconds."""
+    salt = bcrypt.gensalt(rounds=rounds)
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration-password", salt)
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate_bcrypt_rounds(target_ms: Optional[float] = None) -> int:
+    """
+    Pick the bcrypt cost factor whose hash time is closest to the target latency.
+
+    Several hashes are timed at the minimum cost and the median is
+    extrapolated, since every additional round doubles the work. Near the
+    midpoint between two costs the lower one wins unless the estimate
+    clears it by CALIBRATION_HYSTERESIS. The result is clamped to the
+    configured bounds and used for all new hashes in this process (and in
+    processes forked from it). ``BCRYPT_ROUNDS`` skips the measurement
+    entirely.
+
+    :param target_ms: Target duration of one hash in milliseconds
+    :type target_ms: Optional[float]
+    :return: Selected cost factor
+    :rtype: int
+
+    Usage example:
+    rounds = calibrate_bcrypt_rounds(target_ms=150)
+    """
+    global _bcrypt_rounds
+    pinned = os.getenv("BCRYPT_ROUNDS")
+    if pinned:
+        _bcrypt_rounds = int(pinned)
+    else:
+        if target_ms is None:
+            target_ms = float(os.getenv("BCRYPT_TARGET_MS", "150"))
+        min_rounds = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+        max_rounds = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+        samples = max(int(os.getenv("BCRYPT_CALIBRATION_SAMPLES", "5")), 1)
+
+        measured_ms = statistics.median(_time_bcrypt_ms(min_rounds) for _ in range(samples))
+
+        extra_rounds = (
+            math.floor(math.log2(target_ms / measured_ms) + 0.5 - CALIBRATION_HYSTERESIS) if measured_ms > 0 else 0
+        )
+        _bcrypt_rounds = min(max(min_rounds + extra_rounds, min_rounds), max_rounds)
+        logger.info(
+            f"Calibrated bcrypt cost to {_bcrypt_rounds} rounds "
+            f"(median {measured_ms:.1f} ms of {samples} hashes at {min_rounds} rounds, target {target_ms:.0f} ms)"
+        )
+
+    BCRYPT_ROUNDS_GAUGE.set(_bcrypt_rounds)
+    return _bcrypt_rounds
+
+
+def get_bcrypt_rounds() -> int:
+    """
+    Return the bcrypt cost factor for new hashes.
+
+    :return: Calibrated or pinned cost factor, bcrypt's default if neither is set
+    :rtype: int
+    """
+    if _bcrypt_rounds is not None:
+        return _bcrypt_rounds
+    pinned = os.getenv("BCRYPT_ROUNDS")
+    return int(pinned) if pinned else DEFAULT_BCRYPT_ROUNDS
+
+
+def get_hash_rounds(hashed_password: str) -> Optional[int]:
+    """
+    Extract the cost factor from a bcrypt hash string.
+
+    :param hashed_password: Bcrypt hash, e.g. "$2b$12$..."
+    :type hashed_password: str
+    :return: Cost factor, or None if the hash is not in bcrypt format
+    :rtype: Optional[int]
+    """
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+register_hasher(BcryptHasher())
+register_hasher(ScryptHasher())
+register_hasher(Argon2Hasher())
@@ -1,26 +1,133 @@
+"""
+Redis Connection Module.
+
+This module owns the single Redis connection pool of a process. Flask-Session,
+the rate limiter and the profile cache all borrow connections from it, so a
+worker holds at most REDIS_MAX_CONNECTIONS sockets to Redis and timeouts are
+tuned in one place.
+
+The pool is created lazily. redis-py notices a fork by its pid and drops the
+connections inherited from the gunicorn master, so workers never share
+sockets.
+
+Configuration (environment variables):
+    - REDIS_URL: Redis server URL (default: redis://localhost:6379/0)
+    - REDIS_MAX_CONNECTIONS: Connections per process (default: 50)
+    - REDIS_SOCKET_TIMEOUT: Seconds to wait for a reply (default: 1.0)
+    - REDIS_SOCKET_CONNECT_TIMEOUT: Seconds to wait for a connection (default: 1.0)
+    - REDIS_HEALTH_CHECK_INTERVAL: Seconds a connection may idle before it is pinged on checkout (default: 30)
+    - SESSION_TOUCH_INTERVAL: Seconds between TTL refreshes of unmodified sessions, 0 refreshes on every request (default: 60)
+
+Sessions are stored in Redis unless SESSION_BACKEND=token selects the
+stateless cookie sessions of core.token_session.
+"""
+
 import os
-import redis
-from flask_session import Session
 from datetime import timedelta
-from urllib.parse import urlparse
+from typing import Optional
+
+import redis
+from prometheus_client import Gauge
+
+from core.session_interface import ThrottledRedisSessionInterface
+from core.session_serializer import VersionedMsgpackSerializer
+from core.token_session import SESSION_BACKEND, RevocationList, TokenSessionInterface, token_keys
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "1.0"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+SESSION_TOUCH_INTERVAL = int(os.getenv("SESSION_TOUCH_INTERVAL", "60"))
+
+_pool: Optional[redis.ConnectionPool] = None
+
+
+def get_redis_pool() -> redis.ConnectionPool:
+    """
+    Return the process-wide Redis connection pool, creating it on first use.
+
+    :return: Shared connection pool
+    :rtype: redis.ConnectionPool
+
+    Usage example:
+    client = redis.Redis(connection_pool=get_redis_pool())
+    """
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            decode_responses=False,
+        )
+    return _pool
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return a Redis client backed by the shared pool.
+
+    Clients are cheap wrappers, the connections belong to the pool.
+
+    :return: Redis client
+    :rtype: redis.Redis
+
+    Usage example:
+    get_redis().expire(key, ttl)
+    """
+    return redis.Redis(connection_pool=get_redis_pool())
+
+
+def _pool_stat(attribute: str):
+    """Read a connection count of the pool, 0 before it exists."""
+    def read() -> float:
+        if _pool is None:
+            return 0
+        value = getattr(_pool, attribute)
+        return value if isinstance(value, int) else len(value)
+    return read
+
+
+Gauge("redis_pool_connections_in_use", "Redis connections checked out of the pool").set_function(
+    _pool_stat("_in_use_connections")
+)
+Gauge("redis_pool_connections_idle", "Open Redis connections waiting in the pool").set_function(
+    _pool_stat("_available_connections")
+)
+Gauge("redis_pool_connections_max", "Maximum Redis connections of the pool").set_function(
+    lambda: REDIS_MAX_CONNECTIONS
+)
 
-session = Session()  
 
 def init_redis(app):
     """Configure Flask session storage using Redis with 30-minute timeout"""
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    parsed_url = urlparse(redis_url)
-
     app.config["SESSION_TYPE"] = "redis"
-    app.config["SESSION_PERMANENT"] = True  
-    app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(minutes=30)  
-    app.config["SESSION_USE_SIGNER"] = True  
-    app.config["SESSION_KEY_PREFIX"] = "flask_session:"  
-    app.config["SESSION_REDIS"] = redis.Redis(
-        host=parsed_url.hostname,
-        port=parsed_url.port,
-        db=int(parsed_url.path.lstrip("/")),
-        decode_responses=False,  
-    )
+    app.config["SESSION_PERMANENT"] = True
+    app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(minutes=30)
+    app.config["SESSION_USE_SIGNER"] = True
+    app.config["SESSION_KEY_PREFIX"] = "flask_session:"
+    app.config["SESSION_REDIS"] = get_redis()
 
-    session.init_app(app)  
+    # The rate limiter stores its counters through the same pool
+    app.config["RATELIMIT_STORAGE_URI"] = REDIS_URL
+    app.config["RATELIMIT_STORAGE_OPTIONS"] = {"connection_pool": get_redis_pool()}
+
+    if SESSION_BACKEND == "token":
+        app.session_interface = TokenSessionInterface(app, token_keys(), RevocationList(get_redis))
+        return
+
+    # Equivalent to flask_session.Session(app), with writes of unmodified sessions throttled
+    app.session_interface = ThrottledRedisSessionInterface(
+        app,
+        touch_interval=SESSION_TOUCH_INTERVAL,
+        client=app.config["SESSION_REDIS"],
+        key_prefix=app.config["SESSION_KEY_PREFIX"],
+        use_signer=app.config["SESSION_USE_SIGNER"],
+        permanent=app.config["SESSION_PERMANENT"],
+    )
+    # Compact, versioned payloads instead of Flask-Session's plain msgpack
+    app.session_interface.serializer = VersionedMsgpackSerializer(app)
@@ -0,0 +1,221 @@
+"""
+SQL Query Statistics Module.
+
+This module counts the statements each request sends to the database and
+the time spent on them, split by write (primary) and read engines. At the
+end of every request the numbers are exported to Prometheus, tagged by
+endpoint, and a warning is logged when a request exceeds its query or time
+budget or repeats the same statement often enough to suggest an N+1
+pattern.
+
+Tests can collect the same numbers with :func:`count_queries` to assert
+query budgets for a code path.
+
+Configuration (environment variables):
+    - SQL_QUERY_BUDGET: Statements per request above which a warning is logged (default: 10)
+    - SQL_TIME_BUDGET_MS: Database time per request above which a warning is logged (default: 200)
+    - SQL_N_PLUS_ONE_THRESHOLD: Executions of one statement per request reported as N+1 (default: 5)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter as StatementCounter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Tuple
+
+from flask import Flask, g, has_app_context, request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "10"))
+SQL_TIME_BUDGET_MS = float(os.getenv("SQL_TIME_BUDGET_MS", "200"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements issued per request",
+    ["endpoint", "engine"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+QUERY_TIME_PER_REQUEST = Histogram(
+    "db_query_time_per_request_seconds",
+    "Time spent executing SQL statements per request",
+    ["endpoint", "engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+N_PLUS_ONE = Counter(
+    "db_n_plus_one_total",
+    "Requests that repeated one statement at least SQL_N_PLUS_ONE_THRESHOLD times",
+    ["endpoint"],
+)
+
+
+class QueryStats:
+    """Statements and database time collected for one request or test block."""
+
+    def __init__(self) -> None:
+        """
+        Initialize empty counters.
+
+        :return: None
+        """
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.statements: StatementCounter = StatementCounter()
+
+    def record(self, engine: str, statement: str, duration: float) -> None:
+        """
+        Add one executed statement.
+
+        :param engine: "write" or "read"
+        :type engine: str
+        :param statement: SQL text as sent to the driver
+        :type statement: str
+        :param duration: Execution time in seconds
+        :type duration: float
+        :return: None
+        """
+        self.counts[engine] += 1
+        self.durations[engine] += duration
+        self.statements[statement] += 1
+
+    @property
+    def total(self) -> int:
+        """Number of statements on all engines."""
+        return sum(self.counts.values())
+
+    @property
+    def total_time(self) -> float:
+        """Seconds spent executing statements on all engines."""
+        return sum(self.durations.values())
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """
+        Return statements executed at least ``threshold`` times.
+
+        :param threshold: Minimum number of executions
+        :type threshold: int
+        :return: (statement, count) pairs, most frequent first
+        :rtype: List[Tuple[str, int]]
+        """
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+# Collectors opened by count_queries(), seen by every thread
+_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def _active_stats() -> List[QueryStats]:
+    """Return the collectors that should see the current statement."""
+    active = list(_collectors)
+    if has_app_context():
+        stats = g.get("query_stats")
+        if stats is not None:
+            active.append(stats)
+    return active
+
+
+def instrument_engine(engine: Engine, role: str) -> None:
+    """
+    Attach statement counting hooks to an engine.
+
+    :param engine: Engine to instrument
+    :type engine: Engine
+    :param role: "write" for the primary, "read" for replicas
+    :type role: str
+    :return: None
+
+    Usage example:
+    instrument_engine(engine, role="write")
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        for stats in _active_stats():
+            stats.record(role, statement, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context) -> None:
+        # after_cursor_execute is skipped for failed statements, drop their start time
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+@contextmanager
+def count_queries() -> Generator[QueryStats, None, None]:
+    """
+    Collect statements issued by any thread while the block runs.
+
+    Usage example:
+    with count_queries() as stats:
+        client.post("/auth/login", data=form)
+    assert stats.total <= 2
+    """
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+
+def report_request(stats: QueryStats, endpoint: str) -> None:
+    """
+    Export one request's statistics and log budget violations.
+
+    :param stats: Statistics collected during the request
+    :type stats: QueryStats
+    :param endpoint: Flask endpoint name
+    :type endpoint: str
+    :return: None
+    """
+    for engine in ("write", "read"):
+        QUERIES_PER_REQUEST.labels(endpoint=endpoint, engine=engine).observe(stats.counts.get(engine, 0))
+        QUERY_TIME_PER_REQUEST.labels(endpoint=endpoint, engine=engine).observe(stats.durations.get(engine, 0.0))
+
+    total_ms = stats.total_time * 1000
+    if stats.total > SQL_QUERY_BUDGET or total_ms > SQL_TIME_BUDGET_MS:
+        logger.warning(
+            f"{endpoint} issued {stats.total} SQL statements in {total_ms:.1f} ms "
+            f"(budget {SQL_QUERY_BUDGET} statements, {SQL_TIME_BUDGET_MS:.0f} ms)"
+        )
+
+    repeated = stats.repeated()
+    if repeated:
+        N_PLUS_ONE.labels(endpoint=endpoint).inc()
+        statement, n = repeated[0]
+        logger.warning(f"Possible N+1 in {endpoint}: statement executed {n} times: {statement[:200]}")
+
+
+def init_query_stats(app: Flask) -> None:
+    """
+    Collect and report SQL statistics for every request of the app.
+
+    :param app: Flask application
+    :type app: Flask
+    :return: None
+    """
+
+    @app.before_request
+    def _start_query_stats() -> None:
+        g.query_stats = QueryStats()
+
+    @app.teardown_request
+    def _report_query_stats(exc) -> None:
+        stats = g.pop("query_stats", None)
+        if stats is not None:
+            report_request(stats, request.endpoint or "unknown")
@@ -0,0 +1,254 @@
+"""
+Read Replica Router Module.
+
+This module routes read sessions directly to the Postgres replicas instead
+of relying on HAProxy's blind round robin. A background thread polls every
+replica for its replication lag and round-trip latency; replicas that fail
+the check, lag past the threshold or are not in recovery (e.g. promoted)
+are excluded, and the remaining ones are picked at random weighted by
+inverse latency. When no replica is healthy, the caller falls back to the
+primary.
+
+Each round first reads the primary's current WAL position. A replica that
+has replayed up to it has no lag, however long ago its last transaction
+was, so an idle primary does not make replicas look lagged. Otherwise the
+lag is the age of the last replayed transaction, which keeps growing when
+a replica stops receiving WAL. The check only uses functions every role
+may call, no pg_read_all_stats grant is needed.
+
+Configuration (environment variables):
+    - READ_REPLICA_URLS: Comma-separated replica database URLs (router disabled if empty)
+    - REPLICA_MAX_LAG_SECONDS: Maximum tolerated replication lag (default: 5)
+    - REPLICA_CHECK_INTERVAL: Seconds between health checks (default: 2)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag observed on each read replica",
+    ["replica"],
+)
+REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy",
+    "1 if the replica is eligible for reads, 0 otherwise",
+    ["replica"],
+)
+REPLICA_SELECTIONS = Counter(
+    "db_replica_selections_total",
+    "Read sessions routed to each replica, 'primary' when all replicas are unhealthy",
+    ["replica"],
+)
+
+# Zero lag once the replica has replayed the primary's current position,
+# a NULL position (primary unreachable) falls back to the replay age.
+LAG_QUERY = text(
+    "SELECT pg_is_in_recovery() AS in_recovery, "
+    "CASE WHEN COALESCE(pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn), false) THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END AS lag"
+)
+
+
+class Replica:
+    """Health state of a single read replica."""
+
+    def __init__(self, name: str, engine: Engine) -> None:
+        """
+        Initialize a replica that is assumed healthy until its first check.
+
+        :param name: Label used in metrics and logs (host:port)
+        :type name: str
+        :param engine: SQLAlchemy engine connected to the replica
+        :type engine: Engine
+        :return: None
+        """
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.latency: Optional[float] = None
+
+
+class ReplicaRouter:
+    """
+    Lag-aware, latency-weighted selector over a set of read replicas.
+
+    Health checks run in a daemon thread that is started on first use and
+    restarted after a fork, since threads do not survive into child processes.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        engine_factory: Callable[[str, str], Engine],
+        max_lag: float = 5.0,
+        interval: float = 2.0,
+        primary_lsn: Optional[Callable[[], Optional[str]]] = None,
+    ) -> None:
+        """
+        Create one engine per replica URL.
+
+        :param urls: Replica database URLs
+        :type urls: List[str]
+        :param engine_factory: Function building an engine from a URL and replica name
+        :type engine_factory: Callable[[str, str], Engine]
+        :param max_lag: Maximum tolerated replication lag in seconds
+        :type max_lag: float
+        :param interval: Seconds between health checks
+        :type interval: float
+        :param primary_lsn: Function returning the primary's current WAL position, None if unknown
+        :type primary_lsn: Optional[Callable[[], Optional[str]]]
+        :return: None
+        """
+        self.replicas = []
+        for url in urls:
+            name = self._replica_name(url)
+            self.replicas.append(Replica(name, engine_factory(url, name)))
+        self.max_lag = max_lag
+        self.interval = interval
+        self.primary_lsn = primary_lsn or (lambda: None)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _replica_name(url: str) -> str:
+        """Build a metric label from the URL without credentials."""
+        parsed = make_url(url)
+        return f"{parsed.host}:{parsed.port or 5432}"
+
+    def check_replica(self, replica: Replica, primary_lsn: Optional[str] = None) -> None:
+        """
+        Measure lag and latency of one replica and update its health.
+
+        :param replica: Replica to check
+        :type replica: Replica
+        :param primary_lsn: Primary's current WAL position, None if unknown
+        :type primary_lsn: Optional[str]
+        :return: None
+        """
+        try:
+            start = time.perf_counter()
+            with replica.engine.connect() as conn:
+                in_recovery, lag = conn.execute(LAG_QUERY, {"primary_lsn": primary_lsn}).one()
+                lag = float(lag or 0)
+            latency = time.perf_counter() - start
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Replica {replica.name} failed health check: {e}")
+            replica.healthy = False
+            REPLICA_HEALTHY.labels(replica=replica.name).set(0)
+            return
+
+        # Smooth latency so a single slow probe does not swing the weights
+        replica.latency = latency if replica.latency is None else 0.7 * replica.latency + 0.3 * latency
+        replica.lag = lag
+        if not in_recovery and replica.healthy:
+            logger.warning(f"Replica {replica.name} is not in recovery, it no longer follows the primary")
+        replica.healthy = bool(in_recovery) and lag <= self.max_lag
+        REPLICA_LAG.labels(replica=replica.name).set(lag)
+        REPLICA_HEALTHY.labels(replica=replica.name).set(1 if replica.healthy else 0)
+
+    def check_replicas(self) -> None:
+        """Run one health check round over all replicas."""
+        primary_lsn = self.primary_lsn()
+        for replica in self.replicas:
+            self.check_replica(replica, primary_lsn)
+
+    def _run(self) -> None:
+        """Health check loop executed by the background thread."""
+        while True:
+            self.check_replicas()
+            time.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the health check thread for the current process if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def choose_engine(self) -> Optional[Engine]:
+        """
+        Pick a healthy replica, weighted by inverse latency.
+
+        :return: Engine of the chosen replica, None if all replicas are unhealthy
+        :rtype: Optional[Engine]
+
+        Usage example:
+        engine = router.choose_engine() or write_engine
+        """
+        self.start()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            REPLICA_SELECTIONS.labels(replica="primary").inc()
+            return None
+
+        # Replicas without a measurement yet get the weight of the fastest known one
+        known = [replica.latency for replica in healthy if replica.latency]
+        default_latency = min(known) if known else 1.0
+        weights = [1 / (replica.latency or default_latency) for replica in healthy]
+        replica = random.choices(healthy, weights=weights)[0]
+        REPLICA_SELECTIONS.labels(replica=replica.name).inc()
+        return replica.engine
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the current health state of every replica.
+
+        :return: Mapping of replica name to healthy, lag and latency
+        :rtype: Dict[str, Dict[str, Any]]
+        """
+        return {
+            replica.name: {"healthy": replica.healthy, "lag": replica.lag, "latency": replica.latency}
+            for replica in self.replicas
+        }
+
+    def dispose(self, close: bool = True) -> None:
+        """
+        Release all replica connection pools.
+
+        :param close: Close pooled connections; False after a fork, to leave the parent's sockets alone
+        :type close: bool
+        :return: None
+        """
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+
+def create_replica_router(
+    engine_factory: Callable[[str, str], Engine], primary_lsn: Optional[Callable[[], Optional[str]]] = None
+) -> Optional[ReplicaRouter]:
+    """
+    Build a router from the environment, if replicas are configured.
+
+    :param engine_factory: Function building an engine from a URL and replica name
+    :type engine_factory: Callable[[str, str], Engine]
+    :param primary_lsn: Function returning the primary's current WAL position, None if unknown
+    :type primary_lsn: Optional[Callable[[], Optional[str]]]
+    :return: Router over READ_REPLICA_URLS, None if the variable is empty
+    :rtype: Optional[ReplicaRouter]
+    """
+    urls = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+    if not urls:
+        return None
+    return ReplicaRouter(
+        urls=urls,
+        engine_factory=engine_factory,
+        max_lag=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5")),
+        interval=float(os.getenv("REPLICA_CHECK_INTERVAL", "2")),
+        primary_lsn=primary_lsn,
+    )
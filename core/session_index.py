@@ -0,0 +1,204 @@
+"""
+Per-User Session Index Module.
+
+Keeps a Redis set of session ids per user, ``user_sessions:<user_id>``,
+so all sessions of a user can be ended without scanning the session
+keyspace. Sessions are added on login and removed on logout. Ending them
+takes two pipelined round trips: one reads and empties the set, the other
+drops the sessions through the active session interface (deleting the
+Redis sessions, or revoking the tokens of the token backend).
+
+The set expires SESSION_INDEX_TTL seconds after the user's last login.
+Ids of sessions that expired without a logout stay in the set until then,
+ending them again is a no-op.
+
+Password changes end the sessions once the write transaction has
+committed (see :func:`revoke_after_commit`), so a failed commit logs
+nobody out. Redis failures at that point are logged, the password change
+itself already stands.
+
+Configuration (environment variables):
+    - SESSION_INDEX_TTL: Seconds the index of a user is kept after a login (default: 2592000, 30 days)
+"""
+
+import logging
+import os
+from typing import Callable, List, Optional
+
+import redis
+from flask import current_app, has_request_context, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.database import SessionWrite
+from core.init_redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+SESSION_INDEX_TTL = int(os.getenv("SESSION_INDEX_TTL", str(30 * 24 * 3600)))
+INDEX_KEY_PREFIX = "user_sessions:"
+REVOCATIONS_KEY = "session_revocations"
+
+
+def current_session_id() -> Optional[str]:
+    """Return the id of the current request's session, None outside requests."""
+    if not has_request_context():
+        return None
+    return getattr(session._get_current_object(), "sid", None)
+
+
+class SessionIndex:
+    """Redis sets of session ids per user."""
+
+    def __init__(self, redis_client: Callable[[], redis.Redis], ttl: int = SESSION_INDEX_TTL) -> None:
+        """
+        Initialize the index.
+
+        :param redis_client: Function returning the Redis client
+        :type redis_client: Callable[[], redis.Redis]
+        :param ttl: Seconds a user's set is kept after the last login
+        :type ttl: int
+        :return: None
+        """
+        self._redis_client = redis_client
+        self.ttl = ttl
+
+    def _key(self, user_id: int) -> str:
+        return f"{INDEX_KEY_PREFIX}{user_id}"
+
+    def add(self, user_id: int, session_id: str) -> None:
+        """
+        Record a session of a user, failures are logged and ignored.
+
+        :param user_id: Unique identifier of the user
+        :type user_id: int
+        :param session_id: Id of the session
+        :type session_id: str
+        :return: None
+
+        Usage example:
+        session_index.add(user_id, current_session_id())
+        """
+        try:
+            pipe = self._redis_client().pipeline(transaction=False)
+            pipe.sadd(self._key(user_id), session_id)
+            pipe.expire(self._key(user_id), self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not index session of user {user_id}: {e}")
+
+    def remove(self, user_id: int, session_id: str) -> None:
+        """
+        Forget a session of a user, failures are logged and ignored.
+
+        :param user_id: Unique identifier of the user
+        :type user_id: int
+        :param session_id: Id of the session
+        :type session_id: str
+        :return: None
+        """
+        try:
+            self._redis_client().srem(self._key(user_id), session_id)
+        except redis.RedisError as e:
+            logger.warning(f"Could not unindex session of user {user_id}: {e}")
+
+    def revoke_all(self, user_id: int, keep_session_id: Optional[str] = None) -> int:
+        """
+        End every session of a user.
+
+        :param user_id: Unique identifier of the user
+        :type user_id: int
+        :param keep_session_id: Session to leave alone, e.g. the one changing the password
+        :type keep_session_id: Optional[str]
+        :return: Number of sessions ended
+        :rtype: int
+        :raises redis.RedisError: If Redis cannot be reached
+
+        Usage example:
+        revoked = session_index.revoke_all(user_id, keep_session_id=current_session_id())
+        """
+        key = self._key(user_id)
+        pipe = self._redis_client().pipeline(transaction=True)
+        pipe.smembers(key)
+        pipe.delete(key)
+        if keep_session_id:
+            pipe.sadd(key, keep_session_id)
+            pipe.expire(key, self.ttl)
+        members = pipe.execute()[0]
+
+        session_ids: List[str] = [m.decode() if isinstance(m, bytes) else m for m in members]
+        session_ids = [sid for sid in session_ids if sid != keep_session_id]
+        if session_ids:
+            current_app.session_interface.revoke_sessions(session_ids)
+        logger.info(f"Revoked {len(session_ids)} sessions of user {user_id}")
+        return len(session_ids)
+
+
+session_index = SessionIndex(get_redis)
+
+
+def register_session(user_id: int) -> None:
+    """
+    Add the current session to the user's index, call after a successful login.
+
+    :param user_id: Unique identifier of the logged in user
+    :type user_id: int
+    :return: None
+    """
+    session_id = current_session_id()
+    if session_id:
+        session_index.add(user_id, session_id)
+
+
+def unregister_session(user_id: Optional[int]) -> None:
+    """
+    Remove the current session from the user's index, call before logging out.
+
+    :param user_id: Unique identifier of the logged in user, None if nobody is logged in
+    :type user_id: Optional[int]
+    :return: None
+    """
+    session_id = current_session_id()
+    if user_id and session_id:
+        session_index.remove(user_id, session_id)
+
+
+def revoke_after_commit(
+    db: Session, index: SessionIndex, user_id: int, keep_session_id: Optional[str] = None
+) -> None:
+    """
+    End every session of a user once the write session's transaction commits.
+
+    Revoking before the commit would log the user out even if the new
+    password never gets stored.
+
+    :param db: Write session performing the password change
+    :type db: Session
+    :param index: Index holding the user's sessions
+    :type index: SessionIndex
+    :param user_id: Unique identifier of the user
+    :type user_id: int
+    :param keep_session_id: Session to leave alone, e.g. the one changing the password
+    :type keep_session_id: Optional[str]
+    :return: None
+
+    Usage example:
+    revoke_after_commit(self.cred_repo.write_db_session, session_index, user_id)
+    """
+    db.info.setdefault(REVOCATIONS_KEY, []).append((index, user_id, keep_session_id))
+
+
+@event.listens_for(SessionWrite, "after_commit")
+def _revoke_after_commit(db: Session) -> None:
+    """Apply the revocations collected during the committed transaction."""
+    for index, user_id, keep_session_id in db.info.pop(REVOCATIONS_KEY, []):
+        try:
+            index.revoke_all(user_id, keep_session_id=keep_session_id)
+        except redis.RedisError as e:
+            logger.error(f"Could not revoke sessions of user {user_id} after a password change: {e}")
+
+
+@event.listens_for(SessionWrite, "after_soft_rollback")
+def _discard_after_rollback(db: Session, previous_transaction) -> None:
+    """The password did not change, forget the collected revocations."""
+    db.info.pop(REVOCATIONS_KEY, None)
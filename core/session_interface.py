@@ -0,0 +1,104 @@
+"""
+Throttled Redis Session Interface Module.
+
+Flask-Session rewrites a permanent session with SET on every request to
+slide its expiry, even when nothing in it changed. This interface only
+writes a session when it was modified. An unmodified session is refreshed
+with EXPIRE, and only once the last refresh is older than the touch
+interval.
+
+The remaining TTL is read together with the session (one pipelined round
+trip), so the age of the last refresh is known without storing a
+timestamp. Redis expiry and the cookie expiry are both refreshed at the
+same moments, so a session idle for the session lifetime still expires,
+at most one touch interval earlier than with a refresh on every request.
+"""
+
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from flask import Flask
+from flask_session._utils import total_seconds
+from flask_session.redis import RedisSession, RedisSessionInterface
+
+# Carries the remaining TTL from _retrieve_session_data to the session object
+_TTL_KEY = "__ttl__"
+
+
+class ThrottledRedisSession(RedisSession):
+    """Redis session that remembers the TTL its stored copy had when loaded."""
+
+    def __init__(self, initial=None, sid: Optional[str] = None, permanent: Optional[bool] = None):
+        initial = dict(initial or {})
+        ttl = initial.pop(_TTL_KEY, None)
+        super().__init__(initial, sid=sid, permanent=permanent)
+        self.ttl: Optional[int] = ttl
+        self.touch_only = False
+
+
+class ThrottledRedisSessionInterface(RedisSessionInterface):
+    """Redis session interface that saves on change and touches on a schedule."""
+
+    session_class = ThrottledRedisSession
+
+    def __init__(self, app: Flask, touch_interval: int = 0, **kwargs) -> None:
+        """
+        Initialize the interface.
+
+        :param app: Flask application
+        :type app: Flask
+        :param touch_interval: Minimum seconds between two TTL refreshes of an unmodified session, 0 refreshes on every request
+        :type touch_interval: int
+        :param kwargs: Arguments of RedisSessionInterface
+        :return: None
+        """
+        super().__init__(app, **kwargs)
+        self.touch_interval = touch_interval
+
+    def revoke_sessions(self, session_ids: Iterable[str]) -> None:
+        """
+        Delete the stored sessions of other clients by id.
+
+        :param session_ids: Ids of the sessions to end
+        :type session_ids: Iterable[str]
+        :return: None
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for sid in session_ids:
+            pipe.delete(self._get_store_id(sid))
+        pipe.execute()
+
+    def _retrieve_session_data(self, store_id: str) -> Optional[dict]:
+        """Load the session and its remaining TTL in one round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(store_id)
+        pipe.ttl(store_id)
+        serialized_session_data, ttl = pipe.execute()
+        if not serialized_session_data:
+            return None
+        data = self.serializer.decode(serialized_session_data)
+        # -1 (no expiry) and -2 (gone meanwhile) are not usable ages
+        data[_TTL_KEY] = ttl if ttl is not None and ttl >= 0 else None
+        return data
+
+    def should_set_storage(self, app: Flask, session: ThrottledRedisSession) -> bool:
+        """Write modified sessions, touch unmodified ones once per interval."""
+        if session.modified or not self.touch_interval:
+            return super().should_set_storage(app, session)
+        if not app.config["SESSION_REFRESH_EACH_REQUEST"]:
+            return False
+        if session.ttl is not None:
+            age = total_seconds(app.permanent_session_lifetime) - session.ttl
+            if age < self.touch_interval:
+                return False
+            session.touch_only = True
+        return True
+
+    def _upsert_session(
+        self, session_lifetime: timedelta, session: ThrottledRedisSession, store_id: str
+    ) -> None:
+        """Refresh the TTL of an unchanged session, store the session otherwise."""
+        # EXPIRE returns false if the key expired since it was read, store it again then
+        if session.touch_only and self.client.expire(store_id, total_seconds(session_lifetime)):
+            return
+        super()._upsert_session(session_lifetime, session, store_id)
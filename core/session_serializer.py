@@ -0,0 +1,96 @@
+"""
+Session Serializer Module.
+
+Compact serializer for the Redis session interface of Flask-Session.
+
+A stored session is one schema version byte followed by the msgpack encoded
+session dict. Schema 1 replaces the keys the application writes on every
+login with one-letter aliases, which is most of the payload of a typical
+session. Changing the alias table requires a new schema version, the version
+byte tells the decoder which table a stored session was written with.
+
+Sessions written before this serializer (plain msgpack or JSON from
+Flask-Session's own serializer) start with a byte that is never a schema
+version and are still read, so a deploy does not log anybody out.
+
+The size of every serialized session is recorded in the
+session_serialized_bytes histogram.
+"""
+
+from typing import Dict
+
+import msgspec
+from flask import Flask
+from flask_session.base import MsgSpecSerializer, Serializer, ServerSideSession
+from prometheus_client import Histogram
+
+SCHEMA_VERSION = 1
+
+SESSION_SIZE = Histogram(
+    "session_serialized_bytes",
+    "Size of serialized sessions written to Redis",
+    buckets=(32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+
+# Aliases of schema 1, never change them within a schema. Session keys written
+# by the application are never a single letter, so aliases cannot collide.
+_ALIASES_V1: Dict[str, str] = {
+    "_permanent": "p",
+    "user_email": "e",
+    "user_id": "u",
+    "is_authenticated": "a",
+    "is_totp_authenticated": "t",
+    "last_write_lsn": "l",
+    "dashboard_view": "d",
+}
+_KEYS_V1: Dict[str, str] = {alias: key for key, alias in _ALIASES_V1.items()}
+
+
+class VersionedMsgpackSerializer(Serializer):
+    """Msgpack serializer with a schema version byte and short key aliases."""
+
+    def __init__(self, app: Flask) -> None:
+        """
+        Initialize the encoder, decoder and the fallback for old sessions.
+
+        :param app: Flask application, used for logging
+        :type app: Flask
+        :return: None
+        """
+        self.app = app
+        self.encoder = msgspec.msgpack.Encoder()
+        self.decoder = msgspec.msgpack.Decoder(dict)
+        self.legacy = MsgSpecSerializer(app=app, format="msgpack")
+
+    def encode(self, session: ServerSideSession) -> bytes:
+        """
+        Serialize the session data.
+
+        :param session: Session to store
+        :type session: ServerSideSession
+        :return: Version byte followed by the msgpack payload
+        :rtype: bytes
+        """
+        data = {_ALIASES_V1.get(key, key): value for key, value in dict(session).items()}
+        try:
+            serialized = bytes((SCHEMA_VERSION,)) + self.encoder.encode(data)
+        except Exception as e:
+            self.app.logger.error(f"Failed to serialize session data: {e}")
+            raise
+        SESSION_SIZE.observe(len(serialized))
+        return serialized
+
+    def decode(self, serialized_data: bytes) -> dict:
+        """
+        Deserialize the session data.
+
+        :param serialized_data: Value stored in Redis
+        :type serialized_data: bytes
+        :return: Session dict
+        :rtype: dict
+        """
+        if serialized_data[:1] == bytes((SCHEMA_VERSION,)):
+            data = self.decoder.decode(serialized_data[1:])
+            return {_KEYS_V1.get(key, key): value for key, value in data.items()}
+        # A msgpack map or JSON object never starts with a schema version byte
+        return self.legacy.decode(serialized_data)
@@ -0,0 +1,157 @@
+"""
+SQL Comment Tagging Module.
+
+This module appends a sqlcommenter-style comment to every statement sent
+through the engines built by core.engines, so queries seen in
+pg_stat_statements on the primary and the replicas can be traced back to
+the code that issued them:
+
+    SELECT ... FROM users WHERE users.id = %(id_1)s
+    /*blueprint='users',repository='UserRepository.get_user_by_id',request_id='4f1c...',route='users.show_qrcode'*/
+
+Keys are sorted and values URL-encoded as in the sqlcommenter
+specification. Comments are ignored when Postgres computes the query id,
+so tagged statements are normalized and grouped exactly like untagged
+ones. With the format/pyformat paramstyles of psycopg2 the driver
+interpolates the statement, so ``%`` in the comment is doubled there. pg_stat_statements keeps the text of the first execution per query
+id, so the tags show one representative caller of each query.
+
+Configuration (environment variables):
+    - SQL_COMMENTS: Set to false to disable tagging (default: true)
+"""
+
+import os
+import re
+import sys
+import uuid
+from typing import Dict, Optional
+from urllib.parse import quote, unquote
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_COMMENTS = os.getenv("SQL_COMMENTS", "true").strip().lower() in ("1", "true", "yes", "on")
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Client-sent ids end up in pg_stat_statements and the Postgres logs, so only short, plain ones are kept
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+# A trailing /*...*/ comment, optionally followed by a semicolon
+_TRAILING_COMMENT = re.compile(r"/\*(?P<tags>[^*]*)\*/\s*;?\s*$")
+_TAG = re.compile(r"(?P<key>[^=,]+)='(?P<value>[^']*)'")
+
+
+def _calling_repository() -> Optional[str]:
+    """Return ``Class.method`` of the innermost repository frame on the stack."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").endswith("_repository"):
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            return f"{type(owner).__name__}.{name}" if owner is not None else name
+        frame = frame.f_back
+    return None
+
+
+def current_tags() -> Dict[str, str]:
+    """
+    Collect the tags describing the code that is issuing a statement.
+
+    :return: Tag names mapped to values, empty outside requests and repositories
+    :rtype: Dict[str, str]
+    """
+    tags = {}
+    if has_request_context():
+        if request.endpoint:
+            tags["route"] = request.endpoint
+        if request.blueprint:
+            tags["blueprint"] = request.blueprint
+        request_id = g.get("request_id")
+        if request_id:
+            tags["request_id"] = request_id
+    repository = _calling_repository()
+    if repository:
+        tags["repository"] = repository
+    return tags
+
+
+def format_comment(tags: Dict[str, str]) -> str:
+    """
+    Render tags as a sqlcommenter comment.
+
+    :param tags: Tag names mapped to values
+    :type tags: Dict[str, str]
+    :return: Comment such as ``/*route='auth.authenticate_login'*/``, empty if there are no tags
+    :rtype: str
+    """
+    if not tags:
+        return ""
+    # quote() escapes quotes and '*/', so a value cannot terminate the comment
+    return "/*" + ",".join(f"{key}='{quote(str(value), safe='')}'" for key, value in sorted(tags.items())) + "*/"
+
+
+def parse_comment(statement: str) -> Dict[str, str]:
+    """
+    Extract the tags of a statement's trailing sqlcommenter comment.
+
+    :param statement: SQL text, e.g. the query column of pg_stat_statements
+    :type statement: str
+    :return: Tag names mapped to decoded values, empty if the statement is untagged
+    :rtype: Dict[str, str]
+
+    Usage example:
+    route = parse_comment(row["query"]).get("route")
+    """
+    match = _TRAILING_COMMENT.search(statement)
+    if not match:
+        return {}
+    return {tag.group("key").strip(): unquote(tag.group("value")) for tag in _TAG.finditer(match.group("tags"))}
+
+
+def tag_engine(engine: Engine) -> None:
+    """
+    Append the current tags to every statement the engine executes.
+
+    :param engine: Engine to tag
+    :type engine: Engine
+    :return: None
+    """
+    if not SQL_COMMENTS:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _append_comment(conn, cursor, statement, parameters, context, executemany):
+        comment = format_comment(current_tags())
+        if comment:
+            # psycopg2 %-interpolates every statement it gets parameters for, even an empty dict
+            if conn.dialect.paramstyle in ("format", "pyformat") and not (context is not None and context.no_parameters):
+                comment = comment.replace("%", "%%")
+            statement = f"{statement} {comment}"
+        return statement, parameters
+
+
+def init_sql_comments(app: Flask) -> None:
+    """
+    Give every request an id for the SQL comments.
+
+    The id is taken from the X-Request-ID header when a proxy sets one
+    that is at most 64 letters, digits and dashes; otherwise one is
+    generated. The id is echoed back in the response.
+
+    :param app: Flask application
+    :type app: Flask
+    :return: None
+    """
+
+    @app.before_request
+    def _assign_request_id() -> None:
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = request_id if _VALID_REQUEST_ID.fullmatch(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers.setdefault(REQUEST_ID_HEADER, request_id)
+        return response
@@ -0,0 +1,100 @@
+"""
+pg_stat_statements Attribution Report.
+
+Ranks endpoints (or repository methods) by database time, using the
+sqlcommenter tags that core.sql_comments appends to every statement.
+The report runs offline on an export of pg_stat_statements, for example:
+
+    psql -c "\\copy (SELECT query, calls, total_exec_time FROM pg_stat_statements) TO 'stats.csv' CSV HEADER"
+    python -m core.sql_report stats.csv --by route --top 20
+
+Exports from several servers (primary and replicas) can be passed
+together and are summed. Column names of Postgres 12 and older
+(total_time) are accepted as well.
+"""
+
+import argparse
+import csv
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, TextIO
+
+from core.sql_comments import parse_comment
+
+UNTAGGED = "(untagged)"
+
+
+def aggregate(rows: Iterable[Dict[str, str]], by: str = "route") -> List[Dict[str, object]]:
+    """
+    Sum calls and execution time of pg_stat_statements rows per tag value.
+
+    :param rows: Rows with query, calls and total_exec_time (or total_time) columns
+    :type rows: Iterable[Dict[str, str]]
+    :param by: Tag to group by, e.g. "route", "blueprint" or "repository"
+    :type by: str
+    :return: One entry per tag value with calls, total_ms, mean_ms and queries, slowest first
+    :rtype: List[Dict[str, object]]
+
+    Usage example:
+    with open("stats.csv") as f:
+        ranking = aggregate(csv.DictReader(f), by="route")
+    """
+    totals = defaultdict(lambda: {"calls": 0, "total_ms": 0.0, "queries": 0})
+    for row in rows:
+        key = parse_comment(row["query"]).get(by, UNTAGGED)
+        entry = totals[key]
+        entry["calls"] += int(row["calls"])
+        entry["total_ms"] += float(row.get("total_exec_time") or row.get("total_time") or 0)
+        entry["queries"] += 1
+
+    ranking = [
+        {by: key, **entry, "mean_ms": entry["total_ms"] / entry["calls"] if entry["calls"] else 0.0}
+        for key, entry in totals.items()
+    ]
+    return sorted(ranking, key=lambda entry: entry["total_ms"], reverse=True)
+
+
+def write_report(ranking: List[Dict[str, object]], by: str, out: TextIO) -> None:
+    """
+    Print the ranking as an aligned text table.
+
+    :param ranking: Result of :func:`aggregate`
+    :type ranking: List[Dict[str, object]]
+    :param by: Tag the ranking is grouped by
+    :type by: str
+    :param out: Stream to write to
+    :type out: TextIO
+    :return: None
+    """
+    grand_total = sum(entry["total_ms"] for entry in ranking) or 1.0
+    width = max([len(by)] + [len(str(entry[by])) for entry in ranking])
+    out.write(f"{by:<{width}}  {'total_ms':>12}  {'share':>6}  {'calls':>10}  {'mean_ms':>9}  {'queries':>7}\n")
+    for entry in ranking:
+        out.write(
+            f"{entry[by]:<{width}}  {entry['total_ms']:>12.1f}  {entry['total_ms'] / grand_total:>6.1%}  "
+            f"{entry['calls']:>10}  {entry['mean_ms']:>9.3f}  {entry['queries']:>7}\n"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Rank endpoints by database time from pg_stat_statements exports.")
+    parser.add_argument("files", nargs="+", help="CSV exports of pg_stat_statements with a header row")
+    parser.add_argument("--by", default="route", help="Tag to group by: route, blueprint or repository (default: route)")
+    parser.add_argument("--top", type=int, default=0, help="Only show the N most expensive entries")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for path in args.files:
+        with open(path, newline="") as f:
+            rows.extend(csv.DictReader(f))
+
+    ranking = aggregate(rows, by=args.by)
+    if args.top:
+        ranking = ranking[: args.top]
+    write_report(ranking, args.by, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Stateless Token Session Module.
+
+Alternative to the Redis session backend: the whole session lives in a
+short-lived cookie that is encrypted and authenticated with Fernet
+(AES-CBC + HMAC-SHA256). Reading the session, and so the
+``is_authenticated`` check of every dashboard request, needs no network
+I/O.
+
+Redis only holds a small revocation set: the ids of sessions that logged
+out before their token expired. Each worker keeps a copy and refreshes it
+at most every SESSION_REVOCATION_REFRESH seconds. Entries are dropped once
+every token of the session has expired, so the set stays small.
+
+Tokens expire SESSION_TOKEN_MAX_AGE seconds after they were issued and are
+reissued once half of that has passed, which keeps active users logged in.
+SESSION_TOKEN_KEYS is a comma-separated list of Fernet keys: the first one
+encrypts, all of them decrypt. To rotate, put a new key first and remove the
+old one after a max age; tokens under an old key are reissued on their next
+request.
+
+Configuration (environment variables):
+    - SESSION_BACKEND: "redis" (default) or "token" for this backend
+    - SESSION_TOKEN_KEYS: Fernet keys, newest first (required for the token backend)
+    - SESSION_TOKEN_MAX_AGE: Seconds a token is valid (default: 900)
+    - SESSION_REVOCATION_REFRESH: Seconds between revocation set refreshes (default: 5)
+"""
+
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Set
+
+import redis
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from flask import Flask, Request, Response
+from flask.sessions import SecureCookieSession, SessionInterface
+
+from core.session_serializer import VersionedMsgpackSerializer
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "redis").strip().lower()
+SESSION_TOKEN_MAX_AGE = int(os.getenv("SESSION_TOKEN_MAX_AGE", "900"))
+SESSION_REVOCATION_REFRESH = float(os.getenv("SESSION_REVOCATION_REFRESH", "5"))
+
+REVOCATION_KEY = "session_revoked"
+_SID_KEY = "_jti"
+
+
+def token_keys() -> List[str]:
+    """Return the configured Fernet keys, newest first."""
+    return [key.strip() for key in os.getenv("SESSION_TOKEN_KEYS", "").split(",") if key.strip()]
+
+
+class RevocationList:
+    """Redis sorted set of revoked session ids, scored by when they can be forgotten."""
+
+    def __init__(
+        self,
+        redis_client: Callable[[], redis.Redis],
+        refresh_interval: float = SESSION_REVOCATION_REFRESH,
+        key: str = REVOCATION_KEY,
+    ) -> None:
+        """
+        Initialize an empty local copy.
+
+        :param redis_client: Function returning the Redis client
+        :type redis_client: Callable[[], redis.Redis]
+        :param refresh_interval: Seconds between refreshes of the local copy
+        :type refresh_interval: float
+        :param key: Redis key of the sorted set
+        :type key: str
+        :return: None
+        """
+        self._redis_client = redis_client
+        self.refresh_interval = refresh_interval
+        self.key = key
+        self._revoked: Set[str] = set()
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        """Reload the local copy if it is older than the refresh interval."""
+        now = time.time()
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            try:
+                members = self._redis_client().zrangebyscore(self.key, now, "+inf")
+                self._revoked = {m.decode() if isinstance(m, bytes) else m for m in members}
+            except redis.RedisError as e:
+                # Keep serving the last known set rather than logging everybody out
+                logger.warning(f"Could not refresh the session revocation set: {e}")
+            self._refreshed_at = time.monotonic()
+
+    def is_revoked(self, session_id: str) -> bool:
+        """
+        Check whether a session was revoked.
+
+        :param session_id: Session id carried in the token
+        :type session_id: str
+        :return: True if the session was revoked
+        :rtype: bool
+        """
+        self._refresh()
+        return session_id in self._revoked
+
+    def revoke(self, session_id: str, until: float) -> None:
+        """
+        Revoke a session.
+
+        :param session_id: Session id carried in the token
+        :type session_id: str
+        :param until: Unix time after which no token of the session is valid anyway
+        :type until: float
+        :return: None
+
+        Usage example:
+        revocations.revoke(session.sid, time.time() + SESSION_TOKEN_MAX_AGE)
+        """
+        try:
+            self.revoke_many([session_id], until)
+        except redis.RedisError as e:
+            logger.error(f"Could not revoke session {session_id}, it stays valid in other workers until it expires: {e}")
+
+    def revoke_many(self, session_ids: Iterable[str], until: float) -> None:
+        """
+        Revoke several sessions in one round trip.
+
+        :param session_ids: Session ids carried in the tokens
+        :type session_ids: Iterable[str]
+        :param until: Unix time after which no token of the sessions is valid anyway
+        :type until: float
+        :return: None
+        :raises redis.RedisError: If the revocations could not be stored
+        """
+        session_ids = list(session_ids)
+        if not session_ids:
+            return
+        self._revoked.update(session_ids)
+        pipe = self._redis_client().pipeline(transaction=False)
+        pipe.zadd(self.key, {session_id: until for session_id in session_ids})
+        pipe.zremrangebyscore(self.key, "-inf", time.time())
+        pipe.execute()
+
+
+class TokenSession(SecureCookieSession):
+    """Session kept in a token, with the session id all its tokens carry."""
+
+    def __init__(self, initial=None, sid: Optional[str] = None) -> None:
+        super().__init__(initial)
+        self.sid: str = sid or secrets.token_urlsafe(12)
+        self.issued_at: Optional[int] = None
+        self.reissue = False
+
+
+class TokenSessionInterface(SessionInterface):
+    """Flask session interface keeping the session in an encrypted cookie."""
+
+    session_class = TokenSession
+
+    def __init__(
+        self, app: Flask, keys: List[str], revocations: RevocationList, max_age: int = SESSION_TOKEN_MAX_AGE
+    ) -> None:
+        """
+        Initialize the interface.
+
+        :param app: Flask application
+        :type app: Flask
+        :param keys: Fernet keys, the first one encrypts
+        :type keys: List[str]
+        :param revocations: Revocation set to check tokens against
+        :type revocations: RevocationList
+        :param max_age: Seconds a token is valid
+        :type max_age: int
+        :return: None
+        :raises RuntimeError: If no key is given
+        """
+        if not keys:
+            raise RuntimeError("SESSION_TOKEN_KEYS must be set for the token session backend")
+        self.primary = Fernet(keys[0])
+        self.fernet = MultiFernet([Fernet(key) for key in keys])
+        self.revocations = revocations
+        self.max_age = max_age
+        self.serializer = VersionedMsgpackSerializer(app)
+
+    def open_session(self, app: Flask, request: Request) -> TokenSession:
+        """Decrypt the session cookie, an empty session if it is missing, invalid, expired or revoked."""
+        token = request.cookies.get(self.get_cookie_name(app))
+        if not token:
+            return self.session_class()
+        token = token.encode()
+        reissue = False
+        try:
+            payload = self.primary.decrypt(token, ttl=self.max_age)
+        except InvalidToken:
+            try:
+                payload = self.fernet.decrypt(token, ttl=self.max_age)
+                reissue = True
+            except InvalidToken:
+                return self.session_class()
+
+        data = self.serializer.decode(payload)
+        sid = data.pop(_SID_KEY, None)
+        if not sid or self.revocations.is_revoked(sid):
+            return self.session_class()
+        session = self.session_class(data, sid=sid)
+        session.issued_at = self.fernet.extract_timestamp(token)
+        session.reissue = reissue
+        return session
+
+    def revoke_sessions(self, session_ids: Iterable[str]) -> None:
+        """
+        Invalidate sessions of other clients by id.
+
+        :param session_ids: Ids of the sessions to end
+        :type session_ids: Iterable[str]
+        :return: None
+        """
+        self.revocations.revoke_many(session_ids, time.time() + self.max_age)
+
+    def save_session(self, app: Flask, session: TokenSession, response: Response) -> None:
+        """Issue a new token when the session changed, is half expired or uses an old key."""
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified:
+                if session.issued_at is not None:
+                    # A copy of the old cookie must not log in again
+                    self.revocations.revoke(session.sid, time.time() + self.max_age)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add("Cookie")
+            return
+
+        half_expired = session.issued_at is not None and time.time() - session.issued_at >= self.max_age / 2
+        if not (session.modified or session.reissue or half_expired):
+            return
+
+        token = self.primary.encrypt(self.serializer.encode({**session, _SID_KEY: session.sid}))
+        response.set_cookie(
+            name,
+            token.decode(),
+            max_age=self.max_age,
+            domain=domain,
+            path=path,
+            httponly=self.get_cookie_httponly(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration.
+
+The app is preloaded in the master process so workers share its memory
+copy-on-write and boot without re-importing the code base. Database engines
+are created lazily per process; the post_fork hook drops anything the
+master may have built so each worker opens its own connections.
+
+Workers are threaded (gthread). A login waiting for its password hash
+only holds one thread, the worker's other threads keep serving requests,
+and concurrent logins in one worker can fill its bounded hashing pool
+(core.hash_pool), which then answers 503 instead of queueing. Each
+worker's hashing pool gets an equal share of the CPU cores unless
+HASH_POOL_WORKERS is set.
+
+Configuration (environment variables):
+    - GUNICORN_BIND: Address to bind (default: 0.0.0.0:8080)
+    - GUNICORN_WORKERS: Number of worker processes (default: 4)
+    - GUNICORN_THREADS: Request threads per worker (default: 8)
+    - GUNICORN_MAX_REQUESTS: Requests before a worker is recycled, 0 disables (default: 10000)
+    - GUNICORN_MAX_REQUESTS_JITTER: Random spread so workers do not restart together (default: 1000)
+"""
+
+import os
+
+from core.database import reset_engines
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8080")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# Workers inherit this, so together they run one hashing process per core
+os.environ.setdefault("HASH_POOL_WORKERS", str(max((os.cpu_count() or 1) // workers, 1)))
+
+
+def post_fork(server, worker):
+    """Give every worker its own database connection pools."""
+    reset_engines()
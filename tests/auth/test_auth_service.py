@@ -92,3 +92,69 @@ def test_verify_password_null_password(auth_service, mock_cred_service):
 
 
 
+def test_verify_password_rehashes_outdated_cost(auth_service, mock_cred_service, monkeypatch):
+    """Test that a hash with an outdated cost factor is upgraded on login."""
+    monkeypatch.setattr("core.hashers._bcrypt_rounds", 5)
+    password = "valid_password"
+
+    mock_creds = MagicMock()
+    mock_creds.id = 1
+    mock_creds.password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+    mock_cred_service.get_credentials_via_email.return_value = mock_creds
+
+    assert auth_service.verify_password("user@example.com", password) is True
+    mock_cred_service.rehash_password.assert_called_once_with(cred_id=1, password=password)
+
+def test_verify_password_keeps_current_cost(auth_service, mock_cred_service, monkeypatch):
+    """Test that a hash with the current cost factor is left untouched."""
+    monkeypatch.setattr("core.hashers._bcrypt_rounds", 4)
+    password = "valid_password"
+
+    mock_creds = MagicMock()
+    mock_creds.password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+    mock_cred_service.get_credentials_via_email.return_value = mock_creds
+
+    assert auth_service.verify_password("user@example.com", password) is True
+    mock_cred_service.rehash_password.assert_not_called()
+
+def test_verify_password_rehash_failure_still_authenticates(auth_service, mock_cred_service, monkeypatch):
+    """Test that a failed hash upgrade does not fail the login."""
+    monkeypatch.setattr("core.hashers._bcrypt_rounds", 5)
+    password = "valid_password"
+
+    mock_creds = MagicMock()
+    mock_creds.password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+    mock_cred_service.get_credentials_via_email.return_value = mock_creds
+    mock_cred_service.rehash_password.side_effect = RuntimeError("db down")
+
+    assert auth_service.verify_password("user@example.com", password) is True
+
+def test_authenticate_success(auth_service, mock_cred_service):
+    """Test that authenticate returns the login projection on success."""
+    password = "valid_password"
+    login = MagicMock(credentials_id=1, user_id=7, mfa_enabled=False)
+    login.password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    mock_cred_service.get_login_details_via_email.return_value = login
+
+    result = auth_service.authenticate("user@example.com", password)
+
+    assert result is login
+    mock_cred_service.get_login_details_via_email.assert_called_once_with(email="user@example.com")
+    mock_cred_service.get_credentials_via_email.assert_not_called()
+
+def test_authenticate_wrong_password(auth_service, mock_cred_service):
+    """Test that authenticate returns None when the password does not match."""
+    login = MagicMock(credentials_id=1, user_id=7, mfa_enabled=False)
+    login.password = bcrypt.hashpw(b"correct_password", bcrypt.gensalt()).decode("utf-8")
+    mock_cred_service.get_login_details_via_email.return_value = login
+
+    assert auth_service.authenticate("user@example.com", "wrong_password") is None
+
+def test_authenticate_null_password(auth_service, mock_cred_service):
+    """Test that authenticate rejects users without a stored password."""
+    login = MagicMock(credentials_id=1, user_id=7, mfa_enabled=False)
+    login.password = None
+    mock_cred_service.get_login_details_via_email.return_value = login
+
+    with pytest.raises(ValueError, match="Invalid email or password"):
+        auth_service.authenticate("user@example.com", "any_password")
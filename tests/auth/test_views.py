@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+from unittest.mock import MagicMock
+
+import bcrypt
+import pytest
+from flask import Flask
+
+from blueprints.auth import views as auth_views
+from blueprints.auth.service import AuthService
+from blueprints.auth.views import auth
+from blueprints.users.crendentials_service import CredentialsService
+from core import hash_pool
+from core.hash_pool import HashingPool
+
+
+class UnitOfWork:
+    write_db = read_db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    """Single-process hashing pool without a queue, with its only slot held by a slow job."""
+    pool = HashingPool(max_workers=1, max_queue=0, timeout=5)
+    monkeypatch.setattr(hash_pool, "_pool", pool)
+    monkeypatch.setattr(hash_pool, "_pool_pid", os.getpid())
+    slow_job = threading.Thread(target=pool.run, args=("hash", time.sleep, 1))
+    slow_job.start()
+    while pool._slots._value:
+        time.sleep(0.001)
+    yield pool
+    slow_job.join()
+    pool.shutdown()
+
+
+def test_login_while_hashing_pool_is_full_returns_503(busy_pool, monkeypatch):
+    """Test that a login arriving while another request holds the pool fails fast with 503."""
+    cred_service = MagicMock(spec=CredentialsService)
+    login = MagicMock(credentials_id=1, user_id=7, mfa_enabled=False)
+    login.password = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    cred_service.get_login_details_via_email.return_value = login
+    monkeypatch.setattr(auth_views, "unit_of_work", UnitOfWork)
+    monkeypatch.setattr(auth_views, "create_auth_service", lambda **kwargs: AuthService(cred_service))
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.register_blueprint(auth)
+
+    start = time.perf_counter()
+    response = app.test_client().post("/auth/authenticate", data={"email": "ada@example.com", "password": "secret"})
+
+    assert response.status_code == 503
+    assert time.perf_counter() - start < 0.5
@@ -0,0 +1,179 @@
+import functools
+
+import pytest
+import redis
+
+from core import database
+
+
+@pytest.fixture(autouse=True)
+def fail_on_lazy_load(monkeypatch):
+    """Run every test with the lazy load guard, so hidden relationship queries fail."""
+    monkeypatch.setattr(database, "FAIL_ON_LAZY_LOAD", True)
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    """Start every test with an empty in-process cache, so results cannot leak between tests."""
+    from core.cache import profile_cache
+    profile_cache.clear()
+    yield
+    profile_cache.clear()
+
+
+def _command(name: str, write: bool = False):
+    """Count a fake Redis command, record writes and fail while Redis is down."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.fail:
+                raise redis.ConnectionError("down")
+            if not self._pipelined:
+                self.round_trips += 1
+            if write:
+                self.writes.append(name)
+            return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class FakeRedis(redis.Redis):
+    """In-memory stand-in for the Redis commands the app uses.
+
+    Strings, sets and sorted sets live in dicts, values come back as bytes
+    like from a real client. ``round_trips`` counts commands sent to the
+    server, a pipeline counting once, ``writes`` lists the names of write
+    commands, ``fail`` makes every command raise ConnectionError and
+    :meth:`age` lets time pass for key TTLs.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.sets = {}
+        self.zsets = {}
+        self.writes = []
+        self.round_trips = 0
+        self.fail = False
+        self._pipelined = False
+
+    def __repr__(self):
+        return f"<FakeRedis {len(self.values)} values>"
+
+    @staticmethod
+    def _encode(value):
+        return value.encode() if isinstance(value, str) else value
+
+    @_command("GET")
+    def get(self, key):
+        return self.values.get(key)
+
+    @_command("MGET")
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    @_command("SET", write=True)
+    def set(self, name, value, ex=None, px=None, nx=False):
+        if nx and name in self.values:
+            return None
+        self.values[name] = self._encode(value)
+        self.ttls[name] = ex if px is None else px / 1000
+        return True
+
+    @_command("INCR", write=True)
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+        return int(self.values[key])
+
+    @_command("TTL")
+    def ttl(self, key):
+        if key not in self.values:
+            return -2
+        ttl = self.ttls.get(key)
+        return -1 if ttl is None else ttl
+
+    @_command("EXPIRE", write=True)
+    def expire(self, key, seconds):
+        if key not in self.values and key not in self.sets:
+            return False
+        self.ttls[key] = seconds
+        return True
+
+    @_command("DEL", write=True)
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.zsets.pop(key, None)
+            self.ttls.pop(key, None)
+
+    @_command("SADD", write=True)
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    @_command("SREM", write=True)
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    @_command("SMEMBERS")
+    def smembers(self, key):
+        return {self._encode(member) for member in self.sets.get(key, set())}
+
+    @_command("ZADD", write=True)
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    @_command("ZREMRANGEBYSCORE", write=True)
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member, score in list(zset.items()):
+            if float(low) <= score <= float(high):
+                del zset[member]
+
+    @_command("ZRANGEBYSCORE")
+    def zrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        return [self._encode(member) for member, score in zset.items() if float(low) <= score <= float(high)]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def age(self, seconds):
+        """Let time pass for every key with a TTL."""
+        self.ttls = {key: ttl - seconds if ttl is not None else None for key, ttl in self.ttls.items()}
+
+
+class FakePipeline:
+    """Queues commands on a FakeRedis and sends them in one round trip."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.calls.append(lambda: command(*args, **kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        if self.client.fail:
+            raise redis.ConnectionError("down")
+        self.client.round_trips += 1
+        self.client._pipelined = True
+        try:
+            return [call() for call in self.calls]
+        finally:
+            self.client._pipelined = False
+
+
+@pytest.fixture
+def fake_redis():
+    """Fresh in-memory Redis."""
+    return FakeRedis()
@@ -0,0 +1,219 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from core import cache as cache_module
+from core.cache import TwoTierCache, cached, invalidate_after_commit
+from core.database import SessionWrite
+
+
+@pytest.fixture
+def two_tier(fake_redis):
+    return TwoTierCache("test", maxsize=2, local_ttl=60, redis_ttl=60, lock_timeout_ms=50, redis_client=lambda: fake_redis)
+
+
+def load(cache, key, loader, tags=("user:1",), local=True):
+    return cache.get_or_load(key, tags, loader, list, tuple, local=local)
+
+
+def test_second_lookup_is_served_locally(two_tier):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return (1, 2)
+
+    assert load(two_tier, "k", loader) == (1, 2)
+    assert load(two_tier, "k", loader) == (1, 2)
+    assert len(calls) == 1
+
+
+def test_other_worker_is_served_from_redis(two_tier, fake_redis):
+    load(two_tier, "k", lambda: (1, 2))
+    other_worker = TwoTierCache("test", redis_client=lambda: fake_redis)
+
+    assert load(other_worker, "k", lambda: pytest.fail("database queried")) == (1, 2)
+
+
+def test_bump_invalidates_both_tiers(two_tier, fake_redis):
+    other_worker = TwoTierCache("test", redis_client=lambda: fake_redis)
+    load(two_tier, "k", lambda: (1, 2))
+    load(other_worker, "k", lambda: (1, 2))
+
+    two_tier.bump("user:1")
+
+    assert load(two_tier, "k", lambda: (3, 4)) == (3, 4)
+    other_worker.clear()
+    assert load(other_worker, "k", lambda: (5, 6)) == (3, 4)
+
+
+def test_bump_leaves_other_tags_alone(two_tier):
+    load(two_tier, "k", lambda: (1, 2), tags=("user:2",))
+    two_tier.bump("user:1")
+
+    assert load(two_tier, "k", lambda: pytest.fail("database queried"), tags=("user:2",)) == (1, 2)
+
+
+def test_none_is_not_cached(two_tier):
+    assert load(two_tier, "k", lambda: None) is None
+    assert load(two_tier, "k", lambda: (1, 2)) == (1, 2)
+
+
+def test_lru_evicts_least_recently_used(two_tier):
+    cache = TwoTierCache("test", maxsize=2, local_ttl=60)
+    load(cache, "a", lambda: (1,))
+    load(cache, "b", lambda: (2,))
+    load(cache, "a", lambda: pytest.fail("database queried"))
+    load(cache, "c", lambda: (3,))
+
+    assert load(cache, "a", lambda: pytest.fail("database queried")) == (1,)
+    assert load(cache, "b", lambda: ("reloaded",)) == ("reloaded",)
+
+
+def test_local_entries_expire():
+    cache = TwoTierCache("test", local_ttl=0)
+    load(cache, "k", lambda: (1,))
+
+    time.sleep(0.001)
+    assert load(cache, "k", lambda: (2,)) == (2,)
+
+
+def test_non_local_lookups_skip_the_process_tier(two_tier, fake_redis):
+    load(two_tier, "k", lambda: (1, 2), local=False)
+    fake_redis.values.clear()
+
+    assert load(two_tier, "k", lambda: (3, 4), local=False) == (3, 4)
+
+
+def test_redis_errors_fall_through_to_the_database(two_tier, fake_redis):
+    fake_redis.fail = True
+
+    assert load(two_tier, "k", lambda: (1, 2), local=False) == (1, 2)
+    two_tier.bump("user:1")
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = TwoTierCache("test", lock_timeout_ms=2000)
+    calls = []
+    release = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(2)
+        return (1,)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(load(cache, "k", slow_loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(1,)] * 5
+    assert len(calls) == 1
+
+
+def test_other_workers_wait_for_the_loading_worker(fake_redis):
+    cache = TwoTierCache("test", lock_timeout_ms=1000, redis_client=lambda: fake_redis)
+    redis_key = "cache:test:k|0"
+    fake_redis.set(redis_key + ":lock", "1", nx=True)
+    threading.Timer(0.05, lambda: fake_redis.set(redis_key, "[1, 2]")).start()
+
+    assert load(cache, "k", lambda: pytest.fail("database queried"), local=False) == (1, 2)
+
+
+def test_cached_formats_tags_from_arguments(monkeypatch):
+    cache = TwoTierCache("test")
+    bumped = []
+    monkeypatch.setattr(cache, "bump", lambda *tags: bumped.extend(tags))
+
+    class Repository:
+        calls = 0
+
+        @cached(tags=("user:{user_id}",), cache=cache)
+        def lookup(self, user_id, suffix="x"):
+            Repository.calls += 1
+            return f"{user_id}{suffix}"
+
+    repository = Repository()
+    assert repository.lookup(1) == "1x"
+    assert repository.lookup(user_id=1) == "1x"
+    assert repository.lookup(2) == "2x"
+    assert Repository.calls == 2
+
+    cache._local_versions["user:1"] = 1
+    assert repository.lookup(1) == "1x"
+    assert Repository.calls == 3
+
+
+def test_cached_is_bypassed_when_disabled(monkeypatch):
+    monkeypatch.setattr(cache_module, "CACHE_ENABLED", False)
+    cache = TwoTierCache("test")
+
+    class Repository:
+        calls = 0
+
+        @cached(tags=(), cache=cache)
+        def lookup(self):
+            Repository.calls += 1
+            return 1
+
+    Repository().lookup()
+    Repository().lookup()
+    assert Repository.calls == 2
+
+
+def test_invalidations_apply_on_commit_only(monkeypatch):
+    bumped = []
+    monkeypatch.setattr(cache_module.profile_cache, "bump", lambda *tags, lsn=None: bumped.extend(tags))
+    db = SessionWrite(bind=create_engine("sqlite://"))
+    try:
+        db.execute(text("SELECT 1"))
+        invalidate_after_commit(db, "user:1")
+        db.rollback()
+        db.commit()
+        assert bumped == []
+
+        invalidate_after_commit(db, "user:1", "email:a@example.com")
+        assert bumped == []
+        db.commit()
+        assert sorted(bumped) == ["email:a@example.com", "user:1"]
+    finally:
+        db.close()
+
+
+def test_fill_after_bump_waits_for_the_write(two_tier, fake_redis):
+    other_worker = TwoTierCache("test", redis_client=lambda: fake_redis)
+    two_tier.bump("user:1", lsn="0/20")
+    replayed = {"lsn": "0/10"}
+
+    def is_fresh(lsn):
+        return cache_module._lsn_order(replayed["lsn"]) >= cache_module._lsn_order(lsn)
+
+    assert two_tier.get_or_load("k", ("user:1",), lambda: ("stale",), list, tuple, is_fresh=is_fresh) == ("stale",)
+    assert other_worker.get_or_load("k", ("user:1",), lambda: ("fresh",), list, tuple, local=False) == ("fresh",)
+
+    two_tier.bump("user:1", lsn="0/30")
+    replayed["lsn"] = "0/30"
+    two_tier.get_or_load("k", ("user:1",), lambda: ("newer",), list, tuple, is_fresh=is_fresh)
+    assert other_worker.get_or_load(
+        "k", ("user:1",), lambda: pytest.fail("database queried"), list, tuple, local=False
+    ) == ("newer",)
+    assert two_tier.get_or_load("k", ("user:1",), lambda: pytest.fail("database queried"), list, tuple, is_fresh=is_fresh) == ("newer",)
+
+
+def test_fill_guard_without_redis_uses_local_bumps():
+    cache = TwoTierCache("test", local_ttl=60)
+    cache.bump("user:1", lsn="1/0")
+
+    cache.get_or_load("k", ("user:1",), lambda: ("stale",), list, tuple, is_fresh=lambda lsn: False)
+
+    assert cache.get_or_load("k", ("user:1",), lambda: ("fresh",), list, tuple, is_fresh=lambda lsn: True) == ("fresh",)
+
+
+def test_lsn_order():
+    assert sorted(["1/0", "0/FFFFFFFF", "0/A"], key=cache_module._lsn_order) == ["0/A", "0/FFFFFFFF", "1/0"]
@@ -0,0 +1,348 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask, session
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from blueprints.users.credentials_repository import CredentialsRepository
+from blueprints.users.mfa_repository import MFARepository
+from blueprints.users.models import MFA, Credentials, User
+from core import database
+from core.database import (
+    LSN_SESSION_KEY,
+    Base,
+    LazyLoadError,
+    LazySession,
+    ReadOnlySessionError,
+    _capture_write_lsn,
+    _ensure_read_your_writes,
+    get_read_db,
+    get_write_db,
+    unit_of_work,
+)
+
+
+@pytest.fixture
+def app():
+    """Minimal Flask app providing a request context with a session."""
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    return app
+
+
+def make_session(dialect="postgresql", scalars=()):
+    """Mock SQLAlchemy session bound to the given dialect."""
+    db = MagicMock()
+    db.info = {"has_writes": True}
+    db.get_bind.return_value.dialect.name = dialect
+    db.execute.return_value.scalar.side_effect = list(scalars)
+    return db
+
+
+def test_capture_write_lsn_stores_token(app):
+    """Test that a committed write stores the primary LSN in the session."""
+    db = make_session(scalars=["0/16B3748"])
+    with app.test_request_context():
+        _capture_write_lsn(db)
+
+        assert session[LSN_SESSION_KEY]["lsn"] == "0/16B3748"
+
+
+def test_capture_write_lsn_skips_without_writes(app):
+    """Test that read-only use of the write session stores no token."""
+    db = make_session(scalars=["0/16B3748"])
+    db.info = {}
+    with app.test_request_context():
+        _capture_write_lsn(db)
+
+        assert LSN_SESSION_KEY not in session
+    db.execute.assert_not_called()
+
+
+def test_capture_write_lsn_skips_sqlite(app):
+    """Test that non-Postgres engines are ignored."""
+    db = make_session(dialect="sqlite")
+    with app.test_request_context():
+        _capture_write_lsn(db)
+
+        assert LSN_SESSION_KEY not in session
+
+
+def test_read_session_unchanged_without_token(app):
+    """Test that reads go to the replica when the user has not written."""
+    db = make_session()
+    with app.test_request_context():
+        assert _ensure_read_your_writes(db) is db
+    db.execute.assert_not_called()
+
+
+def test_read_session_uses_caught_up_replica(app):
+    """Test that a replica past the write LSN is kept."""
+    db = make_session(scalars=[False, True])
+    with app.test_request_context():
+        session[LSN_SESSION_KEY] = {"lsn": "0/16B3748", "at": time.time()}
+
+        assert _ensure_read_your_writes(db) is db
+    assert db.execute.call_count == 2
+
+
+def test_read_session_falls_back_to_primary(app, monkeypatch):
+    """Test that a lagging replica is replaced by the primary."""
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_WAIT_MS", 0)
+    db = make_session(scalars=[False])
+    with app.test_request_context(), patch.object(database, "SessionRead") as session_read, \
+         patch.object(database, "get_primary_read_engine") as get_primary_read_engine:
+        session[LSN_SESSION_KEY] = {"lsn": "0/16B3748", "at": time.time()}
+
+        result = _ensure_read_your_writes(db)
+
+    db.close.assert_called_once()
+    session_read.assert_called_once_with(bind=get_primary_read_engine.return_value)
+    assert result is session_read.return_value
+
+
+def test_expired_token_is_dropped(app, monkeypatch):
+    """Test that old write tokens no longer force primary reads."""
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_TTL", 1)
+    db = make_session()
+    with app.test_request_context():
+        session[LSN_SESSION_KEY] = {"lsn": "0/16B3748", "at": time.time() - 10}
+
+        assert _ensure_read_your_writes(db) is db
+        assert LSN_SESSION_KEY not in session
+
+
+def test_lazy_session_not_created_until_used():
+    """Test that the factory only runs on first attribute access."""
+    factory = MagicMock()
+    db = LazySession(factory)
+
+    assert db.started is False
+    factory.assert_not_called()
+
+    db.query("anything")
+
+    factory.assert_called_once()
+    factory.return_value.query.assert_called_once_with("anything")
+    assert db.started is True
+
+
+def test_lazy_session_close_without_use():
+    """Test that closing an unused proxy does not create a session."""
+    factory = MagicMock()
+
+    LazySession(factory).close()
+
+    factory.assert_not_called()
+
+
+def test_get_write_db_untouched_opens_nothing():
+    """Test that an unused write session never reaches the primary."""
+    with patch.object(database, "SessionWrite") as session_write:
+        with get_write_db():
+            pass
+
+    session_write.assert_not_called()
+
+
+def test_get_write_db_skips_commit_for_reads():
+    """Test that a write session used only for reads is not committed."""
+    with patch.object(database, "SessionWrite") as session_write, patch.object(database, "get_write_engine"):
+        real = session_write.return_value
+        real.info, real.new, real.dirty, real.deleted = {}, [], [], []
+        with get_write_db() as db:
+            db.query("anything")
+
+    real.commit.assert_not_called()
+    real.close.assert_called_once()
+
+
+def test_get_write_db_commits_writes():
+    """Test that a write session with flushed changes is committed."""
+    with patch.object(database, "SessionWrite") as session_write, patch.object(database, "get_write_engine"):
+        real = session_write.return_value
+        real.info = {"has_writes": True}
+        with get_write_db() as db:
+            db.flush()
+
+    real.commit.assert_called_once()
+
+
+def test_get_read_db_untouched_opens_nothing():
+    """Test that an unused read session does not pick a replica."""
+    with patch.object(database, "_choose_read_engine") as choose:
+        with get_read_db():
+            pass
+
+    choose.assert_not_called()
+
+
+def test_unit_of_work_commits_once():
+    """Test that a unit of work commits its write session once at the end."""
+    with patch.object(database, "SessionWrite") as session_write, patch.object(database, "get_write_engine"):
+        real = session_write.return_value
+        real.info = {"has_writes": True}
+        with unit_of_work() as uow:
+            uow.write_db.flush()
+            uow.write_db.flush()
+
+    real.commit.assert_called_once()
+    real.close.assert_called_once()
+
+
+def test_unit_of_work_rolls_back_on_error():
+    """Test that an exception discards every write of the unit of work."""
+    with patch.object(database, "SessionWrite") as session_write, patch.object(database, "get_write_engine"):
+        real = session_write.return_value
+        real.info = {"has_writes": True}
+        with pytest.raises(RuntimeError):
+            with unit_of_work() as uow:
+                uow.write_db.flush()
+                raise RuntimeError("boom")
+
+    real.commit.assert_not_called()
+    real.rollback.assert_called_once()
+    real.close.assert_called_once()
+
+
+def test_unit_of_work_logs_domain_errors_without_traceback(caplog):
+    """Test that expected ValueErrors are not logged as errors."""
+    with pytest.raises(ValueError):
+        with unit_of_work():
+            raise ValueError("Invalid email or password")
+
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+
+def test_unit_of_work_logs_unexpected_errors(caplog):
+    """Test that unexpected exceptions are logged with their traceback."""
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            raise RuntimeError("boom")
+
+    errors = [record for record in caplog.records if record.levelname == "ERROR"]
+    assert len(errors) == 1 and errors[0].exc_info
+
+
+def test_unit_of_work_registration_is_atomic(monkeypatch):
+    """Test that a failure after earlier inserts leaves no orphan rows behind."""
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_write_engine", lambda: engine)
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work() as uow:
+            cred_repo = CredentialsRepository(write_db_session=uow.write_db, read_db_session=uow.read_db)
+            mfa_repo = MFARepository(write_db_session=uow.write_db, read_db_session=uow.read_db)
+            cred_repo.create_credentials(email="new@example.com", password="hash")
+            mfa_repo.create("SECRET")
+            raise RuntimeError("user insert failed")
+
+    with Session(engine) as db:
+        assert db.query(Credentials).count() == 0
+        assert db.query(MFA).count() == 0
+
+
+@pytest.fixture
+def read_session():
+    """Read session on an in-memory SQLite database with one credentials row."""
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Credentials(email="plain@example.com", password="hash"))
+        db.commit()
+    db = database.SessionRead(bind=engine)
+    yield db
+    db.close()
+
+
+def test_read_session_refuses_flush(read_session):
+    """Test that pending changes cannot be flushed through a read session."""
+    read_session.add(MFA(totp_secret="SECRET"))
+
+    with pytest.raises(ReadOnlySessionError):
+        read_session.flush()
+
+
+def test_read_session_refuses_dml(read_session):
+    """Test that UPDATE statements are rejected before reaching the replica."""
+    with pytest.raises(ReadOnlySessionError):
+        read_session.execute(update(Credentials).values(password="changed"))
+
+
+def test_read_session_fetch_one_skips_identity_map(read_session):
+    """Test that the fast path returns plain rows without loading ORM objects."""
+    row = read_session.fetch_one(select(Credentials.id, Credentials.email).where(Credentials.email == "plain@example.com"))
+
+    assert row.email == "plain@example.com"
+    assert len(read_session.identity_map) == 0
+
+
+def test_read_engines_start_read_only_transactions():
+    """Test that read sessions' engines begin read-only without an extra statement."""
+    read_engine = database.get_read_engine()
+    primary_read_engine = database.get_primary_read_engine()
+
+    assert read_engine.get_execution_options()["postgresql_readonly"] is True
+    assert primary_read_engine.get_execution_options()["postgresql_readonly"] is True
+    assert primary_read_engine.pool is database.get_write_engine().pool
+    assert not database.get_write_engine().get_execution_options().get("postgresql_readonly")
+
+
+@pytest.fixture
+def user_engine():
+    """In-memory SQLite engine with one user that has credentials and MFA."""
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        mfa, cred = MFA(totp_secret="SECRET"), Credentials(email="mfa@example.com", password="hash")
+        db.add_all([mfa, cred])
+        db.flush()
+        db.add(User(first_name="Mfa", last_name="User", credentials_id=cred.id, mfa_id=mfa.id))
+        db.commit()
+    return engine
+
+
+def test_read_session_raises_on_lazy_relationship(user_engine):
+    """Test that read sessions do not lazy load relationships by default."""
+    with database.SessionRead(bind=user_engine) as db:
+        user = db.query(User).first()
+
+        with pytest.raises(InvalidRequestError):
+            user.credentials
+
+
+def test_read_session_honours_explicit_loading(user_engine):
+    """Test that relationships loaded explicitly are available after the session closes."""
+    with database.SessionRead(bind=user_engine) as db:
+        user = db.query(User).options(selectinload(User.credentials)).first()
+
+    assert user.credentials.email == "mfa@example.com"
+
+
+def test_write_session_lazy_load_fails_in_test_mode(user_engine):
+    """Test that the guard rejects implicit lazy loads in write sessions."""
+    with database.SessionWrite(bind=user_engine) as db:
+        user = db.get(User, 1)
+
+        with pytest.raises(LazyLoadError, match="User"):
+            user.mfa
+
+
+def test_write_session_lazy_load_allowed_outside_test_mode(user_engine, monkeypatch):
+    """Test that write sessions keep lazy loading when the guard is off."""
+    monkeypatch.setattr(database, "FAIL_ON_LAZY_LOAD", False)
+    with database.SessionWrite(bind=user_engine) as db:
+        assert db.get(User, 1).mfa.totp_secret == "SECRET"
+
+
+def test_wal_helpers_are_no_ops_outside_postgres():
+    """Test that LSN helpers report nothing to wait for on SQLite."""
+    db = Session(create_engine("sqlite://"))
+
+    assert database.current_wal_lsn(db) is None
+    assert database.has_replayed(db, "0/16B3748") is True
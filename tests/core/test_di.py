@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import MagicMock
+from flask import Flask
 
 from core.di import (
+    Container,
     create_user_service,
     create_mfa_service,
     create_credentials_service,
@@ -162,4 +164,40 @@ def test_service_factory_integration():
     assert isinstance(dashboard_service, DashboardService)
     
     assert isinstance(dashboard_service.user_service, UserService)
-    assert isinstance(dashboard_service.mfa_service, MFAservice)
\ No newline at end of file
+    assert isinstance(dashboard_service.mfa_service, MFAservice)
+
+
+def test_container_builds_lazily_and_once(mock_db):
+    """Test that components are built on first access and then reused."""
+    write_db, read_db = mock_db
+    container = Container(write_db, read_db)
+
+    assert "user_service" not in vars(container)
+    user_service = container.user_service
+
+    assert container.user_service is user_service
+    assert user_service.cred_service is container.cred_service
+    assert container.dashboard_service.mfa_service is user_service.mfa_service
+    assert "auth_service" not in vars(container)
+
+
+def test_factories_share_graph_within_request(mock_db):
+    """Test that factory calls in one request reuse the same repositories."""
+    write_db, read_db = mock_db
+
+    with Flask(__name__).test_request_context():
+        user_service = create_user_service(write_db, read_db)
+        auth_service = create_auth_service(write_db, read_db)
+        mfa_service = create_mfa_service(write_db, read_db)
+        other = create_user_service(MagicMock(), read_db)
+
+    assert auth_service.cred_service is user_service.cred_service
+    assert mfa_service is user_service.mfa_service
+    assert other is not user_service
+
+
+def test_factories_do_not_share_outside_requests(mock_db):
+    """Test that without a request every factory call builds a new graph."""
+    write_db, read_db = mock_db
+
+    assert create_user_service(write_db, read_db) is not create_user_service(write_db, read_db)
@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+from core import hash_pool
+from core.hash_pool import HashingPool, HashingPoolBusyError, get_hashing_pool
+
+
+@pytest.fixture
+def inline_pool():
+    """Pool that runs jobs in the calling thread."""
+    return HashingPool(max_workers=0, max_queue=0, timeout=1)
+
+
+@pytest.fixture
+def process_pool():
+    """Pool backed by a single worker process."""
+    pool = HashingPool(max_workers=1, max_queue=1, timeout=5)
+    yield pool
+    pool.shutdown()
+
+
+def test_inline_pool_runs_job(inline_pool):
+    """Test running a job without worker processes."""
+    assert inline_pool.run("hash", pow, 2, 10) == 1024
+
+
+def test_process_pool_runs_job(process_pool):
+    """Test running a job in a worker process."""
+    assert process_pool.run("hash", pow, 2, 10) == 1024
+
+
+def test_full_pool_fails_fast(inline_pool):
+    """Test that a saturated pool rejects new jobs immediately."""
+    inline_pool._slots.acquire()
+
+    with pytest.raises(HashingPoolBusyError, match="full"):
+        inline_pool.run("hash", pow, 2, 10)
+
+    inline_pool._slots.release()
+
+
+def test_slot_released_after_error(inline_pool):
+    """Test that a failing job does not leak its slot."""
+    with pytest.raises(ValueError):
+        inline_pool.run("verify", int, "not-a-number")
+
+    assert inline_pool.run("hash", pow, 2, 10) == 1024
+
+
+def test_job_timeout_raises_busy():
+    """Test that a job exceeding the timeout raises HashingPoolBusyError."""
+    pool = HashingPool(max_workers=1, max_queue=0, timeout=0.05)
+    try:
+        with pytest.raises(HashingPoolBusyError, match="timed out"):
+            pool.run("hash", time.sleep, 1)
+    finally:
+        pool.shutdown()
+
+
+def test_dead_worker_restarts_pool(process_pool):
+    """Test that a worker dying mid-job raises busy and the next job gets a fresh pool."""
+    broken = process_pool._get_executor()
+    with pytest.raises(HashingPoolBusyError, match="restarting"):
+        process_pool.run("hash", os._exit, 1)
+    # Let the broken executor's management thread finish before other tests patch os.getpid
+    broken.shutdown(wait=True)
+
+    assert process_pool.run("hash", pow, 2, 10) == 1024
+
+
+def test_get_hashing_pool_rebuilt_after_fork(monkeypatch):
+    """Test that a new pool is created when the process id changes."""
+    monkeypatch.setenv("HASH_POOL_WORKERS", "0")
+    monkeypatch.setattr(hash_pool, "_pool", None)
+    first = get_hashing_pool()
+
+    assert get_hashing_pool() is first
+
+    monkeypatch.setattr(hash_pool.os, "getpid", lambda: -1)
+    assert get_hashing_pool() is not first
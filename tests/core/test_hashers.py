@@ -0,0 +1,165 @@
+import bcrypt
+import pytest
+
+from core import hash_pool, hashers
+from core.hashers import (
+    BcryptHasher,
+    ScryptHasher,
+    check_password,
+    get_hasher,
+    hash_password,
+    identify_hasher,
+    needs_rehash,
+    validate_password_hasher,
+)
+
+
+@pytest.fixture(autouse=True)
+def inline_hashing(monkeypatch):
+    """Run hashing inline with cheap parameters."""
+    monkeypatch.setenv("HASH_POOL_WORKERS", "0")
+    monkeypatch.setattr(hash_pool, "_pool", None)
+    monkeypatch.setattr(hashers, "_bcrypt_rounds", 4)
+    monkeypatch.setenv("SCRYPT_LN", "10")
+    monkeypatch.setenv("ARGON2_TIME_COST", "1")
+    monkeypatch.setenv("ARGON2_MEMORY_KIB", "1024")
+
+
+@pytest.mark.parametrize("name", ["bcrypt", "scrypt", "argon2id"])
+def test_hash_and_check_password(monkeypatch, name):
+    """Test that every hasher round-trips through the public helpers."""
+    monkeypatch.setenv("PASSWORD_HASHER", name)
+
+    hashed = hash_password("secret_password")
+
+    assert identify_hasher(hashed) is get_hasher(name)
+    assert check_password("secret_password", hashed) is True
+    assert check_password("wrong_password", hashed) is False
+
+
+def test_scrypt_has_no_72_byte_limit(monkeypatch):
+    """Test that scrypt distinguishes passwords beyond 72 bytes."""
+    monkeypatch.setenv("PASSWORD_HASHER", "scrypt")
+    long_password = "a" * 100
+
+    hashed = hash_password(long_password)
+
+    assert check_password(long_password, hashed) is True
+    assert check_password("a" * 99, hashed) is False
+
+
+def test_default_hasher_is_bcrypt(monkeypatch):
+    """Test that bcrypt is used when no hasher is configured."""
+    monkeypatch.delenv("PASSWORD_HASHER", raising=False)
+
+    assert isinstance(get_hasher(), BcryptHasher)
+
+
+def test_unknown_hasher(monkeypatch):
+    """Test that an unknown hasher name is rejected."""
+    with pytest.raises(ValueError, match="not available"):
+        get_hasher("md5")
+
+
+def test_validate_password_hasher_rejects_unknown_name(monkeypatch):
+    """Test that a misconfigured PASSWORD_HASHER fails at startup."""
+    monkeypatch.setenv("PASSWORD_HASHER", "md5")
+
+    with pytest.raises(RuntimeError, match="PASSWORD_HASHER"):
+        validate_password_hasher()
+
+
+def test_password_hasher_is_abstract():
+    """Test that a hasher without hash and verify cannot be instantiated."""
+    class Incomplete(hashers.PasswordHasher):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_unsupported_hash_format():
+    """Test that an unknown hash prefix is rejected."""
+    with pytest.raises(ValueError, match="Unsupported password hash format"):
+        check_password("secret_password", "$1$legacy$hash")
+
+
+def test_needs_rehash_on_format_change(monkeypatch):
+    """Test that hashes from a non-default hasher are migrated."""
+    monkeypatch.setenv("PASSWORD_HASHER", "bcrypt")
+    bcrypt_hash = hash_password("secret_password")
+
+    monkeypatch.setenv("PASSWORD_HASHER", "scrypt")
+
+    assert needs_rehash(bcrypt_hash) is True
+    assert needs_rehash(hash_password("secret_password")) is False
+
+
+def test_needs_rehash_on_scrypt_params_change(monkeypatch):
+    """Test that scrypt hashes with outdated parameters are migrated."""
+    monkeypatch.setenv("PASSWORD_HASHER", "scrypt")
+    hashed = hash_password("secret_password")
+
+    monkeypatch.setenv("SCRYPT_LN", "11")
+
+    assert ScryptHasher().needs_rehash(hashed) is True
+
+
+def test_calibrate_bcrypt_rounds_pinned(monkeypatch):
+    """Test that BCRYPT_ROUNDS skips the measurement."""
+    monkeypatch.setattr(hashers, "_bcrypt_rounds", None)
+    monkeypatch.setenv("BCRYPT_ROUNDS", "11")
+
+    assert hashers.calibrate_bcrypt_rounds() == 11
+    assert hashers.get_bcrypt_rounds() == 11
+
+
+def test_calibrate_bcrypt_rounds_clamped(monkeypatch):
+    """Test that calibration stays within the configured bounds."""
+    monkeypatch.delenv("BCRYPT_ROUNDS", raising=False)
+    monkeypatch.setenv("BCRYPT_MIN_ROUNDS", "4")
+    monkeypatch.setenv("BCRYPT_MAX_ROUNDS", "6")
+
+    assert hashers.calibrate_bcrypt_rounds(target_ms=0.0001) == 4
+    assert hashers.calibrate_bcrypt_rounds(target_ms=100000) == 6
+
+
+def test_get_hash_rounds():
+    """Test extracting the cost factor from a bcrypt hash."""
+    hashed = bcrypt.hashpw(b"secret_password", bcrypt.gensalt(rounds=5)).decode("utf-8")
+
+    assert hashers.get_hash_rounds(hashed) == 5
+    assert hashers.get_hash_rounds("not-a-hash") is None
+
+
+def test_needs_rehash_on_bcrypt_cost_change(monkeypatch):
+    """Test that only bcrypt hashes weaker than the current cost need a rehash."""
+    monkeypatch.delenv("PASSWORD_HASHER", raising=False)
+    monkeypatch.setattr(hashers, "_bcrypt_rounds", 5)
+
+    assert needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=5)).decode("utf-8")) is False
+    assert needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=4)).decode("utf-8")) is True
+    assert needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=6)).decode("utf-8")) is False
+
+
+def test_calibrate_bcrypt_rounds_uses_median(monkeypatch):
+    """Test that one outlier timing does not move the calibrated cost."""
+    monkeypatch.delenv("BCRYPT_ROUNDS", raising=False)
+    monkeypatch.setenv("BCRYPT_MIN_ROUNDS", "10")
+    monkeypatch.setenv("BCRYPT_CALIBRATION_SAMPLES", "5")
+    timings = iter([10.0, 400.0, 10.0, 1.0, 10.0])
+    monkeypatch.setattr(hashers, "_time_bcrypt_ms", lambda rounds: next(timings))
+
+    assert hashers.calibrate_bcrypt_rounds(target_ms=80) == 13
+
+
+def test_calibrate_bcrypt_rounds_prefers_lower_cost_near_midpoint(monkeypatch):
+    """Test the hysteresis: estimates just past the midpoint between two costs keep the lower one."""
+    monkeypatch.delenv("BCRYPT_ROUNDS", raising=False)
+    monkeypatch.setenv("BCRYPT_MIN_ROUNDS", "10")
+    monkeypatch.setenv("BCRYPT_CALIBRATION_SAMPLES", "1")
+
+    # 2**3.6 and 2**3.8 times the measured cost
+    monkeypatch.setattr(hashers, "_time_bcrypt_ms", lambda rounds: 10.0)
+    assert hashers.calibrate_bcrypt_rounds(target_ms=10 * 2 ** 3.6) == 13
+    assert hashers.calibrate_bcrypt_rounds(target_ms=10 * 2 ** 3.8) == 14
@@ -0,0 +1,34 @@
+from flask import Flask
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from prometheus_client import REGISTRY
+
+from core import init_redis
+from core.init_redis import get_redis, get_redis_pool
+
+
+def test_pool_is_shared_and_configured():
+    pool = get_redis_pool()
+
+    assert get_redis_pool() is pool
+    assert get_redis().connection_pool is pool
+    assert pool.max_connections == init_redis.REDIS_MAX_CONNECTIONS
+    assert pool.connection_kwargs["socket_timeout"] == init_redis.REDIS_SOCKET_TIMEOUT
+    assert pool.connection_kwargs["health_check_interval"] == init_redis.REDIS_HEALTH_CHECK_INTERVAL
+
+
+def test_session_and_limiter_use_the_shared_pool():
+    app = Flask(__name__)
+    init_redis.init_redis(app)
+    limiter = Limiter(key_func=get_remote_address, strategy="fixed-window")
+    limiter.init_app(app)
+
+    assert app.config["SESSION_REDIS"].connection_pool is get_redis_pool()
+    assert limiter.storage.storage.connection_pool is get_redis_pool()
+
+
+def test_pool_metrics_are_exported():
+    get_redis_pool()
+
+    assert REGISTRY.get_sample_value("redis_pool_connections_in_use") == 0
+    assert REGISTRY.get_sample_value("redis_pool_connections_max") == init_redis.REDIS_MAX_CONNECTIONS
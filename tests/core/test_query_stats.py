@@ -0,0 +1,117 @@
+import logging
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from core import query_stats
+from core.engines import build_engine
+from core.query_stats import QueryStats, count_queries, init_query_stats, instrument_engine, report_request
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite engine counted as the write engine."""
+    engine = create_engine("sqlite:///:memory:")
+    instrument_engine(engine, role="write")
+    return engine
+
+
+def test_count_queries_counts_statements(engine):
+    """Test that every executed statement is counted with its engine role."""
+    with count_queries() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    assert stats.total == 2
+    assert stats.counts["write"] == 2
+    assert stats.total_time >= 0
+
+
+def test_count_queries_stops_after_block(engine):
+    """Test that statements after the block are not collected."""
+    with count_queries() as stats:
+        pass
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert stats.total == 0
+
+
+def test_failed_statement_is_not_counted(engine):
+    """Test that a failing statement does not break later timings."""
+    with count_queries() as stats:
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+
+    assert stats.total == 1
+
+
+def test_build_engine_counts_read_role():
+    """Test that engines built for reads are tagged as read."""
+    engine = build_engine("sqlite:///:memory:", prefix="READ_DB", label="read")
+
+    with count_queries() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert stats.counts == {"read": 1}
+
+
+def test_repeated_statements_detected():
+    """Test that a statement repeated past the threshold is reported."""
+    stats = QueryStats()
+    for _ in range(5):
+        stats.record("read", "SELECT * FROM mfa WHERE id = ?", 0.001)
+    stats.record("read", "SELECT * FROM users WHERE id = ?", 0.001)
+
+    assert stats.repeated(threshold=5) == [("SELECT * FROM mfa WHERE id = ?", 5)]
+
+
+def test_report_request_logs_budget_and_n_plus_one(monkeypatch, caplog):
+    """Test that exceeding the budget and repeating a statement are logged."""
+    monkeypatch.setattr(query_stats, "SQL_QUERY_BUDGET", 3)
+    stats = QueryStats()
+    for _ in range(5):
+        stats.record("read", "SELECT * FROM mfa WHERE id = ?", 0.001)
+
+    with caplog.at_level(logging.WARNING, logger="core.query_stats"):
+        report_request(stats, "dashboard.user_dashboard")
+
+    assert "issued 5 SQL statements" in caplog.text
+    assert "Possible N+1 in dashboard.user_dashboard" in caplog.text
+
+
+def test_report_request_quiet_within_budget(caplog):
+    """Test that a request within budget logs nothing."""
+    stats = QueryStats()
+    stats.record("write", "INSERT INTO mfa (totp_secret) VALUES (?)", 0.001)
+
+    with caplog.at_level(logging.WARNING, logger="core.query_stats"):
+        report_request(stats, "users.create_user")
+
+    assert caplog.text == ""
+
+
+def test_requests_collect_their_own_stats(engine, monkeypatch):
+    """Test that each request gets fresh statistics reported on teardown."""
+    reported = []
+    monkeypatch.setattr(query_stats, "report_request", lambda stats, endpoint: reported.append((endpoint, stats.total)))
+    app = Flask(__name__)
+    init_query_stats(app)
+
+    @app.route("/two")
+    def two():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return "ok"
+
+    client = app.test_client()
+    client.get("/two")
+    client.get("/two")
+
+    assert reported == [("two", 2), ("two", 2)]
@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.replica_router import ReplicaRouter, create_replica_router
+
+
+def make_engine(lag=0.0, error=None, in_recovery=True):
+    """Mock engine whose connection returns the given lag and recovery state or raises."""
+    engine = MagicMock()
+    conn = engine.connect.return_value.__enter__.return_value
+    if error:
+        engine.connect.side_effect = error
+    else:
+        conn.execute.return_value.one.return_value = (in_recovery, lag)
+    return engine
+
+
+@pytest.fixture
+def router():
+    """Router over three mocked replicas, without a background thread."""
+    engines = {
+        "postgresql://u:p@replica-1/db": make_engine(lag=0.1),
+        "postgresql://u:p@replica-2/db": make_engine(lag=60),
+        "postgresql://u:p@replica-3/db": make_engine(error=RuntimeError("down")),
+    }
+    router = ReplicaRouter(urls=list(engines), engine_factory=lambda url, name: engines[url], max_lag=5)
+    router.start = MagicMock()
+    return router
+
+
+def test_replica_names_hide_credentials(router):
+    """Test that metric labels contain host and port only."""
+    assert [replica.name for replica in router.replicas] == [
+        "replica-1:5432",
+        "replica-2:5432",
+        "replica-3:5432",
+    ]
+
+
+def test_check_replicas_excludes_lagging_and_failed(router):
+    """Test that lagging and unreachable replicas are marked unhealthy."""
+    router.check_replicas()
+
+    status = router.status()
+    assert status["replica-1:5432"]["healthy"] is True
+    assert status["replica-2:5432"]["healthy"] is False
+    assert status["replica-2:5432"]["lag"] == 60
+    assert status["replica-3:5432"]["healthy"] is False
+
+
+def test_check_replica_excludes_promoted_replica():
+    """Test that a replica that left recovery is unhealthy despite zero lag."""
+    engine = make_engine(lag=0, in_recovery=False)
+    router = ReplicaRouter(urls=["postgresql://u:p@replica-1/db"], engine_factory=lambda url, name: engine)
+
+    router.check_replicas()
+
+    assert router.status()["replica-1:5432"]["healthy"] is False
+
+
+def test_check_replicas_compares_against_primary_position():
+    """Test that every replica is checked against one primary WAL position per round."""
+    engines = [make_engine(), make_engine()]
+    primary_lsn = MagicMock(return_value="0/16B3748")
+    router = ReplicaRouter(
+        urls=["postgresql://u:p@replica-1/db", "postgresql://u:p@replica-2/db"],
+        engine_factory=lambda url, name: engines.pop(0),
+        primary_lsn=primary_lsn,
+    )
+
+    router.check_replicas()
+
+    primary_lsn.assert_called_once_with()
+    for replica in router.replicas:
+        conn = replica.engine.connect.return_value.__enter__.return_value
+        assert conn.execute.call_args.args[1] == {"primary_lsn": "0/16B3748"}
+
+
+def test_choose_engine_only_returns_healthy(router):
+    """Test that only the healthy replica is selected."""
+    router.check_replicas()
+
+    for _ in range(20):
+        assert router.choose_engine() is router.replicas[0].engine
+
+
+def test_choose_engine_falls_back_when_all_unhealthy(router):
+    """Test that None is returned so the caller can use the primary."""
+    router.check_replicas()
+    router.replicas[0].healthy = False
+
+    assert router.choose_engine() is None
+
+
+def test_choose_engine_weighted_by_latency(router):
+    """Test that faster replicas get proportionally more weight."""
+    fast, slow, _ = router.replicas
+    fast.latency, slow.latency = 0.001, 0.1
+    slow.healthy = True
+    router.replicas[2].healthy = False
+
+    with patch("core.replica_router.random.choices", return_value=[fast]) as choices:
+        router.choose_engine()
+
+    weights = choices.call_args.kwargs["weights"]
+    assert weights[0] == pytest.approx(100 * weights[1])
+
+
+def test_create_replica_router_disabled_without_urls(monkeypatch):
+    """Test that no router is built when READ_REPLICA_URLS is empty."""
+    monkeypatch.delenv("READ_REPLICA_URLS", raising=False)
+
+    assert create_replica_router(MagicMock()) is None
@@ -0,0 +1,91 @@
+import pytest
+import redis
+from flask import Flask
+from sqlalchemy import create_engine
+
+from core.database import SessionWrite
+from core.session_index import SessionIndex, revoke_after_commit
+
+
+class RecordingInterface:
+    def __init__(self):
+        self.revoked = []
+
+    def revoke_sessions(self, session_ids):
+        self.revoked.append(sorted(session_ids))
+
+
+@pytest.fixture
+def index(fake_redis):
+    return SessionIndex(lambda: fake_redis, ttl=100)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.session_interface = RecordingInterface()
+    with app.app_context():
+        yield app
+
+
+def test_add_indexes_session_with_ttl(index, fake_redis):
+    index.add(7, "a")
+    index.add(7, "b")
+
+    assert fake_redis.sets["user_sessions:7"] == {"a", "b"}
+    assert fake_redis.ttls["user_sessions:7"] == 100
+
+
+def test_remove_forgets_session(index, fake_redis):
+    index.add(7, "a")
+    index.add(7, "b")
+    index.remove(7, "a")
+
+    assert fake_redis.sets["user_sessions:7"] == {"b"}
+
+
+def test_revoke_all_ends_every_session_in_one_call(app, index, fake_redis):
+    for sid in ("a", "b", "c"):
+        index.add(7, sid)
+    fake_redis.round_trips = 0
+
+    assert index.revoke_all(7) == 3
+
+    assert app.session_interface.revoked == [["a", "b", "c"]]
+    assert "user_sessions:7" not in fake_redis.sets
+    assert fake_redis.round_trips == 1
+
+
+def test_revoke_all_keeps_current_session(app, index, fake_redis):
+    index.add(7, "a")
+    index.add(7, "current")
+
+    assert index.revoke_all(7, keep_session_id="current") == 1
+
+    assert app.session_interface.revoked == [["a"]]
+    assert fake_redis.sets["user_sessions:7"] == {"current"}
+
+
+def test_revoke_all_without_sessions(app, index):
+    assert index.revoke_all(7) == 0
+    assert app.session_interface.revoked == []
+
+
+def test_index_errors_do_not_fail_login_or_logout():
+    def unavailable():
+        raise redis.ConnectionError("down")
+
+    index = SessionIndex(unavailable)
+    index.add(7, "a")
+    index.remove(7, "a")
+
+
+def test_redis_failure_after_commit_is_logged(app, index, fake_redis, caplog):
+    fake_redis.fail = True
+    db = SessionWrite(bind=create_engine("sqlite://"))
+    revoke_after_commit(db, index, 7)
+
+    db.commit()
+
+    assert "Could not revoke sessions of user 7" in caplog.text
+    assert app.session_interface.revoked == []
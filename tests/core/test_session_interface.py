@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from flask import Flask, session
+
+from core.session_interface import ThrottledRedisSessionInterface
+
+LIFETIME = 1800
+
+
+def make_client(fake_redis, touch_interval):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.permanent_session_lifetime = timedelta(seconds=LIFETIME)
+    app.session_interface = ThrottledRedisSessionInterface(
+        app, touch_interval=touch_interval, client=fake_redis, key_prefix="s:", permanent=True
+    )
+
+    @app.route("/login")
+    def login():
+        session["user_id"] = 7
+        return "ok"
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    return app.test_client()
+
+
+def test_unmodified_session_is_not_rewritten_within_interval(fake_redis):
+    client = make_client(fake_redis, touch_interval=60)
+    client.get("/login")
+    fake_redis.writes.clear()
+
+    fake_redis.age(10)
+    response = client.get("/read")
+
+    assert response.data == b"7"
+    assert fake_redis.writes == []
+    assert "Set-Cookie" not in response.headers
+
+
+def test_unmodified_session_is_touched_with_expire_after_interval(fake_redis):
+    client = make_client(fake_redis, touch_interval=60)
+    client.get("/login")
+    fake_redis.writes.clear()
+
+    fake_redis.age(61)
+    response = client.get("/read")
+
+    assert fake_redis.writes == ["EXPIRE"]
+    assert list(fake_redis.ttls.values()) == [LIFETIME]
+    assert "Set-Cookie" in response.headers
+
+
+def test_modified_session_is_stored(fake_redis):
+    client = make_client(fake_redis, touch_interval=60)
+    client.get("/login")
+    fake_redis.writes.clear()
+
+    client.get("/login")
+
+    assert fake_redis.writes == ["SET"]
+
+
+def test_expired_meanwhile_is_stored_again(fake_redis):
+    client = make_client(fake_redis, touch_interval=60)
+    client.get("/login")
+    fake_redis.age(61)
+    fake_redis.writes.clear()
+    original_expire = fake_redis.expire
+
+    def expire_after_key_vanished(key, seconds):
+        fake_redis.values.pop(key)
+        return original_expire(key, seconds)
+
+    fake_redis.expire = expire_after_key_vanished
+    client.get("/read")
+
+    assert fake_redis.writes == ["EXPIRE", "SET"]
+
+
+def test_zero_interval_keeps_stock_behaviour(fake_redis):
+    client = make_client(fake_redis, touch_interval=0)
+    client.get("/login")
+    fake_redis.writes.clear()
+
+    client.get("/read")
+
+    assert fake_redis.writes == ["SET"]
+
+
+def test_revoke_sessions_deletes_stored_sessions(fake_redis):
+    client = make_client(fake_redis, touch_interval=60)
+    client.get("/login")
+    interface = client.application.session_interface
+    sid = next(iter(fake_redis.values)).removeprefix("s:")
+
+    interface.revoke_sessions([sid, "unknown"])
+
+    assert fake_redis.values == {}
@@ -0,0 +1,58 @@
+import msgspec
+import pytest
+from flask import Flask
+from flask_session.redis import RedisSession
+from prometheus_client import REGISTRY
+
+from core import init_redis
+from core.session_serializer import SCHEMA_VERSION, VersionedMsgpackSerializer
+
+
+@pytest.fixture
+def serializer():
+    return VersionedMsgpackSerializer(Flask(__name__))
+
+
+def login_session():
+    return RedisSession(
+        {"_permanent": True, "user_email": "ada@example.com", "user_id": 7, "is_authenticated": True},
+        sid="sid",
+    )
+
+
+def test_round_trip(serializer):
+    session = login_session()
+    session["dashboard_view"] = {"schema": 1, "username": "Ada Lovelace", "mfa_enabled": False}
+    session["custom"] = [1, 2]
+
+    assert serializer.decode(serializer.encode(session)) == dict(session)
+
+
+def test_payload_is_versioned_and_smaller(serializer):
+    session = login_session()
+    encoded = serializer.encode(session)
+
+    assert encoded[0] == SCHEMA_VERSION
+    assert len(encoded) < len(msgspec.msgpack.encode(dict(session))) - 30
+
+
+def test_sessions_of_the_stock_serializer_are_still_read(serializer):
+    session = login_session()
+
+    assert serializer.decode(msgspec.msgpack.encode(dict(session))) == dict(session)
+    assert serializer.decode(msgspec.json.encode(dict(session))) == dict(session)
+
+
+def test_session_size_is_recorded(serializer):
+    before = REGISTRY.get_sample_value("session_serialized_bytes_count") or 0
+
+    serializer.encode(login_session())
+
+    assert REGISTRY.get_sample_value("session_serialized_bytes_count") == before + 1
+
+
+def test_init_redis_installs_serializer():
+    app = Flask(__name__)
+    init_redis.init_redis(app)
+
+    assert isinstance(app.session_interface.serializer, VersionedMsgpackSerializer)
@@ -0,0 +1,151 @@
+import io
+
+import pytest
+from flask import Blueprint, Flask, g
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from blueprints.users.models import Credentials, User
+from blueprints.users.user_repository import UserRepository
+from core.database import Base
+from core.query_stats import count_queries, instrument_engine
+from core.sql_comments import format_comment, init_sql_comments, parse_comment, tag_engine
+from core.sql_report import aggregate, write_report
+
+
+def make_engine():
+    """In-memory SQLite engine with tagging and statement capture."""
+    engine = create_engine("sqlite:///:memory:")
+    tag_engine(engine)
+    instrument_engine(engine, role="write")
+    return engine
+
+
+@pytest.fixture
+def sqlite_session():
+    """Fixture for a tagged in-memory SQLite session with one user."""
+    session = sessionmaker(bind=make_engine())()
+    Base.metadata.create_all(session.get_bind())
+    cred = Credentials(email="plain@example.com", password="hash_plain")
+    session.add(cred)
+    session.flush()
+    session.add(User(first_name="Plain", last_name="User", credentials_id=cred.id))
+    session.commit()
+
+    yield session
+    session.close()
+
+
+def test_format_and_parse_roundtrip():
+    """Test that tags survive formatting and parsing, including unsafe characters."""
+    tags = {"route": "auth.authenticate_login", "repository": "A'*/B"}
+
+    comment = format_comment(tags)
+
+    assert comment.startswith("/*repository=")
+    assert "*/B" not in comment
+    assert parse_comment(f"SELECT 1 {comment}") == tags
+
+
+def test_parse_untagged_statement():
+    """Test that statements without a trailing comment have no tags."""
+    assert parse_comment("SELECT 1") == {}
+
+
+def test_statement_outside_request_is_untouched():
+    """Test that statements without context get no comment."""
+    engine = make_engine()
+
+    with count_queries() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert list(stats.statements) == ["SELECT 1"]
+
+
+def test_statement_tagged_with_route_and_request_id():
+    """Test that statements issued in a request carry route, blueprint and request id."""
+    engine = make_engine()
+    app = Flask(__name__)
+    init_sql_comments(app)
+    bp = Blueprint("users", __name__)
+
+    @bp.route("/profile")
+    def profile():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return "ok"
+
+    app.register_blueprint(bp)
+
+    with count_queries() as stats:
+        response = app.test_client().get("/profile", headers={"X-Request-ID": "req-42"})
+
+    tags = parse_comment(next(iter(stats.statements)))
+    assert tags == {"route": "users.profile", "blueprint": "users", "request_id": "req-42"}
+    assert response.headers["X-Request-ID"] == "req-42"
+
+
+@pytest.mark.parametrize("header", ["a b", "x" * 65, "id'*/;DROP"])
+def test_invalid_request_id_is_replaced(header):
+    """Test that request ids that are not short and plain are not copied into SQL."""
+    app = Flask(__name__)
+    init_sql_comments(app)
+
+    @app.route("/")
+    def index():
+        return g.request_id
+
+    response = app.test_client().get("/", headers={"X-Request-ID": header})
+
+    assert response.data.decode() != header
+    assert len(response.data) == 32
+
+
+def test_percent_in_tags_survives_pyformat_interpolation():
+    """Test that a %-bearing tag does not break a parameterized query under psycopg2's paramstyle."""
+    engine = create_engine("sqlite:///:memory:", paramstyle="pyformat")
+    tag_engine(engine)
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def interpolate_like_psycopg2(conn, cursor, statement, parameters, context, executemany):
+        # psycopg2 runs statement % params; hand sqlite3 named placeholders instead of values
+        return statement % {key: f":{key}" for key in parameters}, parameters
+
+    app = Flask(__name__)
+    with app.test_request_context("/"):
+        g.request_id = "a b%"
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT :value"), {"value": 7}).scalar() == 7
+
+
+def test_statement_tagged_with_repository_method(sqlite_session):
+    """Test that statements issued by a repository carry Class.method."""
+    repo = UserRepository(read_db_session=sqlite_session, write_db_session=sqlite_session)
+
+    with count_queries() as stats:
+        repo.get_user_by_id(1)
+
+    tags = parse_comment(next(iter(stats.statements)))
+    assert tags["repository"] == "UserRepository.get_user_by_id"
+
+
+def test_aggregate_ranks_routes_by_time():
+    """Test that the report sums pg_stat_statements rows per route, slowest first."""
+    rows = [
+        {"query": "SELECT 1 /*route='auth.authenticate_login'*/", "calls": "10", "total_exec_time": "50.0"},
+        {"query": "SELECT 2 /*route='auth.authenticate_login'*/", "calls": "10", "total_exec_time": "30.0"},
+        {"query": "SELECT 3 /*route='dashboard.user_dashboard'*/", "calls": "4", "total_exec_time": "100.0"},
+        {"query": "VACUUM", "calls": "1", "total_time": "5.0"},
+    ]
+
+    ranking = aggregate(rows, by="route")
+
+    assert [entry["route"] for entry in ranking] == ["dashboard.user_dashboard", "auth.authenticate_login", "(untagged)"]
+    assert ranking[1]["calls"] == 20
+    assert ranking[1]["total_ms"] == 80.0
+    assert ranking[1]["mean_ms"] == 4.0
+
+    out = io.StringIO()
+    write_report(ranking, "route", out)
+    assert out.getvalue().splitlines()[1].startswith("dashboard.user_dashboard")
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+from cryptography.fernet import Fernet
+from flask import Flask, session
+
+from core.token_session import RevocationList, TokenSessionInterface
+
+
+def make_app(fake_redis, keys, max_age=900, refresh_interval=0):
+    app = Flask(__name__)
+    app.session_interface = TokenSessionInterface(
+        app, keys, RevocationList(lambda: fake_redis, refresh_interval=refresh_interval), max_age=max_age
+    )
+
+    @app.route("/login")
+    def login():
+        session["user_id"] = 7
+        session["is_authenticated"] = True
+        return "ok"
+
+    @app.route("/check")
+    def check():
+        return str(session.get("user_id"))
+
+    @app.route("/sid")
+    def sid():
+        return session.sid
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "bye"
+
+    return app
+
+
+def test_session_round_trips_through_encrypted_cookie(fake_redis):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()]).test_client()
+
+    response = client.get("/login")
+    cookie = response.headers["Set-Cookie"]
+
+    assert "user_id" not in cookie and "is_authenticated" not in cookie
+    assert client.get("/check").data == b"7"
+
+
+def test_unchanged_session_is_not_reissued(fake_redis):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()]).test_client()
+    client.get("/login")
+
+    assert "Set-Cookie" not in client.get("/check").headers
+
+
+def test_tampered_or_foreign_token_is_rejected(fake_redis):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()]).test_client()
+    client.set_cookie("session", Fernet(Fernet.generate_key()).encrypt(b"\x01\x80").decode())
+
+    assert client.get("/check").data == b"None"
+
+
+def test_expired_token_is_rejected(fake_redis, monkeypatch):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()], max_age=60).test_client()
+    client.get("/login")
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert client.get("/check").data == b"None"
+
+
+def test_half_expired_token_is_reissued(fake_redis, monkeypatch):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()], max_age=60).test_client()
+    client.get("/login")
+
+    later = time.time() + 31
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert "Set-Cookie" in client.get("/check").headers
+
+
+def test_old_key_is_accepted_and_rotated(fake_redis):
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    client = make_app(fake_redis, [old_key]).test_client()
+    client.get("/login")
+
+    client.application.session_interface = make_app(fake_redis, [new_key, old_key]).session_interface
+    response = client.get("/check")
+    assert response.data == b"7"
+    assert "Set-Cookie" in response.headers
+
+    client.application.session_interface = make_app(fake_redis, [new_key]).session_interface
+    assert client.get("/check").data == b"7"
+
+
+def test_logout_revokes_copied_cookie(fake_redis):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()]).test_client()
+    client.get("/login")
+    copied = client.get_cookie("session").value
+
+    client.get("/logout")
+    client.set_cookie("session", copied)
+
+    assert client.get("/check").data == b"None"
+    assert len(fake_redis.zsets["session_revoked"]) == 1
+
+
+def test_revoke_sessions_rejects_tokens_of_other_clients(fake_redis):
+    app = make_app(fake_redis, [Fernet.generate_key().decode()])
+    client = app.test_client()
+    client.get("/login")
+    sid = client.get("/sid").data.decode()
+
+    app.session_interface.revoke_sessions([sid])
+
+    assert client.get("/check").data == b"None"
+
+
+def test_revocation_set_is_read_at_most_once_per_interval(fake_redis):
+    client = make_app(fake_redis, [Fernet.generate_key().decode()], refresh_interval=60).test_client()
+    client.get("/login")
+
+    for _ in range(5):
+        client.get("/check")
+
+    assert fake_redis.round_trips == 1
+
+
+def test_revocation_set_keeps_last_copy_when_redis_fails(fake_redis):
+    revocations = RevocationList(lambda: fake_redis, refresh_interval=0)
+    revocations.revoke("abc", time.time() + 60)
+    fake_redis.fail = True
+
+    assert revocations.is_revoked("abc")
+
+
+def test_keys_are_required():
+    with pytest.raises(RuntimeError):
+        TokenSessionInterface(Flask(__name__), [], RevocationList(lambda: None))
@@ -0,0 +1,145 @@
+import pytest
+from flask import Flask, session
+
+from blueprints.auth import views as auth_views
+from blueprints.auth.views import auth
+from blueprints.dashboard import views as dashboard_views
+from blueprints.dashboard.view_model import (
+    VIEW_MODEL_KEY,
+    load_view_model,
+    profile_version,
+    store_view_model,
+)
+from blueprints.dashboard.views import dashboard
+from blueprints.users.views import users
+from core.cache import profile_cache
+
+
+@pytest.fixture(autouse=True)
+def shared_versions(monkeypatch, fake_redis):
+    """Give the profile cache a shared version store."""
+    monkeypatch.setattr(profile_cache, "_redis_client", lambda: fake_redis)
+
+
+class UnitOfWork:
+    write_db = read_db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.register_blueprint(auth)
+    app.register_blueprint(users)
+    app.register_blueprint(dashboard)
+    return app
+
+
+def test_view_model_round_trip(app):
+    with app.test_request_context():
+        store_view_model(7, "Ada Lovelace", True, profile_version(7))
+
+        assert load_view_model(7)["username"] == "Ada Lovelace"
+        assert load_view_model(7)["mfa_enabled"] is True
+        assert load_view_model(8) is None
+
+
+def test_profile_write_invalidates_view_model(app):
+    with app.test_request_context():
+        store_view_model(7, "Ada Lovelace", False, profile_version(7))
+        profile_cache.bump("user:7")
+
+        assert load_view_model(7) is None
+
+
+def test_other_schema_is_ignored(app):
+    with app.test_request_context():
+        store_view_model(7, "Ada Lovelace", False, profile_version(7))
+        session[VIEW_MODEL_KEY]["schema"] = 0
+
+        assert load_view_model(7) is None
+
+
+def test_nothing_is_stored_without_shared_versions(app, monkeypatch):
+    monkeypatch.setattr(profile_cache, "_redis_client", lambda: None)
+    with app.test_request_context():
+        store_view_model(7, "Ada Lovelace", False, profile_version(7))
+
+        assert VIEW_MODEL_KEY not in session
+
+
+def test_login_runs_only_the_login_query(app, monkeypatch):
+    class Login:
+        user_id = 7
+        mfa_enabled = False
+
+    class AuthService:
+        def authenticate(self, email, password):
+            return Login()
+
+    monkeypatch.setattr(auth_views, "unit_of_work", UnitOfWork)
+    monkeypatch.setattr(auth_views, "create_auth_service", lambda **kwargs: AuthService())
+    monkeypatch.setattr(auth_views, "register_session", lambda user_id: None)
+    monkeypatch.setattr(profile_cache, "tag_version", lambda tag: pytest.fail("profile version read at login"))
+    client = app.test_client()
+
+    client.post("/auth/authenticate", data={"email": "ada@example.com", "password": "secret"})
+
+    with client.session_transaction() as sess:
+        assert sess["user_id"] == 7
+        assert VIEW_MODEL_KEY not in sess
+
+
+def test_unversioned_view_model_is_not_stored(app):
+    with app.test_request_context():
+        store_view_model(7, "Ada Lovelace", False, None)
+
+        assert VIEW_MODEL_KEY not in session
+
+
+def test_dashboard_renders_without_database(app, monkeypatch):
+    monkeypatch.setattr(dashboard_views, "unit_of_work", lambda: pytest.fail("database accessed"))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 7
+        sess[VIEW_MODEL_KEY] = {
+            "schema": 1, "user_id": 7, "version": 0, "username": "Ada Lovelace", "mfa_enabled": True,
+        }
+
+    response = client.get("/dashboard/welcome/")
+
+    assert response.status_code == 200
+    assert b"Welcome Ada Lovelace" in response.data
+    assert b"Deactivate MFA" in response.data
+
+
+def test_dashboard_rebuilds_outdated_view_model(app, monkeypatch):
+    class Service:
+        def is_mfa_enabled(self, user_id):
+            return False
+
+        def get_username_by_userid(self, user_id):
+            return "Ada Byron"
+
+    monkeypatch.setattr(dashboard_views, "unit_of_work", UnitOfWork)
+    monkeypatch.setattr(dashboard_views, "create_dashboard_service", lambda **kwargs: Service())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 7
+        sess[VIEW_MODEL_KEY] = {
+            "schema": 1, "user_id": 7, "version": 0, "username": "Ada Lovelace", "mfa_enabled": True,
+        }
+    profile_cache.bump("user:7")
+
+    response = client.get("/dashboard/welcome/")
+
+    assert b"Welcome Ada Byron" in response.data
+    with client.session_transaction() as sess:
+        assert sess[VIEW_MODEL_KEY]["username"] == "Ada Byron"
+        assert sess[VIEW_MODEL_KEY]["version"] == 1
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import create_engine
+
+from core.database import Base, SessionRead, SessionWrite
+from blueprints.users.models import MFA, Credentials, User
+
+
+@pytest.fixture
+def sqlite_session():
+    """Fixture for an in-memory SQLite session with one user with and one without MFA."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = SessionWrite(bind=engine)
+
+    mfa = MFA(totp_secret="SECRET")
+    plain_cred = Credentials(email="plain@example.com", password="hash_plain")
+    mfa_cred = Credentials(email="mfa@example.com", password="hash_mfa")
+    session.add_all([mfa, plain_cred, mfa_cred])
+    session.flush()
+    session.add_all([
+        User(first_name="Plain", last_name="User", credentials_id=plain_cred.id),
+        User(first_name="Mfa", last_name="User", credentials_id=mfa_cred.id, mfa_id=mfa.id),
+    ])
+    session.commit()
+
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def sqlite_read_session(sqlite_session):
+    """Fixture for a read-only session on the same in-memory SQLite database."""
+    session = SessionRead(bind=sqlite_session.get_bind())
+    yield session
+    session.close()
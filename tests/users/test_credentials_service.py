@@ -1,10 +1,12 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 import bcrypt
+from sqlalchemy import create_engine, event
 
 from blueprints.users.credentials_repository import CredentialsRepository
 from blueprints.users.models import Credentials
 from blueprints.users.crendentials_service import CredentialsService
+from core.database import SessionWrite
 
 
 @pytest.fixture
@@ -85,6 +87,25 @@ def test_get_credentials_via_email_nonexistent(credentials_service, mock_cred_re
     mock_cred_repo.get_credentials_by_email.assert_called_once_with(email=email)
 
 
+def test_get_login_details_via_email_existing(credentials_service, mock_cred_repo):
+    """Test getting login details via email when they exist."""
+    login = Mock(credentials_id=1, password="hashed", user_id=5, mfa_enabled=True)
+    mock_cred_repo.get_login_details_by_email.return_value = login
+
+    result = credentials_service.get_login_details_via_email(email="user1@example.com")
+
+    mock_cred_repo.get_login_details_by_email.assert_called_once_with(email="user1@example.com")
+    assert result == login
+
+
+def test_get_login_details_via_email_nonexistent(credentials_service, mock_cred_repo):
+    """Test getting login details via email when they don't exist."""
+    mock_cred_repo.get_login_details_by_email.return_value = None
+
+    with pytest.raises(Exception, match="credentials not found"):
+        credentials_service.get_login_details_via_email(email="nonexistent@example.com")
+
+
 def test_get_email_by_userid_existing(credentials_service, mock_cred_repo):
     """Test getting email by user ID when it exists."""
     user_id = 1
@@ -263,3 +284,72 @@ def test_change_password_mismatch(credentials_service, mock_cred_repo, mock_cred
 
 
 
+
+
+def test_rehash_password(credentials_service, mock_cred_repo):
+    """Test storing a fresh hash of a verified password inside a savepoint."""
+    mock_cred_repo.savepoint.return_value = MagicMock()
+    with patch('blueprints.users.crendentials_service.hash_password', return_value='rehashed_password') as mock_hash:
+        credentials_service.rehash_password(cred_id=1, password='valid_password')
+
+        mock_hash.assert_called_once_with('valid_password')
+        mock_cred_repo.update_credentials.assert_called_once_with(cred_id=1, password='rehashed_password')
+        mock_cred_repo.savepoint.return_value.__enter__.assert_called_once()
+
+
+def test_revoke_sessions_without_index(credentials_service):
+    """Test that revoking sessions is a no-op without a session index."""
+    assert credentials_service.revoke_sessions(user_id=1) == 0
+
+
+def test_change_password_revokes_other_sessions_after_commit(mock_cred_repo, mock_credentials):
+    """Test that changing the password ends all sessions but the current one once committed."""
+    session_index = Mock()
+    credentials_service = CredentialsService(cred_repo=mock_cred_repo, session_index=session_index)
+    mock_cred_repo.write_db_session = SessionWrite(bind=create_engine("sqlite://"))
+    mock_cred_repo.get_credentials_by_id.return_value = mock_credentials[0]
+
+    with patch.object(credentials_service, 'validate_and_hash_pw', return_value='hashed'):
+        credentials_service.change_password(1, "new_valid_password", "new_valid_password", keep_session_id="current")
+
+    session_index.revoke_all.assert_not_called()
+    mock_cred_repo.write_db_session.commit()
+    session_index.revoke_all.assert_called_once_with(1, keep_session_id="current")
+
+
+def test_reset_password_revokes_all_sessions_after_commit(mock_cred_repo, mock_credentials):
+    """Test that resetting the password of a known user ends all sessions once committed."""
+    session_index = Mock()
+    credentials_service = CredentialsService(cred_repo=mock_cred_repo, session_index=session_index)
+    mock_cred_repo.write_db_session = SessionWrite(bind=create_engine("sqlite://"))
+    mock_cred_repo.get_credentials_by_email.return_value = mock_credentials[0]
+
+    with patch.object(credentials_service, 'validate_and_hash_pw', return_value='hashed'):
+        credentials_service.reset_password("user1@example.com", user_id=1)
+
+    session_index.revoke_all.assert_not_called()
+    mock_cred_repo.write_db_session.commit()
+    session_index.revoke_all.assert_called_once_with(1, keep_session_id=None)
+
+
+def test_failed_password_change_commit_revokes_nothing(mock_cred_repo, mock_credentials):
+    """Test that sessions survive when the password change does not commit."""
+    session_index = Mock()
+    credentials_service = CredentialsService(cred_repo=mock_cred_repo, session_index=session_index)
+    db = SessionWrite(bind=create_engine("sqlite://"))
+    mock_cred_repo.write_db_session = db
+    mock_cred_repo.get_credentials_by_id.return_value = mock_credentials[0]
+
+    def fail_commit(session):
+        raise RuntimeError("commit failed")
+
+    with patch.object(credentials_service, 'validate_and_hash_pw', return_value='hashed'):
+        credentials_service.change_password(1, "new_valid_password", "new_valid_password")
+    event.listen(db, "before_commit", fail_commit)
+    with pytest.raises(RuntimeError, match="commit failed"):
+        db.commit()
+    db.rollback()
+    event.remove(db, "before_commit", fail_commit)
+    db.commit()
+
+    session_index.revoke_all.assert_not_called()
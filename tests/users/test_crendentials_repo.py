@@ -3,6 +3,7 @@ from datetime import datetime
 from unittest.mock import Mock, patch
 from sqlalchemy.orm import Session
 
+from blueprints.users.dto import CredentialsDetails
 from blueprints.users.models import Credentials
 from blueprints.users.credentials_repository import CredentialsRepository  
 
@@ -71,34 +72,6 @@ def test_get_credentials_by_id_nonexistent(credentials_repository, mock_read_ses
     assert result is None
 
 
-def test_get_credentials_by_email_existing(credentials_repository, mock_read_session, mock_credentials_list):
-    """Test fetching credentials by email when credentials exist."""
-    mock_query = mock_read_session.query.return_value
-    mock_filter = mock_query.filter.return_value
-    mock_filter.first.return_value = mock_credentials_list[0]
-    
-    result = credentials_repository.get_credentials_by_email("user1@example.com")
-    
-    mock_read_session.query.assert_called_once_with(Credentials)
-    mock_query.filter.assert_called_once()
-    mock_filter.first.assert_called_once()
-    assert result == mock_credentials_list[0]
-
-
-def test_get_credentials_by_email_nonexistent(credentials_repository, mock_read_session):
-    """Test fetching credentials by email when credentials don't exist."""
-    mock_query = mock_read_session.query.return_value
-    mock_filter = mock_query.filter.return_value
-    mock_filter.first.return_value = None
-    
-    result = credentials_repository.get_credentials_by_email("nonexistent@example.com")
-    
-    mock_read_session.query.assert_called_once_with(Credentials)
-    mock_query.filter.assert_called_once()
-    mock_filter.first.assert_called_once()
-    assert result is None
-
-
 def test_get_email_by_userid_existing(credentials_repository, mock_read_session):
     """Test fetching email by user ID when user exists."""
     mock_query = mock_read_session.query.return_value
@@ -131,6 +104,42 @@ def test_get_email_by_userid_nonexistent(credentials_repository, mock_read_sessi
     assert result is None
 
 
+def test_get_login_details_by_email(sqlite_session):
+    """Test that the login projection returns credentials, user ID and MFA flag."""
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=sqlite_session)
+
+    plain = repo.get_login_details_by_email("plain@example.com")
+    with_mfa = repo.get_login_details_by_email("mfa@example.com")
+
+    assert plain.password == "hash_plain"
+    assert plain.user_id == 1
+    assert plain.mfa_enabled is False
+    assert with_mfa.credentials_id == 2
+    assert with_mfa.user_id == 2
+    assert with_mfa.mfa_enabled is True
+
+
+def test_failed_update_in_savepoint_keeps_transaction_usable(sqlite_session):
+    """Test that a failing update inside a savepoint only rolls back itself."""
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=sqlite_session)
+    repo.update_credentials(cred_id=1, password="hash_updated")
+
+    with pytest.raises(Exception):
+        with repo.savepoint():
+            repo.update_credentials(cred_id=2, password=None)
+    sqlite_session.commit()
+
+    assert sqlite_session.get(Credentials, 1).password == "hash_updated"
+    assert sqlite_session.get(Credentials, 2).password == "hash_mfa"
+
+
+def test_get_login_details_by_email_nonexistent(sqlite_session):
+    """Test that the login projection returns None for unknown emails."""
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=sqlite_session)
+
+    assert repo.get_login_details_by_email("nobody@example.com") is None
+
+
 def test_create_credentials(credentials_repository, mock_write_session):
     """Test creating new credentials."""
     email = "new_user@example.com"
@@ -158,10 +167,12 @@ def test_create_credentials(credentials_repository, mock_write_session):
 
 def test_delete_credentials_existing(credentials_repository, mock_write_session, mock_credentials_list):
     """Test deleting credentials when credentials exist."""
+    mock_write_session.merge.return_value = mock_credentials_list[0]
     with patch.object(credentials_repository, 'get_credentials_by_id', return_value=mock_credentials_list[0]):
         result = credentials_repository.delete_credentials(1)
         
         credentials_repository.get_credentials_by_id.assert_called_once_with(1)
+        mock_write_session.merge.assert_called_once_with(mock_credentials_list[0])
         mock_write_session.delete.assert_called_once_with(mock_credentials_list[0])
         assert result == mock_credentials_list[0]
 
@@ -176,10 +187,11 @@ def test_delete_credentials_nonexistent(credentials_repository, mock_write_sessi
         assert result is None
 
 
-def test_soft_delete_credentials_existing(credentials_repository, mock_credentials_list):
+def test_soft_delete_credentials_existing(credentials_repository, mock_write_session, mock_credentials_list):
     """Test soft deleting credentials when credentials exist."""
     mock_user = mock_credentials_list[0]
     mock_user.deleted_at = None
+    mock_write_session.merge.return_value = mock_user
     
     with patch.object(credentials_repository, 'get_credentials_by_id', return_value=mock_user):
         result = credentials_repository.soft_delete_credentials(1)
@@ -198,76 +210,47 @@ def test_soft_delete_credentials_nonexistent(credentials_repository):
         assert result is None
 
 
-def test_update_credentials_existing(credentials_repository, mock_read_session, mock_write_session, mock_credentials_list):
-    """Test updating credentials when credentials exist."""
-    mock_cred = mock_credentials_list[0]
-    cred_id = 1
-    new_email = "updated@example.com"
-    
-    mock_read_query = mock_read_session.query.return_value
-    mock_read_filter = mock_read_query.filter_by.return_value
-    mock_read_filter.first.return_value = mock_cred
-    
-    mock_write_session.merge.return_value = mock_cred
-    
-    result = credentials_repository.update_credentials(cred_id, email=new_email)
-    
-    mock_read_session.query.assert_called_once_with(Credentials)
-    mock_read_query.filter_by.assert_called_once_with(id=cred_id)
-    mock_read_filter.first.assert_called_once()
-    
-    mock_write_session.merge.assert_called_once_with(mock_cred)
-    assert mock_cred.email == new_email
-    
-    mock_write_session.commit.assert_called_once()
-    mock_write_session.refresh.assert_called_once_with(mock_cred)
-    assert result == mock_cred
+def test_update_credentials_existing(sqlite_session):
+    """Test that updating credentials returns the updated row in one statement."""
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
+
+    result = repo.update_credentials(1, email="updated@example.com")
+
+    assert result.id == 1
+    assert result.email == "updated@example.com"
+    assert sqlite_session.get(Credentials, 1).email == "updated@example.com"
+    repo.read_db_session.query.assert_not_called()
 
 
-def test_update_credentials_nonexistent(credentials_repository, mock_read_session, mock_write_session):
+def test_update_credentials_nonexistent(sqlite_session):
     """Test updating credentials when credentials don't exist."""
-    cred_id = 999
-    new_email = "updated@example.com"
-    
-    mock_read_query = mock_read_session.query.return_value
-    mock_read_filter = mock_read_query.filter_by.return_value
-    mock_read_filter.first.return_value = None
-    
-    result = credentials_repository.update_credentials(cred_id, email=new_email)
-    
-    mock_read_session.query.assert_called_once_with(Credentials)
-    mock_read_query.filter_by.assert_called_once_with(id=cred_id)
-    mock_read_filter.first.assert_called_once()
-    
-    mock_write_session.merge.assert_not_called()
-    mock_write_session.commit.assert_not_called()
-    mock_write_session.refresh.assert_not_called()
-    assert result is None
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
 
+    assert repo.update_credentials(999, email="updated@example.com") is None
 
-def test_update_credentials_multiple_fields(credentials_repository, mock_read_session, mock_write_session, mock_credentials_list):
+
+def test_update_credentials_multiple_fields(sqlite_session):
     """Test updating multiple fields of credentials."""
-    mock_cred = mock_credentials_list[0]
-    cred_id = 1
-    new_email = "updated@example.com"
-    new_password = "new_password"
-    
-    mock_read_query = mock_read_session.query.return_value
-    mock_read_filter = mock_read_query.filter_by.return_value
-    mock_read_filter.first.return_value = mock_cred
-    
-    mock_write_session.merge.return_value = mock_cred
-    
-    result = credentials_repository.update_credentials(cred_id, email=new_email, password=new_password)
-    
-    mock_read_session.query.assert_called_once_with(Credentials)
-    mock_read_query.filter_by.assert_called_once_with(id=cred_id)
-    mock_read_filter.first.assert_called_once()
-    
-    mock_write_session.merge.assert_called_once_with(mock_cred)
-    assert mock_cred.email == new_email
-    assert mock_cred.password == new_password
-    
-    mock_write_session.commit.assert_called_once()
-    mock_write_session.refresh.assert_called_once_with(mock_cred)
-    assert result == mock_cred
\ No newline at end of file
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
+
+    result = repo.update_credentials(2, email="updated@example.com", password="new_password")
+
+    assert result.email == "updated@example.com"
+    assert result.password == "new_password"
+
+
+def test_get_credentials_by_email_existing(sqlite_read_session):
+    """Test fetching credentials by email when credentials exist."""
+    repo = CredentialsRepository(write_db_session=Mock(spec=Session), read_db_session=sqlite_read_session)
+
+    result = repo.get_credentials_by_email("plain@example.com")
+
+    assert result == CredentialsDetails(id=1, email="plain@example.com", password="hash_plain")
+    assert len(sqlite_read_session.identity_map) == 0
+
+
+def test_get_credentials_by_email_nonexistent(sqlite_read_session):
+    """Test fetching credentials by email when credentials don't exist."""
+    repo = CredentialsRepository(write_db_session=Mock(spec=Session), read_db_session=sqlite_read_session)
+
+    assert repo.get_credentials_by_email("nonexistent@example.com") is None
@@ -0,0 +1,22 @@
+import dataclasses
+
+import pytest
+
+from blueprints.users.dto import CredentialsDetails, MFADetails, UserName
+
+
+@pytest.mark.parametrize("dto", [
+    UserName(first_name="John", last_name="Doe"),
+    MFADetails(id=1, totp_secret="SECRET"),
+    CredentialsDetails(id=1, email="john@example.com", password="hash"),
+])
+def test_dto_is_frozen_and_slotted(dto):
+    """Test that lookup results are immutable and carry no per-instance dict."""
+    assert not hasattr(dto, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        dto.id = 2
+
+
+def test_dto_equality():
+    """Test that results compare by value."""
+    assert UserName("John", "Doe") == UserName(first_name="John", last_name="Doe")
@@ -1,9 +1,13 @@
 import pytest
 from unittest.mock import Mock, patch
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from blueprints.users.dto import MFADetails
 from blueprints.users.models import MFA, Credentials, User
 from blueprints.users.mfa_repository import MFARepository
+from core.database import Base, SessionWrite
+from core.engines import build_engine
 
 
 @pytest.fixture
@@ -17,6 +21,7 @@ def mock_read_session():
 def mock_write_session():
     """Fixture for mocking the write database session."""
     session = Mock(spec=Session)
+    session.info = {}
     return session
 
 
@@ -73,37 +78,6 @@ def mock_credentials():
     return [cred1, cred2]
 
 
-def test_get_mfa_details_by_user_id_existing(mfa_repository, mock_read_session, mock_mfa):
-    """Test fetching MFA details by user ID when they exist."""
-    user_id = 1
-    
-    mock_query = mock_read_session.query.return_value
-    mock_join = mock_query.join.return_value
-    mock_filter = mock_join.filter.return_value
-    mock_filter.first.return_value = mock_mfa[0]
-    
-    result = mfa_repository.get_mfa_details_by_user_id(user_id)
-    
-    mock_read_session.query.assert_called_once_with(MFA)
-    assert result == mock_mfa[0]
-
-
-def test_get_mfa_details_by_user_id_nonexistent(mfa_repository, mock_read_session):
-    """Test fetching MFA details by user ID when they don't exist."""
-    user_id = 999
-    
-    mock_query = mock_read_session.query.return_value
-    mock_join = mock_query.join.return_value
-    mock_filter = mock_join.filter.return_value
-    mock_filter.first.return_value = None
-    
-    result = mfa_repository.get_mfa_details_by_user_id(user_id)
-    
-    mock_read_session.query.assert_called_once_with(MFA)
-    assert result is None
-
-
-
 def test_get_mfa_details_via_email_existing(mfa_repository, mock_read_session, mock_user):
     """Test fetching MFA details by email when they exist."""
     email = "user1@example.com"
@@ -111,7 +85,7 @@ def test_get_mfa_details_via_email_existing(mfa_repository, mock_read_session, m
     mock_query = mock_read_session.query.return_value
     mock_join1 = mock_query.join.return_value
     mock_join2 = mock_join1.join.return_value
-    mock_filter = mock_join2.filter.return_value
+    mock_filter = mock_join2.options.return_value.filter.return_value
     mock_filter.first.return_value = mock_user[0]
     
     result = mfa_repository.get_mfa_details_via_email(email)
@@ -127,7 +101,7 @@ def test_get_mfa_details_via_email_nonexistent(mfa_repository, mock_read_session
     mock_query = mock_read_session.query.return_value
     mock_join1 = mock_query.join.return_value
     mock_join2 = mock_join1.join.return_value
-    mock_filter = mock_join2.filter.return_value
+    mock_filter = mock_join2.options.return_value.filter.return_value
     mock_filter.first.return_value = None
     
     result = mfa_repository.get_mfa_details_via_email(email)
@@ -188,8 +162,8 @@ def test_create(mfa_repository, mock_write_session):
     assert added_mfa is not None
     assert hasattr(added_mfa, 'totp_secret')
     assert added_mfa.totp_secret == totp_secret
-    mock_write_session.commit.assert_called_once()
     mock_write_session.flush.assert_called_once()
+    mock_write_session.commit.assert_not_called()
     assert result == 3
 
 
@@ -199,13 +173,36 @@ def test_delete_existing(mfa_repository, mock_write_session, mock_mfa):
     
     with patch.object(mfa_repository, 'get_mfa_details', return_value=mock_mfa[0]) as mock_get:
         mock_write_session.merge.return_value = mock_mfa[0]
+        mock_write_session.scalars.return_value.all.return_value = [2]
         
         mfa_repository.delete(mfa_id)
         
         mock_get.assert_called_once_with(mfa_id)
         mock_write_session.merge.assert_called_once_with(mock_mfa[0])
         mock_write_session.delete.assert_called_once_with(mock_mfa[0])
-        mock_write_session.commit.assert_called_once()
+        mock_write_session.flush.assert_called_once()
+        mock_write_session.commit.assert_not_called()
+        assert mock_write_session.info["cache_invalidations"] == {"user:2"}
+
+
+def test_delete_unlinks_user():
+    """Test that deleting MFA clears the user's link, so a reused MFA id cannot leak another user's secret."""
+    engine = build_engine("sqlite:///:memory:", prefix="WRITE_DB", label="write")
+    Base.metadata.create_all(engine)
+    db = SessionWrite(bind=engine)
+    mfa = MFA(totp_secret="OLD")
+    cred = Credentials(email="mfa@example.com", password="hash")
+    db.add_all([mfa, cred])
+    db.flush()
+    db.add(User(first_name="Mfa", last_name="User", credentials_id=cred.id, mfa_id=mfa.id))
+    db.commit()
+    repo = MFARepository(write_db_session=db, read_db_session=db)
+
+    repo.delete(mfa.id)
+    db.commit()
+
+    assert db.scalar(select(User.mfa_id)) is None
+    db.close()
 
 
 def test_delete_nonexistent(mfa_repository, mock_write_session):
@@ -221,30 +218,45 @@ def test_delete_nonexistent(mfa_repository, mock_write_session):
         mock_write_session.commit.assert_not_called()
 
 
-def test_update_mfa_secret_existing(mfa_repository, mock_write_session, mock_mfa):
-    """Test updating TOTP secret for an existing MFA record."""
-    user_id = 1
-    new_totp_secret = "NEWTOTP123456789"
-    
-    with patch.object(mfa_repository, 'get_mfa_details_by_user_id', return_value=mock_mfa[0]) as mock_get:
-        result = mfa_repository.update_mfa_secret(user_id, new_totp_secret)
-        
-        mock_get.assert_called_once_with(user_id)
-        assert mock_mfa[0].totp_secret == new_totp_secret
-        mock_write_session.commit.assert_called_once()
-        mock_write_session.refresh.assert_called_once_with(mock_mfa[0])
-        assert result == mock_mfa[0]
+def test_update_mfa_secret_existing(sqlite_session):
+    """Test updating the TOTP secret through the user's MFA link in one statement."""
+    repo = MFARepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
 
+    result = repo.update_mfa_secret(user_id=2, totp_secret="NEWTOTP123456789")
 
-def test_update_mfa_secret_nonexistent(mfa_repository, mock_write_session):
-    """Test updating TOTP secret for a nonexistent MFA record."""
-    user_id = 999
-    new_totp_secret = "NEWTOTP123456789"
-    
-    with patch.object(mfa_repository, 'get_mfa_details_by_user_id', return_value=None) as mock_get:
-        result = mfa_repository.update_mfa_secret(user_id, new_totp_secret)
-        
-        mock_get.assert_called_once_with(user_id)
-        mock_write_session.commit.assert_not_called()
-        mock_write_session.refresh.assert_not_called()
-        assert result is None
\ No newline at end of file
+    assert result.id == 1
+    assert result.totp_secret == "NEWTOTP123456789"
+    assert sqlite_session.get(MFA, 1).totp_secret == "NEWTOTP123456789"
+    repo.read_db_session.query.assert_not_called()
+
+
+def test_update_mfa_secret_without_mfa(sqlite_session):
+    """Test updating the TOTP secret of a user without MFA."""
+    repo = MFARepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
+
+    assert repo.update_mfa_secret(user_id=1, totp_secret="NEWTOTP123456789") is None
+    assert sqlite_session.get(MFA, 1).totp_secret == "SECRET"
+
+
+def test_update_mfa_secret_nonexistent(sqlite_session):
+    """Test updating the TOTP secret for a nonexistent user."""
+    repo = MFARepository(write_db_session=sqlite_session, read_db_session=Mock(spec=Session))
+
+    assert repo.update_mfa_secret(user_id=999, totp_secret="NEWTOTP123456789") is None
+
+
+def test_get_mfa_details_by_user_id_existing(sqlite_read_session):
+    """Test fetching MFA details by user ID when they exist."""
+    repo = MFARepository(write_db_session=Mock(spec=Session), read_db_session=sqlite_read_session)
+
+    result = repo.get_mfa_details_by_user_id(2)
+
+    assert result == MFADetails(id=1, totp_secret="SECRET")
+
+
+def test_get_mfa_details_by_user_id_nonexistent(sqlite_read_session):
+    """Test fetching MFA details by user ID when they don't exist."""
+    repo = MFARepository(write_db_session=Mock(spec=Session), read_db_session=sqlite_read_session)
+
+    assert repo.get_mfa_details_by_user_id(1) is None
+    assert repo.get_mfa_details_by_user_id(999) is None
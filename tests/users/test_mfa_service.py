@@ -87,7 +87,7 @@ def test_change_totp_secret_success(mfa_service, mock_mfa_repo):
     result = mfa_service.change_totp_secret(user_id)
     
     mfa_service.create_totp_secret.assert_called_once()
-    mock_mfa_repo.update_mfa_secret.assert_called_once_with(user_id=user_id, otp_secret=new_secret)
+    mock_mfa_repo.update_mfa_secret.assert_called_once_with(user_id=user_id, totp_secret=new_secret)
     assert result == new_secret
 
 
@@ -0,0 +1,38 @@
+from blueprints.users.credentials_repository import CredentialsRepository
+from blueprints.users.dto import UserName
+from blueprints.users.mfa_repository import MFARepository
+from blueprints.users.user_repository import UserRepository
+
+
+def test_repository_lookup_sees_committed_update(sqlite_session, sqlite_read_session):
+    repo = UserRepository(read_db_session=sqlite_read_session, write_db_session=sqlite_session)
+    assert repo.get_username_by_userid(user_id=1) == UserName("Plain", "User")
+
+    repo.update(user_id=1, first_name="Renamed")
+    assert repo.get_username_by_userid(user_id=1) == UserName("Plain", "User")
+    sqlite_session.commit()
+    sqlite_read_session.rollback()
+
+    assert repo.get_username_by_userid(user_id=1) == UserName("Renamed", "User")
+
+
+def test_credentials_email_change_invalidates_old_address(sqlite_session, sqlite_read_session):
+    repo = CredentialsRepository(write_db_session=sqlite_session, read_db_session=sqlite_read_session)
+
+    repo.update_credentials(cred_id=1, email="new@example.com")
+
+    assert sqlite_session.info["cache_invalidations"] == {"email:plain@example.com", "email:new@example.com"}
+
+
+def test_user_delete_invalidates_user_and_email(sqlite_session):
+    repo = UserRepository(read_db_session=sqlite_session, write_db_session=sqlite_session)
+
+    repo.delete(2)
+
+    assert sqlite_session.info["cache_invalidations"] == {"user:2", "email:mfa@example.com"}
+
+
+def test_secret_bearing_lookups_are_not_cached():
+    assert not hasattr(CredentialsRepository.get_credentials_by_email, "__wrapped__")
+    assert not hasattr(MFARepository.get_mfa_details_by_user_id, "__wrapped__")
+    assert hasattr(UserRepository.get_username_by_userid, "__wrapped__")
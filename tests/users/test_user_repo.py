@@ -1,8 +1,10 @@
 import pytest
 from unittest.mock import Mock, create_autospec
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, selectinload
 
-from blueprints.users.models import User, Credentials
+from blueprints.users.dto import UserName
+from blueprints.users.models import MFA, User, Credentials
 from blueprints.users.user_repository import UserRepository
 
 
@@ -15,6 +17,7 @@ def mock_read_session():
 @pytest.fixture
 def mock_write_session():
     session = create_autospec(Session)
+    session.info = {}
     return session
 
 
@@ -71,59 +74,6 @@ def test_get_user_by_id_not_found(user_repository, mock_read_session):
     assert result is None
 
 
-def test_get_userid_by_email(user_repository, mock_read_session, sample_user):
-    email = "john.doe@example.com"
-    mock_query = Mock()
-    mock_join = Mock()
-    mock_filter = Mock()
-    mock_filter.first.return_value = (1,)  
-    mock_join.filter.return_value = mock_filter
-    mock_query.join.return_value = mock_join
-    mock_read_session.query.return_value = mock_query
-    
-    result = user_repository.get_userid_by_email(email)
-    
-    mock_read_session.query.assert_called_once_with(User.id)
-    mock_query.join.assert_called_once()
-    mock_join.filter.assert_called_once()
-    assert result == (1,)
-
-
-def test_get_username_by_userid(user_repository, mock_read_session):
-    user_id = 1
-    expected_result = ("John", "Doe")
-    
-    mock_query = Mock()
-    mock_filter = Mock()
-    mock_filter.first.return_value = expected_result
-    mock_query.filter.return_value = mock_filter
-    mock_read_session.query.return_value = mock_query
-    
-    result = user_repository.get_username_by_userid(user_id)
-    
-    mock_read_session.query.assert_called_once()
-    mock_query.filter.assert_called_once()
-    assert result == expected_result
-
-
-def test_get_username_by_userid_not_found(user_repository, mock_read_session):
-    user_id = 999
-    
-    mock_query = Mock()
-    mock_filter = Mock()
-    mock_filter.first.return_value = None
-    mock_query.filter.return_value = mock_filter
-    mock_read_session.query.return_value = mock_query
-    
-    result = user_repository.get_username_by_userid(user_id)
-    
-    mock_read_session.query.assert_called_once()
-    mock_query.filter.assert_called_once()
-    assert result is None
-
-
-
-
 def test_get_full_user_details_by_id(user_repository, mock_read_session, sample_user, sample_credentials):
     user_id = 1
     expected_result = (sample_user, sample_credentials)
@@ -200,13 +150,13 @@ def test_create_user(user_repository, mock_write_session):
     
     mock_write_session.add = Mock(side_effect=side_effect_add)
     
-    mock_write_session.refresh = Mock(side_effect=lambda user: setattr(user, 'id', 2))
+    mock_write_session.flush = Mock(side_effect=lambda: setattr(added_user, 'id', 2))
     
     result = user_repository.create_user(**user_data)
     
     assert mock_write_session.add.called
-    assert mock_write_session.commit.called
-    assert mock_write_session.refresh.called
+    assert mock_write_session.flush.called
+    assert not mock_write_session.commit.called
     
     assert added_user is not None
     for key, value in user_data.items():
@@ -217,65 +167,134 @@ def test_create_user(user_repository, mock_write_session):
 
 def test_delete_user_exists(user_repository, mock_write_session, sample_user):
     user_id = 1
-    user_repository.get_user_by_id = Mock(return_value=sample_user)
+    mock_write_session.get.return_value = sample_user
     
     result = user_repository.delete(user_id)
     
-    user_repository.get_user_by_id.assert_called_once_with(user_id)
+    assert mock_write_session.get.call_args[0] == (User, user_id)
+    assert len(mock_write_session.get.call_args[1]["options"]) == 2
     mock_write_session.delete.assert_called_once_with(sample_user)
-    mock_write_session.commit.assert_called_once()
+    mock_write_session.flush.assert_called_once()
+    mock_write_session.commit.assert_not_called()
     assert result is True
 
 
 def test_delete_user_not_exists(user_repository, mock_write_session):
     user_id = 999
-    user_repository.get_user_by_id = Mock(return_value=None)
+    mock_write_session.get.return_value = None
     
     result = user_repository.delete(user_id)
     
-    user_repository.get_user_by_id.assert_called_once_with(user_id)
     mock_write_session.delete.assert_not_called()
     mock_write_session.commit.assert_not_called()
     assert result is True
 
 
-def test_update_user_exists(user_repository, mock_write_session, sample_user):
-    user_id = 1
-    update_data = {
-        "first_name": "Jane",
-        "last_name": "Doe"
-    }
-    
-    updated_user = Mock(spec=User)
-    updated_user.id = user_id
-    updated_user.first_name = "Jane"
-    updated_user.last_name = "Doe"
-    
-    user_repository.get_user_by_id = Mock(return_value=sample_user)
-    mock_write_session.merge.return_value = updated_user
-    
-    result = user_repository.update(user_id, **update_data)
-    
-    user_repository.get_user_by_id.assert_called_once_with(user_id)
-    mock_write_session.merge.assert_called_once_with(sample_user)
-    mock_write_session.commit.assert_called_once()
-    mock_write_session.refresh.assert_called_once_with(updated_user)
-    assert result == updated_user
+def test_update_user_exists(sqlite_session):
+    """Test that updating a user returns the updated row in one statement."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
 
+    result = repo.update(1, first_name="Jane", last_name="Doe")
 
-def test_update_user_not_exists(user_repository, mock_write_session):
-    user_id = 999
-    update_data = {
-        "first_name": "Jane",
-        "last_name": "Doe"
-    }
-    
-    user_repository.get_user_by_id = Mock(return_value=None)
-    
-    result = user_repository.update(user_id, **update_data)
-    
-    user_repository.get_user_by_id.assert_called_once_with(user_id)
-    mock_write_session.merge.assert_not_called()
-    mock_write_session.commit.assert_not_called()
-    mock_write_session.refresh.assert_not_called()
-    assert result is None
\ No newline at end of file
+    assert result.id == 1
+    assert (result.first_name, result.last_name) == ("Jane", "Doe")
+    assert sqlite_session.get(User, 1).first_name == "Jane"
+    repo.read_db_session.query.assert_not_called()
+
+
+def test_update_user_not_exists(sqlite_session):
+    """Test updating a nonexistent user."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
+
+    assert repo.update(999, first_name="Jane", last_name="Doe") is None
+
+
+def test_register_user(sqlite_session):
+    """Test registering a user with MFA inserts all three rows."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
+
+    user_id = repo.register_user(
+        email="new@example.com", password="hash", totp_secret="SECRET2",
+        first_name="New", last_name="User", country="DE", dob=None,
+    )
+
+    user = sqlite_session.get(User, user_id, options=[selectinload(User.credentials), selectinload(User.mfa)])
+    assert user.credentials.email == "new@example.com"
+    assert user.mfa.totp_secret == "SECRET2"
+    assert user.country == "DE"
+
+
+def test_register_user_without_mfa(sqlite_session):
+    """Test registering a user without MFA leaves mfa_id empty."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
+
+    user_id = repo.register_user(
+        email="new@example.com", password="hash", totp_secret=None,
+        first_name="New", last_name="User", country=None, dob=None,
+    )
+
+    assert sqlite_session.get(User, user_id).mfa_id is None
+
+
+def test_register_user_duplicate_email(sqlite_session):
+    """Test that a duplicate email returns None and inserts nothing."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
+
+    result = repo.register_user(
+        email="plain@example.com", password="hash", totp_secret="SECRET2",
+        first_name="New", last_name="User", country=None, dob=None,
+    )
+
+    assert result is None
+    assert sqlite_session.query(User).count() == 2
+    assert sqlite_session.query(MFA).count() == 1
+
+
+def test_register_user_statement_is_single_cte():
+    """Test that the Postgres registration is one INSERT chained through CTEs."""
+    stmt = UserRepository._register_user_statement(
+        "new@example.com", "hash", "SECRET2",
+        {"first_name": "New", "last_name": "User", "country": None, "dob": None},
+    )
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("WITH new_cred AS")
+    assert "ON CONFLICT (email) DO NOTHING RETURNING credentials.id" in sql
+    assert "new_mfa AS" in sql
+    assert sql.count("INSERT INTO") == 3
+    assert sql.rstrip().endswith("RETURNING users.id")
+
+
+def test_get_userid_by_email(sqlite_read_session):
+    """Test fetching the user ID through the credentials email."""
+    repo = UserRepository(read_db_session=sqlite_read_session, write_db_session=create_autospec(Session))
+
+    assert repo.get_userid_by_email("mfa@example.com") == 2
+    assert repo.get_userid_by_email("nonexistent@example.com") is None
+
+
+def test_get_username_by_userid(sqlite_read_session):
+    """Test fetching first and last name as a compact result."""
+    repo = UserRepository(read_db_session=sqlite_read_session, write_db_session=create_autospec(Session))
+
+    assert repo.get_username_by_userid(1) == UserName(first_name="Plain", last_name="User")
+
+
+def test_get_username_by_userid_not_found(sqlite_read_session):
+    """Test fetching the name of a nonexistent user."""
+    repo = UserRepository(read_db_session=sqlite_read_session, write_db_session=create_autospec(Session))
+
+    assert repo.get_username_by_userid(999) is None
+
+
+def test_delete_user_cascades_without_lazy_loads(sqlite_session):
+    """Test that deleting a user removes credentials and MFA with explicitly loaded relationships."""
+    repo = UserRepository(read_db_session=create_autospec(Session), write_db_session=sqlite_session)
+
+    repo.delete(2)
+    sqlite_session.commit()
+
+    assert sqlite_session.get(User, 2) is None
+    assert sqlite_session.query(Credentials).count() == 1
+    assert sqlite_session.query(MFA).count() == 0
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime
+from blueprints.users.dto import UserName
 from blueprints.users.user_service import UserService
 
 
@@ -54,7 +55,7 @@ def test_get_user_by_id_not_found(user_service, mock_user_repo):
 
 def test_get_userid_by_email_success(user_service, mock_user_repo):
     email = "test@example.com"
-    mock_user_repo.get_userid_by_email.return_value = (1,)
+    mock_user_repo.get_userid_by_email.return_value = 1
     
     result = user_service.get_userid_by_email(email)
     
@@ -81,7 +82,7 @@ def test_get_userid_by_email_empty_email(user_service):
 
 def test_get_username_by_userid_success(user_service, mock_user_repo):
     user_id = 1
-    mock_user_repo.get_username_by_userid.return_value = ("John", "Doe")
+    mock_user_repo.get_username_by_userid.return_value = UserName(first_name="John", last_name="Doe")
     
     result = user_service.get_username_by_userid(user_id)
     
@@ -106,7 +107,7 @@ def test_get_username_by_userid_not_found(user_service, mock_user_repo):
 
 def test_get_username_by_userid_incomplete_data(user_service, mock_user_repo):
     user_id = 1
-    mock_user_repo.get_username_by_userid.return_value = ("John", None)
+    mock_user_repo.get_username_by_userid.return_value = UserName(first_name="John", last_name=None)
     
     with pytest.raises(ValueError, match=f"Incomplete name data for user ID {user_id}."):
         user_service.get_username_by_userid(user_id)
@@ -147,12 +148,9 @@ def test_create_user_success(user_service, mock_user_repo, mock_cred_service, mo
     country = "US"
     dob = "1990-01-01"
     
-    # Email not already registered
-    mock_user_repo.get_user_by_email.return_value = None
-    
     # Mock service returns
-    mock_cred_service.create_credentials.return_value = 10
-    mock_user_repo.create_user.return_value = 1
+    mock_cred_service.validate_and_hash_pw.return_value = "hashed"
+    mock_user_repo.register_user.return_value = 1
     
     # Act
     with patch('blueprints.users.user_service.is_valid_string_value', return_value=True):
@@ -167,18 +165,18 @@ def test_create_user_success(user_service, mock_user_repo, mock_cred_service, mo
         )
     
     # Assert
-    mock_user_repo.get_user_by_email.assert_called_once_with(email)
-    mock_cred_service.create_credentials.assert_called_once_with(email=email, password=password)
-    mock_mfa_service.create_mfa_entry.assert_not_called()
-    
-    mock_user_repo.create_user.assert_called_once()
-    assert mock_user_repo.create_user.call_args[1]['first_name'] == first_name
-    assert mock_user_repo.create_user.call_args[1]['last_name'] == last_name
-    assert mock_user_repo.create_user.call_args[1]['country'] == country
-    assert isinstance(mock_user_repo.create_user.call_args[1]['dob'], datetime)
-    assert mock_user_repo.create_user.call_args[1]['credentials_id'] == 10
-    assert mock_user_repo.create_user.call_args[1]['mfa_id'] is None
-    
+    mock_user_repo.get_user_by_email.assert_not_called()
+    mock_cred_service.validate_and_hash_pw.assert_called_once_with(password)
+    mock_mfa_service.create_totp_secret.assert_not_called()
+    
+    mock_user_repo.register_user.assert_called_once()
+    assert mock_user_repo.register_user.call_args[1]['email'] == email
+    assert mock_user_repo.register_user.call_args[1]['password'] == "hashed"
+    assert mock_user_repo.register_user.call_args[1]['first_name'] == first_name
+    assert mock_user_repo.register_user.call_args[1]['last_name'] == last_name
+    assert mock_user_repo.register_user.call_args[1]['country'] == country
+    assert isinstance(mock_user_repo.register_user.call_args[1]['dob'], datetime)
+    assert mock_user_repo.register_user.call_args[1]['totp_secret'] is None
     assert result == 1
 
 
@@ -191,11 +189,8 @@ def test_create_user_with_mfa_enabled(user_service, mock_user_repo, mock_cred_se
     country = "US"
     dob = "1990-01-01"
     
-    mock_user_repo.get_user_by_email.return_value = None
-    
-    mock_cred_service.create_credentials.return_value = 10
-    mock_mfa_service.create_mfa_entry.return_value = 20
-    mock_user_repo.create_user.return_value = 1
+    mock_mfa_service.create_totp_secret.return_value = "TOTPSECRET"
+    mock_user_repo.register_user.return_value = 1
     
     # Act
     with patch('blueprints.users.user_service.is_valid_string_value', return_value=True):
@@ -210,9 +205,9 @@ def test_create_user_with_mfa_enabled(user_service, mock_user_repo, mock_cred_se
         )
     
     # Assert
-    mock_mfa_service.create_mfa_entry.assert_called_once()
-    mock_user_repo.create_user.assert_called_once()
-    assert mock_user_repo.create_user.call_args[1]['mfa_id'] == 20
+    mock_mfa_service.create_totp_secret.assert_called_once()
+    mock_mfa_service.create_mfa_entry.assert_not_called()
+    assert mock_user_repo.register_user.call_args[1]['totp_secret'] == "TOTPSECRET"
     assert result == 1
 
 
@@ -226,8 +221,8 @@ def test_create_user_email_already_registered(user_service, mock_user_repo):
     country = "US"
     dob = "1990-01-01"
     
-    # Email already registered
-    mock_user_repo.get_user_by_email.return_value = Mock()
+    # Email already registered, the insert hits the unique index
+    mock_user_repo.register_user.return_value = None
     
     # Act & Assert
     with patch('blueprints.users.user_service.is_valid_string_value', return_value=True):
@@ -243,7 +238,7 @@ def test_create_user_email_already_registered(user_service, mock_user_repo):
             )
 
 
-def test_create_user_invalid_name(user_service):
+def test_create_user_invalid_name(user_service, mock_user_repo):
     # Arrange
     first_name = ""  
     last_name = "Doe"
@@ -265,6 +260,7 @@ def test_create_user_invalid_name(user_service):
                 country=country,
                 dob=dob
             )
+    mock_user_repo.register_user.assert_not_called()
 
 
 def test_create_user_empty_dob(user_service, mock_user_repo, mock_cred_service):
@@ -277,10 +273,7 @@ def test_create_user_empty_dob(user_service, mock_user_repo, mock_cred_service):
     country = "US"
     dob = "" 
     
-    mock_user_repo.get_user_by_email.return_value = None
-    
-    mock_cred_service.create_credentials.return_value = 10
-    mock_user_repo.create_user.return_value = 1
+    mock_user_repo.register_user.return_value = 1
     
     with patch('blueprints.users.user_service.is_valid_string_value', return_value=True):
         result = user_service.create_user(
@@ -293,38 +286,11 @@ def test_create_user_empty_dob(user_service, mock_user_repo, mock_cred_service):
             dob=dob
         )
     
-    mock_user_repo.create_user.assert_called_once()
-    assert mock_user_repo.create_user.call_args[1]['dob'] is None
+    mock_user_repo.register_user.assert_called_once()
+    assert mock_user_repo.register_user.call_args[1]['dob'] is None
     assert result == 1
 
 
-def test_create_user_error_creating(user_service, mock_user_repo, mock_cred_service):
-    first_name = "John"
-    last_name = "Doe"
-    email = "john.doe@example.com"
-    password = "securepass"
-    mfa_enabled = "false"
-    country = "US"
-    dob = "1990-01-01"
-    
-    mock_user_repo.get_user_by_email.return_value = None
-    
-    mock_cred_service.create_credentials.return_value = 10
-    mock_user_repo.create_user.return_value = None  
-    
-    with patch('blueprints.users.user_service.is_valid_string_value', return_value=True):
-        with pytest.raises(RuntimeError, match="Error creating user"):
-            user_service.create_user(
-                first_name=first_name,
-                last_name=last_name,
-                email=email,
-                password=password,
-                mfa_enabled=mfa_enabled,
-                country=country,
-                dob=dob
-            )
-
-
 # Tests for activate_mfa
 def test_activate_mfa_no_existing_mfa(user_service, mock_user_repo, mock_mfa_service):
     user_id = 1